@@ -0,0 +1,78 @@
+"""
+ASGI entry point: the Flask app behind an event loop.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000        (run from backend/)
+
+GET /movie/trailer does its YouTube search on the loop first
+(TrailerResolver.resolve_async), so slow upstream answers only hold a
+coroutine, not a worker. Every route, that one included, is then
+answered by the Flask app (a2wsgi) on a pool of ASGI_WORKERS threads,
+which bounds the CPU-bound recommender work in flight. Responses,
+CORS headers and metrics are the ones server.py produces.
+"""
+
+import time
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+from config import ASGI_WORKERS
+
+import server
+from recommender.trailer import TrailerLookupError
+from recommender.logs import get_logger
+
+logger = get_logger("asgi")
+
+
+TRAILER_PATH = "/movie/trailer"
+ENVIRON_KEY = "recommender.environ"     # scope entry: extra WSGI environ entries for server.app
+
+
+def _flask_app(environ, start_response):
+    """server.app, with what was done ahead of it on the loop in the environ (see server.get_trailer)."""
+    environ.update(environ["asgi.scope"].get(ENVIRON_KEY, ()))
+    return server.app(environ, start_response)
+
+
+class AsyncApp:
+    """ASGI app: trailer lookups awaited on the loop, every response from the WSGI app."""
+
+    def __init__(self, workers=ASGI_WORKERS):
+        self.workers = workers
+        self.wsgi = WSGIMiddleware(_flask_app, workers=workers)
+        self.pool = self.wsgi.executor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            if scope["path"] == TRAILER_PATH and scope["method"] == "GET":
+                scope = await self._lookup_trailer(scope)
+            await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                logger.info("ASGI app ready (%s worker threads)", self.workers)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await server.trailers.aclose()
+                self.pool.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _lookup_trailer(self, scope):
+        '''await the search here, server.get_trailer then answers from its outcome'''
+        title = parse_qs(scope["query_string"].decode()).get("title", [None])[0]
+        if not title:
+            return scope
+        extra = {"recommender.started": time.perf_counter()}   # latency metric from here
+        try:
+            extra["recommender.trailer"] = await server.trailers.resolve_async(title)
+        except TrailerLookupError as e:
+            extra["recommender.trailer"] = e
+        return dict(scope, **{ENVIRON_KEY: extra})
+
+
+app = AsyncApp()
@@ -0,0 +1,74 @@
+import sys
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+
+def configure(matrix_path):
+    """
+    Point the backend at a benchmark dataset. Must run before anything
+    from `recommender` or `server` is imported (they read config at import).
+
+    Caches that would hide the compute cost (recommendation cache,
+    precomputed lists, trailer cache) are switched off, and so are
+    compaction (the dataset on disk is never rewritten) and the catalog
+    file watch.
+    """
+    import config
+
+    config.MATRIX_PATH = matrix_path
+    config.RECOMMEND_CACHE_SIZE = 0
+    config.PRECOMPUTE_DIR = None
+    config.TRAILER_CACHE_PATH = None
+    config.CATALOG_WATCH_INTERVAL_S = None
+    config.COMPACT_INTERVAL_S = float("inf")
+    config.COMPACT_MAX_EVENTS = float("inf")
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def summarize(name, samples, wall_s, items=None):
+    """Latency percentiles (ms) and throughput for one benchmark."""
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        "name": name,
+        "calls": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "mean_ms": round(float(ms.mean()), 4),
+        "max_ms": round(float(ms.max()), 4),
+        # items/s for batch calls (users scored), calls/s otherwise
+        "throughput_per_s": round((items or len(ms)) / wall_s, 2) if wall_s else None,
+    }
+
+
+def measure(name, fn, args_list, items=None):
+    """Call fn(*args) for every args tuple, timing each call."""
+    samples = []
+    started = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - t0)
+    return summarize(name, samples, time.perf_counter() - started, items)
+
+
+def timed_once(name, fn):
+    """Single-shot cost (index builds, startup), reported like a benchmark."""
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    return summarize(name, [elapsed], elapsed), result
@@ -0,0 +1,53 @@
+"""
+Compare two benchmark reports (e.g. before/after a change).
+
+    python -m benchmarks.compare old.json new.json [--threshold 1.2]
+
+Prints the p50/p95 ratio new/old per size and benchmark and exits with
+status 1 when any p95 got slower than the threshold.
+"""
+
+import argparse
+import json
+import sys
+
+
+def _index(report):
+    return {
+        (run["size"], r["name"]): r
+        for run in report["runs"]
+        for r in run["results"]
+    }
+
+
+def compare(old, new, threshold):
+    old_results, new_results = _index(old), _index(new)
+    regressions = []
+    for key in sorted(new_results):
+        if key not in old_results:
+            continue
+        before, after = old_results[key], new_results[key]
+        p50 = after["p50_ms"] / before["p50_ms"] if before["p50_ms"] else float("nan")
+        p95 = after["p95_ms"] / before["p95_ms"] if before["p95_ms"] else float("nan")
+        flag = ""
+        # single-shot timings (index builds) are too noisy to gate on
+        if after["calls"] > 1 and p95 > threshold:
+            flag = "  <-- slower"
+            regressions.append(key)
+        size, name = key
+        print(f"{size:>8} {name:<32} p50 x{p50:6.2f}  p95 x{p95:6.2f}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=1.2, help="p95 ratio counted as a regression")
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    sys.exit(1 if compare(old, new, args.threshold) else 0)
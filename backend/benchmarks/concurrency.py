@@ -0,0 +1,161 @@
+"""
+Slow upstream benchmark: GET /movie with GET /movie/trailer mixed in,
+the YouTube search answered by a local stub after UPSTREAM_DELAY_S.
+Import only after `common.configure` (server.py reads config at import).
+
+The same request mix is sent by CLIENTS concurrent clients to
+
+    sync    the Flask app with ASGI_WORKERS request threads (a threaded
+            WSGI server: a trailer call holds its thread for the round-trip)
+    async   asgi.AsyncApp on one event loop (in-process ASGI calls), the
+            same number of threads, trailer searches awaited on the loop
+
+Every trailer title is new, so each trailer request is an upstream call.
+Latency includes the wait for a free worker thread.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlencode
+
+from config import ASGI_WORKERS
+from benchmarks.common import summarize
+
+
+UPSTREAM_DELAY_S = 0.25
+CLIENTS = 4 * ASGI_WORKERS
+TRAILER_EVERY = 4           # every 4th request is a trailer lookup
+
+
+class _SlowSearch(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(UPSTREAM_DELAY_S)
+        body = json.dumps({"items": [{"id": {"kind": "youtube#video", "videoId": "stub"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _requests(titles, mode):
+    """(path, params) mix; trailer titles are unique per mode so nothing is cached."""
+    return [
+        ("/movie/trailer", {"title": f"{mode} bench {i} {title}"}) if i % TRAILER_EVERY == 0
+        else ("/movie", {"title": title})
+        for i, title in enumerate(titles)
+    ]
+
+
+def _report(mode, samples, wall_s):
+    return [
+        summarize(f"{mode} GET {path}", times, wall_s)
+        for path, times in samples.items() if times
+    ]
+
+
+def run_sync(server, requests):
+    slots = threading.BoundedSemaphore(ASGI_WORKERS)
+    samples = {"/movie": [], "/movie/trailer": []}
+    queue = list(reversed(requests))
+    queue_lock = threading.Lock()
+
+    def client():
+        http = server.app.test_client()
+        while True:
+            with queue_lock:
+                if not queue:
+                    return
+                path, params = queue.pop()
+            t0 = time.perf_counter()
+            with slots:
+                response = http.get(path, query_string=params)
+            elapsed = time.perf_counter() - t0
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} -> {response.status_code}")
+            samples[path].append(elapsed)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(CLIENTS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return _report("sync", samples, time.perf_counter() - started)
+
+
+async def _asgi_get(app, path, params):
+    """One in-process ASGI request, returns the status code."""
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "root_path": "", "query_string": urlencode(params).encode(),
+        "headers": [(b"host", b"bench")], "server": ("bench", 80), "client": ("127.0.0.1", 0),
+    }
+    response = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+
+    await app(scope, receive, send)
+    return response["status"]
+
+
+def run_async(app, requests):
+    samples = {"/movie": [], "/movie/trailer": []}
+
+    async def client(queue):
+        while queue:
+            path, params = queue.pop()
+            t0 = time.perf_counter()
+            status = await _asgi_get(app, path, params)
+            elapsed = time.perf_counter() - t0
+            if status != 200:
+                raise RuntimeError(f"{path} -> {status}")
+            samples[path].append(elapsed)
+
+    async def main():
+        queue = list(reversed(requests))
+        await asyncio.gather(*(client(queue) for _ in range(CLIENTS)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    return _report("async", samples, time.perf_counter() - started)
+
+
+def run(queries, rng):
+    import server
+    import asgi
+    from recommender.trailer import TrailerResolver
+
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), _SlowSearch)
+    upstream.daemon_threads = True
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{upstream.server_address[1]}/search"
+
+    catalog = server.get_catalog()
+    titles = catalog.titles[rng.integers(0, len(catalog), 4 * queries)].tolist()
+    original = server.trailers
+    results = []
+    try:
+        # a fresh, memory-only resolver per mode against the stub
+        server.trailers = TrailerResolver(base_url=base_url, cache_path=None)
+        results += run_sync(server, _requests(titles, "sync"))
+
+        server.trailers = TrailerResolver(base_url=base_url, cache_path=None)
+        app = asgi.AsyncApp()
+        results += run_async(app, _requests(titles, "async"))
+        app.pool.shutdown()
+    finally:
+        server.trailers = original
+        upstream.shutdown()
+    return results
@@ -0,0 +1,72 @@
+"""
+Endpoint benchmarks through Flask's test client (no network, no threads:
+routing + JSON + recommender work per request).
+Import only after `common.configure` (server.py reads config at import).
+
+/movie/trailer is left out, it mostly measures the YouTube API.
+"""
+
+from benchmarks.common import measure, timed_once
+from benchmarks.micro import sample_users
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.path} -> {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    response.get_data()     # drain streamed bodies
+
+
+def run(queries, rng):
+    results = []
+
+    result, server = timed_once("server_import", lambda: __import__("server"))
+    results.append(result)
+
+    client = server.app.test_client()
+    catalog = server.get_catalog()
+    store = server.interactions
+
+    users = sample_users(store, queries, rng)
+    titles = catalog.titles[rng.integers(0, len(catalog), len(users))].tolist()
+    genres = catalog.genres.genres
+
+    def get(path, **params):
+        _check(client.get(path, query_string=params))
+
+    def post(path, body):
+        _check(client.post(path, json=body))
+
+    results.append(measure("GET /genres", get, [("/genres",)] * len(users)))
+    results.append(measure("GET /movie", lambda t: get("/movie", title=t), [(t,) for t in titles]))
+    results.append(measure(
+        "GET /get_genre_movies", lambda g: get("/get_genre_movies", genre=g),
+        [(genres[i % len(genres)],) for i in range(len(users))],
+    ))
+    results.append(measure(
+        "GET /get_genre_movies?limit", lambda g: get("/get_genre_movies", genre=g, limit=24),
+        [(genres[i % len(genres)],) for i in range(len(users))],
+    ))
+    results.append(measure(
+        "GET /user/state", lambda u, t: get("/user/state", user_id=u, movie_title=t),
+        list(zip(users, titles)),
+    ))
+    results.append(measure(
+        "POST /recommend", lambda u, t: post("/recommend", {"user_id": u, "opened_movie": t}),
+        list(zip(users, titles)),
+    ))
+    results.append(measure(
+        "POST /recommend[cold]", lambda u, t: post("/recommend", {"user_id": u, "opened_movie": t}),
+        [(f"bench_cold_{i}", t) for i, t in enumerate(titles)],
+    ))
+    results.append(measure(
+        "POST /recommend/batch", lambda ids: post("/recommend/batch", {"user_ids": ids}),
+        [(users,)], items=len(users),
+    ))
+
+    # writes last, they change what the reads above would see
+    results.append(measure(
+        "POST /user/action", lambda u, t: post("/user/action", {"user_id": u, "movie_title": t, "action": 1}),
+        list(zip(users, titles)),
+    ))
+
+    return results
@@ -0,0 +1,156 @@
+"""
+Micro-benchmarks of the recommender functions on the configured dataset.
+Import only after `common.configure` (modules read config at import).
+"""
+
+import numpy as np
+import pandas as pd
+from config import MIN_SIMILARITY_SCORE, MAX_RECOMMENDATIONS
+from recommender.store import get_store
+from recommender.catalog import get_catalog
+from recommender.similarity import get_similar_users
+from recommender.lsh import get_lsh_index
+from recommender.recommend import recommend_movies
+from recommender.item_recommender import get_item_index, recommend_by_items
+from recommender.genre_recommender import recommend_by_genre
+from recommender.matrix import update_user_matrix
+from recommender.batch import recommend_batch
+from recommender.search import SearchIndex
+from recommender.genre_index import GenreIndex
+from recommender.facets import FacetIndex, parse_filters
+from benchmarks.common import measure, timed_once
+from benchmarks.synth import catalog_columns
+
+
+def sample_users(store, n, rng):
+    """Up to n random users that have at least one like."""
+    candidates = [uid for uid, liked in zip(store.user_ids, store.rows) if liked]
+    picks = rng.choice(len(candidates), min(n, len(candidates)), replace=False)
+    return [candidates[i] for i in picks]
+
+
+def keystrokes(texts, rng, typos=0.2):
+    """Every prefix of each text as typed, some with a swapped letter pair."""
+    typed = []
+    for text in texts:
+        text = text.lower()
+        if len(text) > 4 and rng.random() < typos:
+            i = int(rng.integers(1, len(text) - 2))
+            text = text[:i] + text[i + 1] + text[i] + text[i + 2:]
+        typed += [text[:n] for n in range(1, min(len(text), 20) + 1)]
+    return typed
+
+
+def search_queries(columns, n, rng):
+    """Keystroke queries for n random titles / directors / stars."""
+    fields = ["Series_Title", "Director", "Star1"]
+    picks = rng.integers(0, len(columns["Series_Title"]), n)
+    texts = [columns[fields[i % 3]][m] for i, m in enumerate(picks.tolist())]
+    return keystrokes([t for t in texts if isinstance(t, str)], rng)
+
+
+def facet_queries(catalog, n, rng):
+    """n random (filters, genre) pairs: a year and rating floor, some certificates."""
+    genres = sorted(catalog.genres.genre_ids)
+    certificates = sorted(catalog.facets.certificates)
+    queries = []
+    for _ in range(n):
+        params = {
+            "year_min": int(rng.integers(1950, 2015)),
+            "rating_min": round(float(rng.uniform(7.6, 8.6)), 1),
+            "certificate": [str(c) for c in rng.choice(certificates, 3, replace=False)],
+        }
+        queries.append((parse_filters(params)[0], str(rng.choice(genres))))
+    return queries
+
+
+def tiled_catalog(catalog, n_movies):
+    """(columns, numeric) of the catalog repeated up to n_movies rows."""
+    rows = np.resize(np.arange(len(catalog)), n_movies)
+    columns = {name: np.asarray(values)[rows] for name, values in catalog.columns.items()}
+    numeric = {name: values[rows] for name, values in catalog.numeric.items()}
+    return columns, numeric
+
+
+def dataframe_scan(df, filters, genre):
+    """The same filter as a DataFrame scan (numeric columns already parsed)."""
+    (year, _), (rating, _) = filters.ranges["year"], filters.ranges["rating"]
+    return (
+        df["Genre"].str.contains(genre, regex=False).to_numpy()
+        & (df["year"] >= year).to_numpy()
+        & (df["IMDB_Rating"] >= rating).to_numpy()
+        & df["Certificate"].str.upper().isin(filters.certificates).to_numpy()
+    )
+
+
+def run(queries, rng):
+    results = []
+
+    result, catalog = timed_once("catalog_load", get_catalog)
+    results.append(result)
+    result, store = timed_once("store_load", get_store)
+    results.append(result)
+
+    users = sample_users(store, queries, rng)
+    liked_titles = [catalog.titles[store.liked(uid)].tolist() for uid in users]
+
+    exact = [get_similar_users(uid, MIN_SIMILARITY_SCORE, MAX_RECOMMENDATIONS, "exact") for uid in users]
+    results.append(measure(
+        "get_similar_users[exact]", get_similar_users,
+        [(uid, MIN_SIMILARITY_SCORE, MAX_RECOMMENDATIONS, "exact") for uid in users],
+    ))
+
+    result, _ = timed_once("lsh_index_build", lambda: get_lsh_index(store))
+    results.append(result)
+    results.append(measure(
+        "get_similar_users[lsh]", get_similar_users,
+        [(uid, MIN_SIMILARITY_SCORE, MAX_RECOMMENDATIONS, "lsh") for uid in users],
+    ))
+
+    results.append(measure(
+        "recommend_movies", recommend_movies,
+        [(uid, similar, 5) for uid, similar in zip(users, exact)],
+    ))
+
+    result, _ = timed_once("item_index_build", lambda: get_item_index(store))
+    results.append(result)
+    results.append(measure("recommend_by_items", recommend_by_items, [(uid, 5) for uid in users]))
+
+    results.append(measure("recommend_by_genre", recommend_by_genre, [(titles, 10) for titles in liked_titles]))
+
+    results.append(measure(
+        "recommend_batch", lambda ids: list(recommend_batch(ids, MIN_SIMILARITY_SCORE, MAX_RECOMMENDATIONS, 5)),
+        [(users,)], items=len(users),
+    ))
+
+    # typeahead: the real catalog, then a synthetic 100k-title one
+    typed = search_queries(catalog.columns, queries, rng)
+    results.append(measure("search[catalog]", catalog.search.search, [(q,) for q in typed]))
+    columns = catalog_columns(catalog, 100_000, rng)
+    result, synthetic = timed_once("search_index_build[100k]", lambda: SearchIndex(columns))
+    results.append(result)
+    typed = search_queries(columns, queries, rng)
+    results.append(measure("search[100k]", synthetic.search, [(q,) for q in typed]))
+
+    # facet filters: sorted arrays + bitsets vs. a DataFrame scan, catalog then tiled to 100k
+    facet_args = facet_queries(catalog, queries, rng)
+    df = pd.DataFrame(catalog.columns).assign(year=catalog.numeric["year"])
+    results.append(measure("facet_mask[catalog]", catalog.facets.mask, facet_args))
+    results.append(measure("facet_scan_pandas[catalog]", lambda f, g: dataframe_scan(df, f, g), facet_args))
+    columns, numeric = tiled_catalog(catalog, 100_000)
+    result, facets = timed_once(
+        "facet_index_build[100k]", lambda: FacetIndex(columns, numeric, GenreIndex(columns)))
+    results.append(result)
+    df = pd.DataFrame(columns).assign(year=numeric["year"])
+    results.append(measure("facet_mask[100k]", facets.mask, facet_args))
+    results.append(measure("facet_scan_pandas[100k]", lambda f, g: dataframe_scan(df, f, g), facet_args))
+
+    # writes last: they invalidate the CSR / item neighbour caches used above
+    titles = catalog.titles
+    picks = rng.integers(0, len(titles), len(users))
+    results.append(measure(
+        "update_user_matrix", update_user_matrix,
+        [(uid, [titles[m]]) for uid, m in zip(users, picks.tolist())],
+    ))
+
+    return results
@@ -0,0 +1,165 @@
+"""
+Benchmark runner.
+
+    python -m benchmarks.run --sizes 1000,10000,100000 --out bench.json     (run from backend/)
+    python -m benchmarks.compare old.json new.json
+
+For every size a synthetic matrix is generated (cached in --data-dir) and
+the suites run in a fresh subprocess, so singletons start cold and peak
+RSS is per size. Results are one JSON document:
+
+    {"meta": {...}, "runs": [{"size", "dataset", "peak_rss_mb", "results": [...]}]}
+
+with p50/p95/p99/mean/max latency in ms and throughput per benchmark.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+SUITES = ("micro", "endpoints", "concurrency")
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset_path(data_dir, size, mean_likes, alpha, seed):
+    return os.path.join(data_dir, f"matrix_{size}_{mean_likes:g}_{alpha:g}_{seed}.csv")
+
+
+def run_child(args):
+    """Runs inside the per-size subprocess and writes its part of the results."""
+    from benchmarks.common import configure, peak_rss_mb
+
+    # work on a private copy of the log (likes are written during the run)
+    work_dir = tempfile.mkdtemp(prefix="bench_")
+    matrix_path = os.path.join(work_dir, "user_item_matrix.csv")
+    os.symlink(os.path.abspath(args.matrix), matrix_path)
+    if os.path.exists(args.matrix + ".log"):
+        shutil.copy(args.matrix + ".log", matrix_path + ".log")
+    configure(matrix_path)
+
+    rng = np.random.default_rng(args.seed)
+    results = []
+    try:
+        if "micro" in args.suites:
+            from benchmarks import micro
+            results += [dict(r, suite="micro") for r in micro.run(args.queries, rng)]
+        if "endpoints" in args.suites:
+            from benchmarks import endpoints
+            results += [dict(r, suite="endpoints") for r in endpoints.run(args.queries, rng)]
+        if "concurrency" in args.suites:
+            from benchmarks import concurrency
+            results += [dict(r, suite="concurrency") for r in concurrency.run(args.queries, rng)]
+    finally:
+        from recommender.store import get_store
+        get_store().close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.out, "w") as f:
+        json.dump({"peak_rss_mb": peak_rss_mb(), "results": results}, f)
+
+
+def main(args):
+    from benchmarks import synth
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "created": time.time(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "queries": args.queries,
+            "suites": args.suites,
+        },
+        "runs": [],
+    }
+
+    for size in args.sizes:
+        matrix = dataset_path(args.data_dir, size, args.mean_likes, args.alpha, args.seed)
+        if not os.path.exists(matrix):
+            synth.generate(matrix, size, mean_likes=args.mean_likes, alpha=args.alpha,
+                           log_events=args.log_events, seed=args.seed)
+
+        part = matrix + ".result.json"
+        cmd = [
+            sys.executable, "-m", "benchmarks.run", "--child",
+            "--matrix", matrix, "--out", part,
+            "--queries", str(args.queries), "--seed", str(args.seed),
+            "--suites", ",".join(args.suites),
+        ]
+        print(f"[{size} users] running {', '.join(args.suites)} ...", file=sys.stderr)
+        # the backend prints per request; keep it out of the report
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+
+        with open(part) as f:
+            child = json.load(f)
+        os.remove(part)
+        report["runs"].append({"size": size, "dataset": os.path.basename(matrix), **child})
+
+        for r in child["results"]:
+            print(
+                f"  {r['name']:<32} p50 {r['p50_ms']:>10.3f} ms  p95 {r['p95_ms']:>10.3f} ms  "
+                f"p99 {r['p99_ms']:>10.3f} ms  {r['throughput_per_s']:>10} /s",
+                file=sys.stderr,
+            )
+        print(f"  peak RSS {child['peak_rss_mb']} MB", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+        print(f"Benchmark report written to {args.out}", file=sys.stderr)
+    else:
+        print(text)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Recommender benchmarks")
+    parser.add_argument("--sizes", default="1000,10000", help="comma separated user counts (1000 .. 1000000)")
+    parser.add_argument("--queries", type=int, default=200, help="calls per benchmark")
+    parser.add_argument("--suites", default=",".join(SUITES))
+    parser.add_argument("--mean-likes", type=float, default=20)
+    parser.add_argument("--alpha", type=float, default=1.1)
+    parser.add_argument("--log-events", type=int, default=0, help="extra events in the generated log")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default="bench_data")
+    parser.add_argument("--out", default=None, help="JSON report path (default: stdout)")
+    # internal: per-size subprocess
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--matrix", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    args.suites = [s for s in args.suites.split(",") if s]
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+    if not args.child:
+        args.sizes = [int(s) for s in args.sizes.split(",")]
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.child:
+        run_child(args)
+    else:
+        main(args)
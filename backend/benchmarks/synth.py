@@ -0,0 +1,157 @@
+"""
+Synthetic user-item data with power-law movie popularity.
+
+    python -m benchmarks.synth --users 100000 --out bench_data/matrix_100k.csv
+
+Writes the dense matrix CSV the interaction store loads (user_id + one
+0/1 column per movie id), streamed block by block so 1M users never need
+the whole matrix in memory. Optionally also writes an event log next to
+it (`<out>.log`) so replay at startup can be measured too.
+"""
+
+import argparse
+import csv
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from config import IMDB_PATH
+from recommender.event_log import LIKE, DISLIKE
+
+
+BLOCK = 10_000      # users generated per block
+
+
+def catalog_size(imdb_path=IMDB_PATH):
+    return len(pd.read_csv(imdb_path, usecols=["Series_Title"]))
+
+
+def popularity(n_movies, alpha=1.1, seed=0):
+    """Zipf-like like probability per movie (random movie ids get the popular ranks)."""
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, n_movies + 1) ** alpha
+    weights = weights[rng.permutation(n_movies)]
+    return weights / weights.sum()
+
+
+def like_counts(n_users, n_movies, mean_likes=20, rng=None):
+    """Heavy-tailed likes per user (log-normal), at least 1."""
+    rng = rng or np.random.default_rng(0)
+    sigma = 1.0
+    mu = np.log(mean_likes) - sigma ** 2 / 2
+    counts = np.rint(rng.lognormal(mu, sigma, n_users)).astype(np.int64)
+    return np.clip(counts, 1, n_movies)
+
+
+def liked_block(counts, log_popularity, rng):
+    """
+    0/1 matrix for a block of users: user i likes counts[i] distinct movies
+    drawn by popularity (Gumbel top-k, no per-user Python loop).
+    """
+    keys = log_popularity + rng.gumbel(size=(len(counts), len(log_popularity)))
+    order = np.argsort(-keys, axis=1)
+    block = np.zeros(keys.shape, dtype=np.uint8)
+    take = np.arange(keys.shape[1]) < counts[:, None]
+    rows = np.broadcast_to(np.arange(len(counts))[:, None], keys.shape)
+    block[rows[take], order[take]] = 1
+    return block
+
+
+def catalog_columns(catalog, n_movies, rng=None):
+    """
+    Search columns (title, director, stars, votes) of a synthetic catalog
+    of `n_movies`: titles of 1-4 words and names drawn from the real
+    catalog's vocabulary, votes log-normal.
+    """
+    rng = rng or np.random.default_rng(0)
+    words = sorted({w for t in catalog.titles for w in t.split()})
+    people = [n for c in ("Director", "Star1", "Star2", "Star3", "Star4") for n in catalog.columns[c]]
+    first_names = sorted({n.split()[0] for n in people if isinstance(n, str) and " " in n})
+    last_names = sorted({n.split()[-1] for n in people if isinstance(n, str) and " " in n})
+
+    def names(pool_size, n):
+        pool = [f"{first_names[i]} {last_names[j]}" for i, j in zip(
+            rng.integers(0, len(first_names), pool_size), rng.integers(0, len(last_names), pool_size))]
+        return np.array(pool, dtype=object)[rng.integers(0, pool_size, n)]
+
+    lengths = rng.integers(1, 5, n_movies)
+    picks = rng.integers(0, len(words), lengths.sum())
+    title_words = np.split(np.array(words, dtype=object)[picks], np.cumsum(lengths)[:-1])
+    columns = {
+        "Series_Title": np.array([" ".join(t) for t in title_words], dtype=object),
+        "Director": names(n_movies // 20, n_movies),
+        "No_of_Votes": np.rint(rng.lognormal(11, 1.5, n_movies)).astype(np.int64),
+    }
+    for column in ("Star1", "Star2", "Star3", "Star4"):
+        columns[column] = names(n_movies // 5, n_movies)
+    return columns
+
+
+def user_id(i):
+    return f"bench_{i:07d}"
+
+
+def generate(out_path, n_users, n_movies=None, mean_likes=20, alpha=1.1, log_events=0, seed=0):
+    """Write the matrix CSV (and optional event log). Returns a small summary dict."""
+    started = time.perf_counter()
+    n_movies = n_movies or catalog_size()
+    rng = np.random.default_rng(seed)
+    log_popularity = np.log(popularity(n_movies, alpha, seed))
+    counts = like_counts(n_users, n_movies, mean_likes, rng)
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "w", newline="") as f:
+        f.write(",".join(["user_id"] + [str(i) for i in range(n_movies)]) + "\n")
+        for start in range(0, n_users, BLOCK):
+            block = liked_block(counts[start:start + BLOCK], log_popularity, rng)
+
+            # "0,1,0,..." per row without formatting cell by cell
+            cells = np.full((len(block), 2 * n_movies), ord(","), dtype=np.uint8)
+            cells[:, 0::2] = block + ord("0")
+            cells[:, -1] = ord("\n")
+            raw = cells.tobytes().decode("ascii")
+            lines = [raw[i:i + 2 * n_movies] for i in range(0, len(raw), 2 * n_movies)]
+            f.writelines(f"{user_id(start + i)},{line}" for i, line in enumerate(lines))
+    os.replace(tmp_path, out_path)
+
+    log_path = out_path + ".log"
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    if log_events:
+        # mostly likes with some dislikes, by the same popularity
+        users = rng.integers(0, n_users, log_events)
+        movies = rng.choice(n_movies, log_events, p=np.exp(log_popularity))
+        actions = np.where(rng.random(log_events) < 0.8, LIKE, DISLIKE)
+        now = time.time()
+        with open(log_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            for i, (u, m, a) in enumerate(zip(users.tolist(), movies.tolist(), actions.tolist())):
+                writer.writerow([user_id(u), m, a, f"{now + i * 0.001:.3f}"])
+
+    summary = {
+        "users": n_users,
+        "movies": n_movies,
+        "likes": int(counts.sum()),
+        "mean_likes": mean_likes,
+        "alpha": alpha,
+        "log_events": log_events,
+        "seed": seed,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    print(f"Synthetic matrix written: {summary} -> {out_path}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic user-item matrix")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--movies", type=int, default=None, help="default: IMDB catalog size")
+    parser.add_argument("--mean-likes", type=float, default=20)
+    parser.add_argument("--alpha", type=float, default=1.1, help="popularity power-law exponent")
+    parser.add_argument("--log-events", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    generate(args.out, args.users, args.movies, args.mean_likes, args.alpha, args.log_events, args.seed)
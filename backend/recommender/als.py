@@ -0,0 +1,298 @@
+"""
+Implicit-feedback matrix factorization (ALS, Hu/Koren/Volinsky), pure NumPy.
+
+    python -m recommender.als                      (run from backend/, trains a new version)
+    python -m recommender.als --rank 64 --iterations 15
+
+Every like is an observation with confidence 1 + alpha, everything else
+a weak "not liked" with confidence 1. Alternating least squares: with the
+item factors Y fixed, each user vector is
+
+    x_u = (YᵀY + alpha · Y_Lᵀ Y_L + reg · I)⁻¹ · (1 + alpha) · Σ_{i ∈ L} y_i
+
+(L = the user's liked movies), and the same with the roles swapped for
+the items. The user step is also the fold-in: a user who was not in the
+training data, or whose likes changed since, gets a vector from their
+current liked set and the fixed item factors without retraining.
+
+Models are written as versioned directories under ALS_MODEL_DIR:
+
+    v<N>/manifest.json          rank, reg, alpha, iterations, sizes, training time, catalog fingerprint
+    v<N>/item_factors.npy       movies x rank
+    v<N>/user_factors.npy       users x rank
+    v<N>/user_ids.npy           user id per user_factors row
+    v<N>/fingerprints.npy       like-set fingerprint per user at training time
+
+The server loads the highest version at startup, unless it was trained
+on a catalog with other movie ids (then ALS is off until retrained).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from config import ALS_MODEL_DIR, ALS_RANK, ALS_REG, ALS_ALPHA, ALS_ITERATIONS
+from recommender.store import get_store
+from recommender.catalog import get_catalog
+from recommender.precompute import fingerprint
+from recommender.logs import get_logger
+
+logger = get_logger("als")
+
+
+SCHEMA_VERSION = 1
+KEEP_VERSIONS = 3           # older model versions are deleted after training
+ROW_CHUNK = 4096            # rows solved together (rows x rank² gram block)
+COL_CHUNK = 8192            # fixed-side factors expanded to outer products at a time
+
+
+# ---------------- math ----------------
+
+def _solve_rows(matrix, fixed, reg, alpha):
+    """
+    Least-squares step for every row of a CSR like matrix against the
+    fixed factors of the other side. Rows without likes get zero vectors.
+
+    The per-row Y_Lᵀ Y_L terms are one sparse x dense product: the like
+    matrix times the flattened outer products y_i y_iᵀ of the fixed side
+    (chunked over rows and columns to bound memory), then one batched
+    np.linalg.solve per row chunk.
+    """
+    n_rows, n_cols = matrix.shape
+    rank = fixed.shape[1]
+    base = fixed.T @ fixed + reg * np.eye(rank)
+    out = np.zeros((n_rows, rank))
+
+    for row_start in range(0, n_rows, ROW_CHUNK):
+        rows = matrix[row_start:row_start + ROW_CHUNK]
+        active = np.flatnonzero(np.diff(rows.indptr))
+        if not len(active):
+            continue
+        rows = rows[active]
+        by_column = rows.tocsc()
+
+        gram = np.zeros((len(active), rank * rank))
+        for col_start in range(0, n_cols, COL_CHUNK):
+            part = fixed[col_start:col_start + COL_CHUNK]
+            outer = (part[:, :, None] * part[:, None, :]).reshape(len(part), rank * rank)
+            gram += by_column[:, col_start:col_start + COL_CHUNK] @ outer
+
+        lhs = base + alpha * gram.reshape(len(active), rank, rank)
+        rhs = (1 + alpha) * (rows @ fixed)
+        out[row_start + active] = np.linalg.solve(lhs, rhs[:, :, None])[:, :, 0]
+
+    return out
+
+
+def train(matrix, rank=ALS_RANK, reg=ALS_REG, alpha=ALS_ALPHA, iterations=ALS_ITERATIONS, seed=0):
+    """(user_factors, item_factors) for a users x movies CSR like matrix."""
+    rng = np.random.default_rng(seed)
+    n_users, n_movies = matrix.shape
+    users = np.zeros((n_users, rank))
+    items = rng.normal(0, 0.01, (n_movies, rank))
+    transposed = matrix.T.tocsr()
+
+    for iteration in range(1, iterations + 1):
+        started = time.perf_counter()
+        users = _solve_rows(matrix, items, reg, alpha)
+        items = _solve_rows(transposed, users, reg, alpha)
+        logger.info("ALS iteration %s/%s: %.2fs", iteration, iterations, time.perf_counter() - started)
+
+    # one more user step so the saved user vectors match a fold-in on the final items
+    users = _solve_rows(matrix, items, reg, alpha)
+    return users, items
+
+
+# ---------------- artifacts ----------------
+
+def _versions(model_dir):
+    if not model_dir or not os.path.isdir(model_dir):
+        return []
+    return sorted(
+        int(name[1:]) for name in os.listdir(model_dir)
+        if name.startswith("v") and name[1:].isdigit()
+        and os.path.exists(os.path.join(model_dir, name, "manifest.json"))
+    )
+
+
+def save(model_dir, users, items, user_ids, fingerprints, manifest):
+    """Write a new version (staged, then renamed) and prune old ones."""
+    versions = _versions(model_dir)
+    version = versions[-1] + 1 if versions else 1
+    final_dir = os.path.join(model_dir, f"v{version}")
+    tmp_dir = final_dir + ".building"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    np.save(os.path.join(tmp_dir, "item_factors.npy"), items.astype(np.float32))
+    np.save(os.path.join(tmp_dir, "user_factors.npy"), users.astype(np.float32))
+    np.save(os.path.join(tmp_dir, "user_ids.npy"), np.array(user_ids, dtype=str))
+    np.save(os.path.join(tmp_dir, "fingerprints.npy"), fingerprints)
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(dict(manifest, schema=SCHEMA_VERSION, version=version), f, indent=2)
+    os.replace(tmp_dir, final_dir)
+
+    # keep the newest KEEP_VERSIONS, this one included
+    for old in versions[:max(len(versions) - (KEEP_VERSIONS - 1), 0)]:
+        shutil.rmtree(os.path.join(model_dir, f"v{old}"), ignore_errors=True)
+    return version
+
+
+def run(model_dir=ALS_MODEL_DIR, rank=ALS_RANK, reg=ALS_REG, alpha=ALS_ALPHA, iterations=ALS_ITERATIONS):
+    """Train on the current interaction snapshot and save a new model version."""
+    started = time.time()
+    store = get_store(read_only=True)
+    with store.lock:
+        # item factor rows are movie ids of this catalog
+        catalog = get_catalog().fingerprint
+        matrix = store.to_csr()
+        user_ids = list(store.user_ids)
+        fingerprints = np.array(
+            [fingerprint(sorted(liked)) for liked in store.rows], dtype=np.uint32
+        )
+
+    logger.info(
+        "Training ALS: %s users x %s movies, %s likes, rank %s, reg %s, alpha %s, %s iterations",
+        matrix.shape[0], matrix.shape[1], matrix.nnz, rank, reg, alpha, iterations,
+    )
+    users, items = train(matrix, rank, reg, alpha, iterations)
+
+    version = save(model_dir, users, items, user_ids, fingerprints, {
+        "rank": rank,
+        "reg": reg,
+        "alpha": alpha,
+        "iterations": iterations,
+        "users": matrix.shape[0],
+        "movies": matrix.shape[1],
+        "likes": int(matrix.nnz),
+        "catalog": catalog,
+        "created": time.time(),
+        "train_seconds": round(time.time() - started, 2),
+    })
+    logger.info("ALS model v%s written to %s in %.1fs", version, model_dir, time.time() - started)
+    return version
+
+
+# ---------------- serving ----------------
+
+class ALSModel:
+    """Item factors + trained user vectors; fold-in for everyone else."""
+
+    def __init__(self, model_dir, version):
+        path = os.path.join(model_dir, f"v{version}")
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self.version = version
+        self.items = np.load(os.path.join(path, "item_factors.npy")).astype(np.float64)
+        self.users = np.load(os.path.join(path, "user_factors.npy"), mmap_mode="r")
+        self.fingerprints = np.load(os.path.join(path, "fingerprints.npy"), mmap_mode="r")
+        self.user_index = {
+            uid: i for i, uid in enumerate(np.load(os.path.join(path, "user_ids.npy")).tolist())
+        }
+
+        rank = self.items.shape[1]
+        self.alpha = self.manifest["alpha"]
+        self.base = self.items.T @ self.items + self.manifest["reg"] * np.eye(rank)
+
+    def remap(self, mapping, n_movies):
+        """Follow a catalog reload: move item factors to the new movie ids (new movies get zeros)."""
+        kept = np.flatnonzero(mapping >= 0)
+        items = np.zeros((n_movies, self.items.shape[1]))
+        items[mapping[kept]] = self.items[kept]
+        self.base = items.T @ items + self.manifest["reg"] * np.eye(items.shape[1])
+        self.items = items
+
+    def fold_in(self, liked):
+        """User vector from a liked set with the item factors held fixed."""
+        liked_factors = self.items[liked]
+        return np.linalg.solve(
+            self.base + self.alpha * (liked_factors.T @ liked_factors),
+            (1 + self.alpha) * liked_factors.sum(axis=0),
+        )
+
+    def user_vector(self, user_id, liked):
+        """Trained vector while the user's likes are unchanged, fold-in otherwise."""
+        i = self.user_index.get(str(user_id))
+        if i is not None and self.fingerprints[i] == fingerprint(liked):
+            return np.asarray(self.users[i], dtype=np.float64)
+        return self.fold_in(liked)
+
+    def rank(self, user_id, liked, top_n, allowed=None):
+        """Best unseen (and `allowed`) movie ids by x_u · y_i, lower id first on ties."""
+        if not liked or top_n <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        scores = self.items @ self.user_vector(user_id, liked)
+        scores[liked] = -np.inf
+        if allowed is not None:
+            scores[:len(allowed)][~allowed[:len(scores)]] = -np.inf
+        if top_n < len(scores):
+            candidates = np.argpartition(-scores, top_n - 1)[:top_n]
+            # ties at the cut: keep everything scoring at least the k-th best
+            candidates = np.flatnonzero(scores >= scores[candidates].min())
+        else:
+            candidates = np.arange(len(scores))
+        candidates = candidates[np.isfinite(scores[candidates])]
+        order = np.lexsort((candidates, -scores[candidates]))[:top_n]
+        return candidates[order]
+
+
+_model = None
+_model_lock = threading.Lock()
+_model_loaded = False
+
+
+def get_als_model(model_dir=ALS_MODEL_DIR):
+    """Latest trained model (loaded once), or None if there is none usable."""
+    global _model, _model_loaded
+    if not _model_loaded:
+        with _model_lock:
+            if not _model_loaded:
+                versions = _versions(model_dir)
+                if versions:
+                    try:
+                        model = ALSModel(model_dir, versions[-1])
+                        # same row count isn't enough: a reordered or edited CSV moves the ids
+                        if model.manifest.get("catalog") != get_catalog().fingerprint:
+                            raise ValueError("trained on another catalog (movie ids differ), retrain it")
+                        _model = model
+                        logger.info("ALS model v%s loaded (rank %s)", model.version, model.items.shape[1])
+                    except (OSError, ValueError, KeyError) as e:
+                        logger.error("ALS model v%s unusable: %s", versions[-1], e)
+                else:
+                    logger.warning("No ALS model in %s, train one with python -m recommender.als", model_dir)
+                _model_loaded = True
+    return _model
+
+
+def recommend_by_als(user_id, top_n=5, allowed=None):
+    """
+    Dot-product serving: one (movies x rank) · rank product per user.
+    Returns None when no model is available (caller falls back).
+    """
+    model = get_als_model()
+    if model is None:
+        return None
+
+    store = get_store()
+    # liked ids, item factors and titles all move together under this lock (catalog reload);
+    # ranking is one mat-vec, cheap enough to do inside it
+    with store.lock:
+        titles = get_catalog().titles
+        liked = store.liked(user_id)
+        ranked = model.rank(user_id, liked, top_n, allowed)
+    return [titles[m] for m in ranked if m < len(titles)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the implicit ALS model")
+    parser.add_argument("--rank", type=int, default=ALS_RANK)
+    parser.add_argument("--reg", type=float, default=ALS_REG)
+    parser.add_argument("--alpha", type=float, default=ALS_ALPHA)
+    parser.add_argument("--iterations", type=int, default=ALS_ITERATIONS)
+    args = parser.parse_args()
+    run(rank=args.rank, reg=args.reg, alpha=args.alpha, iterations=args.iterations)
@@ -0,0 +1,84 @@
+import numpy as np
+from config import BATCH_BLOCK_SIZE
+from recommender.store import get_store
+from recommender.catalog import get_catalog
+from recommender.recommend import rank_candidates
+
+
+def score_batch(user_ids, min_similarity=0.1, top_neighbours=10, top_n=5, block_size=BATCH_BLOCK_SIZE):
+    """
+    Yields (user_id, neighbour rows, ranked movie ids) in input order.
+
+    Same answers as get_similar_users (exact mode) + recommend_movies for
+    every user, but the co-like counts come from one sparse product per
+    block of users (block x movies @ movies x users) instead of one index
+    walk per user.
+
+    Works on the store's CSR snapshot, so the whole batch sees the same
+    point in time and the store lock is only held while taking it.
+    """
+
+    _, matrix, rows = _snapshot(user_ids)
+    yield from _score(user_ids, matrix, rows, min_similarity, top_neighbours, top_n, block_size)
+
+
+def _snapshot(user_ids):
+    """(titles, CSR, rows) read together: a catalog reload swaps ids and titles under the store lock."""
+    store = get_store()
+    with store.lock:
+        return get_catalog().titles, store.to_csr(), [store.row_of(user_id) for user_id in user_ids]
+
+
+def _score(user_ids, matrix, rows, min_similarity, top_neighbours, top_n, block_size):
+    # to_csr is rebuilt (not mutated) after writes, so reading it unlocked is fine
+    indptr, indices = matrix.indptr, matrix.indices
+    sizes = np.diff(indptr).astype(np.float64)
+    transposed = matrix.T.tocsr()
+    n_movies = matrix.shape[1]
+    empty = np.empty(0, dtype=np.int64)
+
+    for start in range(0, len(user_ids), block_size):
+        block_ids = user_ids[start:start + block_size]
+        block_rows = rows[start:start + block_size]
+
+        active = [row for row in block_rows if row is not None and sizes[row] > 0]
+        shared = (matrix[active] @ transposed).tocsr() if active else None
+        position = {row: i for i, row in enumerate(active)}
+
+        for user_id, row in zip(block_ids, block_rows):
+            if row is None or sizes[row] == 0:
+                yield user_id, empty, empty
+                continue
+
+            i = position[row]
+            lo, hi = shared.indptr[i], shared.indptr[i + 1]
+            candidates = shared.indices[lo:hi].astype(np.int64)
+            counts = shared.data[lo:hi]
+
+            not_self = candidates != row
+            candidates, counts = candidates[not_self], counts[not_self]
+
+            # same float ops as the exact single-user path
+            scores = counts / np.sqrt(sizes[row] * sizes[candidates])
+            keep = scores >= min_similarity
+            candidates, scores = candidates[keep], scores[keep]
+            order = np.lexsort((candidates, -scores))[:top_neighbours]
+            neighbours, weights = candidates[order], scores[order]
+
+            neighbour_likes = [
+                indices[indptr[n]:indptr[n + 1]].astype(np.int64) for n in neighbours
+            ]
+            watched = indices[indptr[row]:indptr[row + 1]]
+
+            ranked = rank_candidates(watched, neighbour_likes, weights, n_movies, top_n)
+            yield user_id, neighbours, ranked
+
+
+def recommend_batch(user_ids, min_similarity=0.1, top_neighbours=10, top_n=5, block_size=BATCH_BLOCK_SIZE):
+    """
+    User-based collaborative filtering for many users in one pass.
+    Yields (user_id, titles) in input order, see `score_batch`.
+    """
+    titles, matrix, rows = _snapshot(user_ids)
+    for user_id, _, ranked in _score(user_ids, matrix, rows, min_similarity, top_neighbours, top_n, block_size):
+        yield user_id, [titles[m] for m in ranked if m < len(titles)]
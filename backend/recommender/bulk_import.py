@@ -0,0 +1,188 @@
+"""
+Bulk import of historical interactions (e.g. a partner's watch history).
+
+    python -m recommender.bulk_import history.csv             (run from backend/)
+    python -m recommender.bulk_import history.csv --chunk-size 100000
+
+The input is a CSV with a header and one event per line:
+
+    user_id,title,action          title as in the catalog (any case / spacing)
+    user_id,movie_id,action       or the catalog row id
+
+action is 1 / like or 0 / dislike. Events are applied in file order.
+
+The file is streamed through a generator pipeline (parse -> chunk ->
+resolve -> dedupe -> apply), so memory is bounded by the chunk size plus
+the store itself. Titles are resolved once per distinct title in a chunk.
+Within a chunk only the last action per (user, movie) is applied. Imported
+events bypass the event log, and the store is written in one pass at the
+end: a single compaction into the matrix snapshot, which also folds in the
+log. Run it with the server stopped, since the server would not see the
+imported rows and its next compaction would overwrite them.
+"""
+
+import argparse
+import csv
+import time
+
+from recommender.store import InteractionStore
+from recommender.catalog import get_catalog
+from recommender.event_log import LIKE, DISLIKE
+from recommender.logs import get_logger
+
+logger = get_logger("import")
+
+
+CHUNK_SIZE = 50_000
+PROGRESS_EVERY = 500_000        # rows between progress lines
+MAX_EXAMPLES = 10               # unresolved titles quoted in the report
+
+ACTIONS = {"1": LIKE, "like": LIKE, "0": DISLIKE, "dislike": DISLIKE}
+MOVIE_COLUMNS = ("movie_id", "title", "movie_title")
+
+
+class ImportStats:
+    def __init__(self):
+        self.rows = 0
+        self.invalid = 0            # malformed line or unknown action
+        self.unresolved = 0         # title / movie id not in the catalog
+        self.duplicates = 0         # superseded by a later event in the same chunk
+        self.applied = 0
+        self.unresolved_examples = []
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_s(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "applied": self.applied,
+            "duplicates": self.duplicates,
+            "unresolved": self.unresolved,
+            "invalid": self.invalid,
+            "seconds": round(self.elapsed, 2),
+            "rows_per_s": round(self.rows_per_s),
+        }
+
+
+# ---------------- pipeline stages ----------------
+
+def read_events(path, stats):
+    """(user_id, movie ref, action) per valid line; movie ref is a title or an int id."""
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader, [])]
+        movie_column = next((name for name in MOVIE_COLUMNS if name in header), None)
+        if "user_id" not in header or "action" not in header or movie_column is None:
+            raise ValueError(f"{path}: header needs user_id, action and one of {', '.join(MOVIE_COLUMNS)}")
+
+        user_col = header.index("user_id")
+        movie_col = header.index(movie_column)
+        action_col = header.index("action")
+        by_id = movie_column == "movie_id"
+
+        for record in reader:
+            stats.rows += 1
+            if stats.rows % PROGRESS_EVERY == 0:
+                logger.info("%s rows read (%.0f rows/s)", stats.rows, stats.rows_per_s)
+            try:
+                user_id = record[user_col].strip()
+                movie = record[movie_col]
+                action = ACTIONS.get(record[action_col].strip().lower())
+                if by_id:
+                    movie = int(movie)
+            except (IndexError, ValueError):
+                stats.invalid += 1
+                continue
+            if not user_id or action is None:
+                stats.invalid += 1
+                continue
+            yield user_id, movie, action
+
+
+def chunked(events, size):
+    chunk = []
+    for event in events:
+        chunk.append(event)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def resolve(chunks, catalog, stats):
+    """Movie refs -> catalog ids, one lookup per distinct title in a chunk."""
+    n_movies = len(catalog)
+    for chunk in chunks:
+        titles = list({movie for _, movie, _ in chunk if isinstance(movie, str)})
+        ids = dict(zip(titles, catalog.resolve_many(titles)))
+
+        resolved = []
+        for user_id, movie, action in chunk:
+            movie_id = ids[movie] if isinstance(movie, str) else movie
+            if movie_id is None or not 0 <= movie_id < n_movies:
+                stats.unresolved += 1
+                if len(stats.unresolved_examples) < MAX_EXAMPLES and movie not in stats.unresolved_examples:
+                    stats.unresolved_examples.append(movie)
+                continue
+            resolved.append((user_id, movie_id, action))
+        yield resolved
+
+
+def dedupe(chunks, stats):
+    """Last action per (user, movie) within a chunk (file order is kept across chunks)."""
+    for chunk in chunks:
+        latest = {}
+        for user_id, movie_id, action in chunk:
+            latest[(user_id, movie_id)] = action
+        stats.duplicates += len(chunk) - len(latest)
+        yield [(user_id, movie_id, action) for (user_id, movie_id), action in latest.items()]
+
+
+# ---------------- driver ----------------
+
+def run(path, chunk_size=CHUNK_SIZE):
+    """Import `path` into the interaction store and write the snapshot once."""
+    stats = ImportStats()
+    catalog = get_catalog()
+    # log only (no compaction thread): it is folded in by the one compaction at the end
+    store = InteractionStore(n_movies=len(catalog)).load()
+    store.log.open()
+    users_before = store.user_count
+
+    try:
+        events = read_events(path, stats)
+        for chunk in dedupe(resolve(chunked(events, chunk_size), catalog, stats), stats):
+            store.apply_unlogged(chunk)
+            stats.applied += len(chunk)
+
+        logger.info("Writing matrix snapshot (%s users)", store.user_count)
+        store.compact()
+    finally:
+        store.log.close()
+
+    report = dict(stats.as_dict(), new_users=store.user_count - users_before, users=store.user_count)
+    logger.info(
+        "Imported %s rows in %.1fs (%s rows/s): %s applied, %s duplicates, "
+        "%s unresolved, %s invalid, %s new users",
+        report["rows"], stats.elapsed, report["rows_per_s"], report["applied"],
+        report["duplicates"], report["unresolved"], report["invalid"], report["new_users"],
+    )
+    if stats.unresolved_examples:
+        logger.warning("Unresolved movies, e.g.: %s", ", ".join(map(str, stats.unresolved_examples)))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import interactions into the user-item store")
+    parser.add_argument("path", help="CSV with user_id, title or movie_id, action")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="events resolved / applied together")
+    args = parser.parse_args()
+    run(args.path, args.chunk_size)
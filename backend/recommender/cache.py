@@ -0,0 +1,62 @@
+import threading
+import zlib
+from collections import OrderedDict
+
+
+class RecommendationCache:
+    """
+    Bounded LRU of /recommend responses.
+
+    Keys are (user_id, interaction version, tier, opened movie id). The
+    store bumps a user's version on each of their likes/dislikes, so the
+    next request after an action misses and recomputes; old entries just
+    age out of the LRU.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def seed(key):
+        """
+        Stable per-key seed for the cold-start shuffle, so a recomputed
+        entry (e.g. after eviction) comes out the same as the cached one.
+        """
+        return zlib.crc32(repr(key).encode("utf-8"))
+
+    def get(self, key):
+        with self.lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry (e.g. after a catalog reload changed the cards)."""
+        with self.lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }
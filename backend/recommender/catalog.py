@@ -0,0 +1,246 @@
+import contextlib
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+from config import IMDB_PATH, CATALOG_SNAPSHOT_DIR
+from recommender.validator import normalize_title
+from recommender.genre_index import GenreIndex, GenreListings
+from recommender.catalog_snapshot import load_catalog_data
+from recommender.content import SimilarMovies
+from recommender.search import SearchIndex
+from recommender.facets import FacetIndex
+from recommender.metrics import timed
+from recommender.logs import get_logger
+
+logger = get_logger("catalog")
+
+
+class Catalog:
+    """
+    The movie dataset plus the lookup structures every endpoint shares.
+
+    Movie id = row position in the IMDB CSV (same as the matrix columns).
+    Titles are matched through `normalize_title`, so every endpoint agrees
+    on what "the same title" means. For duplicate titles the first
+    dataset row wins, as with the old DataFrame scans.
+
+    Built from a CatalogData (memory-mapped snapshot or parsed CSV, see
+    catalog_snapshot.py). `numeric` holds parsed year/runtime/gross,
+    `similar` the content neighbour lists (content.py), `search` the
+    typeahead index over titles and people (search.py), `facets` the
+    filter indexes (facets.py). Never modified
+    after construction; a reload builds a new Catalog (CatalogManager).
+    """
+
+    def __init__(self, data):
+        self.columns = data.columns
+        self.numeric = data.numeric
+        self.source = data.source
+        self.titles = self.columns["Series_Title"]
+
+        # id -> row dict with plain Python values (jsonify-safe)
+        names = list(self.columns)
+        values = [self.columns[name].tolist() for name in names]
+        self.records = [dict(zip(names, row)) for row in zip(*values)]
+
+        self.title_ids = {}
+        for movie_id, title in enumerate(self.titles):
+            self.title_ids.setdefault(normalize_title(title), movie_id)
+
+        # same fingerprint <=> same titles in the same order, i.e. same movie ids
+        self.fingerprint = zlib.crc32("\n".join(self.normalized_titles()).encode("utf-8"))
+
+        self.genres = GenreIndex(self.columns, data.genres, data.genre_matrix)
+        self.listings = GenreListings(self.records, self.genres)
+
+        if data.similar is not None:
+            self.similar = SimilarMovies(*data.similar)
+        else:
+            self.similar = SimilarMovies.build(self.columns)
+
+        self.search = SearchIndex(self.columns)
+        self.facets = FacetIndex(self.columns, self.numeric, self.genres)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def normalized_titles(self):
+        """Normalized titles in movie id order."""
+        return [normalize_title(t) if isinstance(t, str) else "" for t in self.titles]
+
+    def resolve(self, title):
+        """movie id for a title (any case / surrounding spaces), or None."""
+        if not isinstance(title, str):
+            return None
+        return self.title_ids.get(normalize_title(title))
+
+    def resolve_many(self, titles):
+        """Batch version of `resolve`: one dict lookup per title."""
+        return [self.resolve(title) for title in titles]
+
+    def record(self, movie_id):
+        return self.records[movie_id]
+
+    def rows(self, titles):
+        """(movie_id, record) for every title that resolves, input order kept."""
+        return [
+            (movie_id, self.records[movie_id])
+            for movie_id in self.resolve_many(titles)
+            if movie_id is not None
+        ]
+
+
+def movie_id_mapping(old, new):
+    """
+    mapping[old movie id] = id of the same title in `new`, -1 if it is gone.
+    Duplicate titles are matched in dataset order.
+    """
+    new_ids = {}
+    for movie_id, title in enumerate(new.normalized_titles()):
+        new_ids.setdefault(title, []).append(movie_id)
+
+    mapping = np.full(len(old), -1, dtype=np.int64)
+    for movie_id, title in enumerate(old.normalized_titles()):
+        candidates = new_ids.get(title)
+        if candidates:
+            mapping[movie_id] = candidates.pop(0)
+    return mapping
+
+
+def _source_fingerprint(csv_path):
+    try:
+        stat = os.stat(csv_path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class CatalogManager:
+    """
+    Owns the live Catalog and replaces it on reload.
+
+    A reload builds a complete new Catalog (snapshot, lookup, genre and
+    content structures) on the calling thread, lets the listeners move
+    their state to the new movie ids, then publishes it with one reference
+    assignment. Requests call get_catalog() once and keep that object,
+    so a request in flight finishes on the catalog it started with.
+
+    The listeners and the swap run inside `swap_guard` (set with
+    guard_swaps; the server uses the interaction store's exclusive
+    section), so whoever holds the store lock sees the store's movie ids
+    and the live catalog change together. The preparers run before the
+    guard is taken, for the work that can be done aside.
+    """
+
+    def __init__(self, csv_path=IMDB_PATH, snapshot_dir=CATALOG_SNAPSHOT_DIR):
+        self.csv_path = csv_path
+        self.snapshot_dir = snapshot_dir
+        self.preparers = []             # fn(old, new, mapping) before swap_guard is taken
+        self.listeners = []             # fn(old, new, mapping) before the swap
+        self.swap_guard = contextlib.nullcontext    # held across the listeners and the swap
+        self.reloads = 0
+        self._catalog = None
+        self._source = None             # (size, mtime) of the CSV the live catalog came from
+        self._lock = threading.Lock()   # one build at a time
+        self._watcher = None
+        self._stop = threading.Event()
+
+    def _build(self):
+        source = _source_fingerprint(self.csv_path)
+        catalog = Catalog(load_catalog_data(self.csv_path, self.snapshot_dir))
+        return catalog, source
+
+    def get(self):
+        """The live catalog, loaded on first use."""
+        catalog = self._catalog
+        if catalog is None:
+            with self._lock:
+                if self._catalog is None:
+                    with timed("catalog_load"):
+                        self._catalog, self._source = self._build()
+                catalog = self._catalog
+        return catalog
+
+    def add_preparer(self, preparer):
+        self.preparers.append(preparer)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def guard_swaps(self, guard):
+        """`guard()` (a context manager) is entered around the listeners and the swap."""
+        self.swap_guard = guard
+
+    def reload(self, force=False):
+        """
+        Rebuild from the CSV and swap the new catalog in. Returns a summary,
+        or None when the CSV is unchanged (unless force). Raises if the new
+        CSV can't be loaded; the live catalog stays in place then.
+        """
+        self.get()
+        with self._lock:
+            if not force and _source_fingerprint(self.csv_path) == self._source:
+                return None
+
+            started = time.perf_counter()
+            with timed("catalog_reload"):
+                new, source = self._build()
+                old = self._catalog
+                mapping = movie_id_mapping(old, new)
+                for preparer in self.preparers:
+                    preparer(old, new, mapping)
+                with self.swap_guard():
+                    for listener in self.listeners:
+                        listener(old, new, mapping)
+                    self._catalog, self._source = new, source
+            self.reloads += 1
+
+        kept = mapping[mapping >= 0]
+        summary = {
+            "movies": len(new),
+            "added": len(new) - len(kept),
+            "removed": int((mapping < 0).sum()),
+            "moved": int((kept != np.flatnonzero(mapping >= 0)).sum()),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        logger.info(
+            "Catalog reloaded: %s movies (%s added, %s removed, %s moved) in %.2fs",
+            summary["movies"], summary["added"], summary["removed"], summary["moved"], summary["seconds"],
+        )
+        return summary
+
+    def watch(self, interval):
+        """Reload in the background when the CSV's size/mtime change."""
+        if self._watcher is not None or not interval:
+            return
+        self._watcher = threading.Thread(
+            target=self._watch_loop, args=(interval,), name="catalog-watch", daemon=True
+        )
+        self._watcher.start()
+
+    def _watch_loop(self, interval):
+        seen = self._source
+        while not self._stop.wait(interval):
+            current = _source_fingerprint(self.csv_path)
+            # wait until the file stops changing (one quiet interval) before reloading
+            if current is not None and current != self._source and current == seen:
+                try:
+                    self.reload()
+                except (OSError, ValueError, KeyError) as e:
+                    logger.error("catalog reload failed, keeping the current catalog: %s", e)
+                    self._source = current     # don't retry until the file changes again
+            seen = current
+
+    def close(self):
+        self._stop.set()
+
+
+catalogs = CatalogManager()
+
+
+def get_catalog():
+    """Return the process-wide (live) catalog, loading it on first use."""
+    return catalogs.get()
@@ -0,0 +1,285 @@
+"""
+Typed, columnar binary snapshot of the movie catalog.
+
+    python -m recommender.catalog_snapshot        (run from backend/)
+
+Layout of the snapshot directory: `current` names the live version
+directory, which holds the files (older versions are deleted, open
+mmaps of them stay valid):
+
+    current                    name of the live version, e.g. v1760000000000000000-1234
+    v<ns>-<pid>/               one complete snapshot:
+    manifest.json              schema, row count, column kinds, source CSV fingerprint
+    <col>.npy                  numeric CSV columns (float64 / int64)
+    <col>.blob.npy             string columns: utf-8 bytes of all values back to back
+    <col>.offsets.npy          ... value i is blob[offsets[i]:offsets[i + 1]]
+    <col>.null.npy             ... True where the CSV cell was empty
+    num_<name>.npy             parsed numeric columns (year, runtime, gross; -1 = unknown)
+    genre_matrix.npy           movie x genre 0/1 matrix (genre names in the manifest)
+    similar_ids.npy            movie x CONTENT_NEIGHBOURS content neighbours (-1 = none)
+    similar_scores.npy         ... and their cosine similarities
+
+Everything is opened with np.load(mmap_mode="r"), so startup does no CSV
+parsing. The numeric, genre and neighbour arrays stay mapped and worker
+processes share their pages; string columns are decoded into Python
+objects in every process (so are the Catalog's records and lookup
+tables built from them, about 5 MB for the top 1000 dataset). The
+snapshot is rebuilt when the CSV's size or mtime (or CONTENT_NEIGHBOURS)
+no longer match the manifest, and the CSV is used directly if the
+snapshot can't be built.
+"""
+
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+from config import IMDB_PATH, CATALOG_SNAPSHOT_DIR, CONTENT_NEIGHBOURS
+from recommender.genre_index import GenreIndex
+from recommender.content import build_neighbours
+from recommender.logs import get_logger
+
+logger = get_logger("catalog")
+
+
+SCHEMA_VERSION = 2
+KEEP_VERSIONS = 3       # newest version dirs kept (besides the live one)
+
+
+class CatalogData:
+    """Raw material for a Catalog: columns in CSV order plus derived arrays."""
+
+    def __init__(self, columns, numeric, genres=None, genre_matrix=None, similar=None, source="csv"):
+        self.columns = columns              # name -> np.ndarray (strings as object, None = missing)
+        self.numeric = numeric              # year / runtime / gross as int arrays
+        self.genres = genres                # genre names, or None to derive
+        self.genre_matrix = genre_matrix    # movie x genre matrix, or None to derive
+        self.similar = similar              # (ids, scores) content neighbours, or None to derive
+        self.source = source
+
+
+def _fingerprint(csv_path):
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _leading_int(values):
+    """'142 min' -> 142, '28,341,469' -> 28341469, anything else -> -1."""
+    out = np.full(len(values), -1, dtype=np.int64)
+    for i, value in enumerate(values):
+        if not isinstance(value, str):
+            continue
+        digits = value.split(" ")[0].replace(",", "")
+        if digits.isdigit():
+            out[i] = int(digits)
+    return out
+
+
+def derive_numeric(columns):
+    """Numeric versions of the string-typed CSV columns."""
+    return {
+        "year": _leading_int(columns["Released_Year"]),
+        "runtime": _leading_int(columns["Runtime"]),
+        "gross": _leading_int(columns["Gross"]),
+    }
+
+
+def read_csv_columns(csv_path=IMDB_PATH):
+    df = pd.read_csv(csv_path)
+    columns = {}
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_numeric_dtype(series):
+            columns[name] = series.to_numpy()
+        else:
+            values = series.to_numpy(dtype=object)
+            values[series.isna().to_numpy()] = None
+            columns[name] = values
+    return CatalogData(columns, derive_numeric(columns), source="csv")
+
+
+# ---------------- build ----------------
+
+def build_snapshot(csv_path=IMDB_PATH, out_dir=CATALOG_SNAPSHOT_DIR):
+    """
+    Convert the CSV into a new version of the snapshot directory and
+    point `current` at it (one atomic file replace, so readers always
+    find a complete snapshot). Several processes may build at once
+    (pre-fork workers starting on a stale snapshot): each writes its own
+    version, and one that finds a fresh snapshot already live drops its own.
+    """
+    data = read_csv_columns(csv_path)
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_dir = os.path.join(out_dir, f".building-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    kinds = {}
+    for name, values in data.columns.items():
+        if values.dtype != object:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), values)
+            kinds[name] = "numeric"
+            continue
+
+        encoded = [v.encode("utf-8") if v is not None else b"" for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        np.save(os.path.join(tmp_dir, f"{name}.blob.npy"), blob)
+        np.save(os.path.join(tmp_dir, f"{name}.offsets.npy"), offsets)
+        np.save(os.path.join(tmp_dir, f"{name}.null.npy"), np.array([v is None for v in values]))
+        kinds[name] = "string"
+
+    for name, values in data.numeric.items():
+        np.save(os.path.join(tmp_dir, f"num_{name}.npy"), values)
+
+    genre_index = GenreIndex(data.columns)
+    np.save(os.path.join(tmp_dir, "genre_matrix.npy"), genre_index.matrix)
+
+    similar_ids, similar_scores = build_neighbours(data.columns, CONTENT_NEIGHBOURS)
+    np.save(os.path.join(tmp_dir, "similar_ids.npy"), similar_ids)
+    np.save(os.path.join(tmp_dir, "similar_scores.npy"), similar_scores)
+
+    manifest = {
+        "schema": SCHEMA_VERSION,
+        "rows": len(next(iter(data.columns.values()))),
+        "columns": kinds,
+        "numeric": list(data.numeric),
+        "genres": genre_index.genres,
+        "content_neighbours": CONTENT_NEIGHBOURS,
+        "source": _fingerprint(csv_path),
+    }
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    if is_fresh(csv_path, out_dir):
+        # another process got there first with the same CSV
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return _read_manifest(_live_dir(out_dir))
+
+    version = f"v{time.time_ns()}-{os.getpid()}"
+    os.replace(tmp_dir, os.path.join(out_dir, version))
+    pointer = os.path.join(out_dir, f".current-{os.getpid()}")
+    with open(pointer, "w") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(out_dir, "current"))
+    _prune_versions(out_dir, version)
+
+    logger.info("Catalog snapshot built: %s movies -> %s", manifest["rows"], out_dir)
+    return manifest
+
+
+def _versions(out_dir):
+    # oldest first (the names start with the build time in ns)
+    return sorted(name for name in os.listdir(out_dir) if name.startswith("v"))
+
+
+def _prune_versions(out_dir, live):
+    # the newest few stay: another process may be about to point `current` at one
+    current = os.path.basename(_live_dir(out_dir) or "")
+    for name in _versions(out_dir)[:-KEEP_VERSIONS]:
+        if name not in (live, current):
+            shutil.rmtree(os.path.join(out_dir, name), ignore_errors=True)
+    # files of the old single-directory layout
+    for name in os.listdir(out_dir):
+        if name.endswith(".npy") or name == "manifest.json":
+            try:
+                os.remove(os.path.join(out_dir, name))
+            except FileNotFoundError:
+                pass
+
+
+# ---------------- load ----------------
+
+def _live_dir(snapshot_dir):
+    """Directory of the live version, or None if nothing was built yet."""
+    try:
+        with open(os.path.join(snapshot_dir, "current")) as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    return os.path.join(snapshot_dir, version) if version else None
+
+
+def _read_manifest(version_dir):
+    if version_dir is None:
+        return None
+    try:
+        with open(os.path.join(version_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if isinstance(manifest, dict) else None
+
+
+def is_fresh(csv_path=IMDB_PATH, snapshot_dir=CATALOG_SNAPSHOT_DIR):
+    manifest = _read_manifest(_live_dir(snapshot_dir))
+    return (
+        manifest is not None
+        and manifest.get("schema") == SCHEMA_VERSION
+        and manifest.get("source") == _fingerprint(csv_path)
+        and manifest.get("content_neighbours") == CONTENT_NEIGHBOURS
+    )
+
+
+def _decode_strings(blob, offsets, nulls):
+    raw = blob.tobytes()
+    bounds = offsets.tolist()
+    out = np.empty(len(nulls), dtype=object)
+    out[:] = [
+        None if null else raw[start:end].decode("utf-8")
+        for null, start, end in zip(nulls.tolist(), bounds, bounds[1:])
+    ]
+    return out
+
+
+def open_snapshot(snapshot_dir=CATALOG_SNAPSHOT_DIR):
+    """Memory-map a snapshot. Numeric arrays stay mapped, strings are decoded once."""
+    version_dir = _live_dir(snapshot_dir)
+    manifest = _read_manifest(version_dir)
+    if manifest is None or manifest.get("schema") != SCHEMA_VERSION:
+        raise ValueError(f"no usable catalog snapshot in {snapshot_dir}")
+
+    def load(name):
+        return np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode="r")
+
+    columns = {}
+    for name, kind in manifest["columns"].items():
+        if kind == "numeric":
+            columns[name] = load(name)
+        else:
+            columns[name] = _decode_strings(
+                load(f"{name}.blob"), load(f"{name}.offsets"), load(f"{name}.null")
+            )
+
+    numeric = {name: load(f"num_{name}") for name in manifest["numeric"]}
+    return CatalogData(
+        columns,
+        numeric,
+        genres=manifest["genres"],
+        genre_matrix=load("genre_matrix"),
+        similar=(load("similar_ids"), load("similar_scores")),
+        source="snapshot",
+    )
+
+
+def load_catalog_data(csv_path=IMDB_PATH, snapshot_dir=CATALOG_SNAPSHOT_DIR):
+    """
+    Snapshot if it matches the CSV, otherwise rebuild it; if that fails
+    (e.g. read-only data dir) fall back to parsing the CSV.
+    """
+    if snapshot_dir:
+        try:
+            if not is_fresh(csv_path, snapshot_dir):
+                logger.info("Catalog snapshot missing or stale -> rebuilding")
+                build_snapshot(csv_path, snapshot_dir)
+            return open_snapshot(snapshot_dir)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("catalog snapshot unusable, falling back to CSV: %s", e)
+    return read_csv_columns(csv_path)
+
+
+if __name__ == "__main__":
+    build_snapshot()
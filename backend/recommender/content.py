@@ -0,0 +1,128 @@
+"""
+Content-based "more like this" lists from Overview, Director, Stars and Genre.
+
+Each movie gets a sparse feature vector, the weighted concatenation of
+
+    * TF-IDF over the Overview words (English stop words dropped)
+    * TF-IDF over its people ("d:<director>", "s:<star>"), so a rarely
+      credited director counts for more than a star of 40 films
+    * TF-IDF over its genres
+
+each block L2-normalized, and the whole vector normalized again, so
+dot product = cosine similarity. The top CONTENT_NEIGHBOURS movies per
+movie are precomputed (with the catalog snapshot, see catalog_snapshot.py)
+into two movies x K arrays; serving is a row slice.
+"""
+
+import numpy as np
+from scipy.sparse import hstack
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+from config import CONTENT_NEIGHBOURS
+
+
+OVERVIEW_WEIGHT = 1.0
+PEOPLE_WEIGHT = 1.0
+GENRE_WEIGHT = 0.5
+CHUNK_SIZE = 2048           # movies whose similarity rows are materialized at once
+
+STAR_COLUMNS = ("Star1", "Star2", "Star3", "Star4")
+
+
+def _people(columns):
+    people = []
+    for movie_id in range(len(columns["Series_Title"])):
+        names = []
+        director = columns["Director"][movie_id]
+        if isinstance(director, str):
+            names.append("d:" + director.strip().lower())
+        for column in STAR_COLUMNS:
+            star = columns[column][movie_id]
+            if isinstance(star, str):
+                names.append("s:" + star.strip().lower())
+        people.append(names)
+    return people
+
+
+def _genres(columns):
+    return [
+        [g.strip().lower() for g in genre.split(",")] if isinstance(genre, str) else []
+        for genre in columns["Genre"]
+    ]
+
+
+def _block(docs, weight, **options):
+    """Row-normalized TF-IDF block; empty vocabulary -> no columns."""
+    try:
+        features = TfidfVectorizer(**options).fit_transform(docs)
+    except ValueError:          # every document empty
+        return None
+    return normalize(features) * weight
+
+
+def build_features(columns):
+    """movies x features CSR matrix, rows L2-normalized."""
+    overviews = [o if isinstance(o, str) else "" for o in columns["Overview"]]
+    # lists of tokens go straight through (no tokenizing / lowercasing)
+    prebuilt = dict(analyzer=lambda tokens: tokens)
+
+    blocks = [
+        _block(overviews, OVERVIEW_WEIGHT, stop_words="english", sublinear_tf=True),
+        _block(_people(columns), PEOPLE_WEIGHT, **prebuilt),
+        _block(_genres(columns), GENRE_WEIGHT, **prebuilt),
+    ]
+    return normalize(hstack([b for b in blocks if b is not None]).tocsr())
+
+
+def build_neighbours(columns, k=CONTENT_NEIGHBOURS):
+    """
+    (ids, scores): movies x k arrays of the most similar other movies,
+    best first, lower id first on ties. Rows with fewer than k movies
+    sharing any feature are padded with id -1 / score 0.
+    """
+    features = build_features(columns)
+    n = features.shape[0]
+    k = max(min(k, n - 1), 0)
+    ids = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+    if k == 0:
+        return ids, scores
+
+    transposed = features.T.tocsc()
+    for start in range(0, n, CHUNK_SIZE):
+        sims = (features[start:start + CHUNK_SIZE] @ transposed).toarray()
+        rows = np.arange(len(sims))
+        sims[rows, start + rows] = -1           # never your own neighbour
+
+        for row, movie_sims in enumerate(sims):
+            candidates = np.argpartition(-movie_sims, k - 1)[:k]
+            # ties at the cut: keep everything scoring at least the k-th best
+            candidates = np.flatnonzero(movie_sims >= movie_sims[candidates].min())
+            candidates = candidates[movie_sims[candidates] > 0]
+            order = np.lexsort((candidates, -movie_sims[candidates]))[:k]
+            ids[start + row, :len(order)] = candidates[order]
+            scores[start + row, :len(order)] = movie_sims[candidates[order]]
+
+    return ids, scores
+
+
+class SimilarMovies:
+    """Precomputed content neighbour lists (see build_neighbours)."""
+
+    def __init__(self, ids, scores):
+        self.ids = ids
+        self.scores = scores
+
+    @classmethod
+    def build(cls, columns, k=CONTENT_NEIGHBOURS):
+        return cls(*build_neighbours(columns, k))
+
+    @property
+    def k(self):
+        return self.ids.shape[1]
+
+    def similar(self, movie_id, top_n=10):
+        """(movie ids, scores) most like `movie_id`, best first."""
+        ids = self.ids[movie_id, :top_n]
+        valid = ids >= 0
+        return np.asarray(ids[valid], dtype=np.int64), np.asarray(self.scores[movie_id, :top_n][valid])
@@ -0,0 +1,178 @@
+import csv
+import io
+import os
+import threading
+import time
+
+from recommender.logs import get_logger
+
+logger = get_logger("event_log")
+
+
+LIKE = 1
+DISLIKE = 0
+
+
+class EventLog:
+    """
+    Append-only write-ahead log of user actions.
+
+    One CSV line per event: user_id,movie_id,action,timestamp
+
+    Write-behind with group commit: `append` only queues the line in
+    memory, a single flusher thread writes everything queued in one
+    write + fsync once `fsync_every` events are waiting or
+    `fsync_interval_ms` has passed. Request threads never touch the disk;
+    a crash loses at most the last interval. `close` flushes what is left.
+
+    During compaction the active file is moved aside to `<path>.compacting`
+    so new events keep going to a fresh file while the snapshot is written.
+    """
+
+    def __init__(self, path, fsync_every=64, fsync_interval_ms=200):
+        self.path = path
+        self.compacting_path = path + ".compacting"
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval_ms / 1000.0
+        self.lock = threading.Lock()            # guards the queue (held for microseconds)
+        self.io_lock = threading.Lock()         # guards the file (held while writing)
+        self.wakeup = threading.Condition(self.lock)
+        self.count = 0          # events in the active file (written or queued)
+        self._queue = []        # formatted lines not written yet
+        self._file = None
+        self._flusher = None
+        self._stop = False
+
+    # ---------------- reading ----------------
+
+    @staticmethod
+    def read(path):
+        """
+        Yield (user_id, movie_id, action, timestamp) from a log file.
+        A torn last line (crash mid-write) is skipped.
+        """
+        if not os.path.exists(path):
+            return
+        with open(path, newline="") as f:
+            for record in csv.reader(f):
+                if len(record) != 4:
+                    continue
+                try:
+                    yield record[0], int(record[1]), int(record[2]), float(record[3])
+                except ValueError:
+                    continue
+
+    def replay(self):
+        """Events not yet covered by the snapshot, oldest first."""
+        yield from self.read(self.compacting_path)
+        yield from self.read(self.path)
+
+    # ---------------- writing ----------------
+
+    def open(self):
+        with self.io_lock:
+            if self._file is None:
+                self.count = sum(1 for _ in self.read(self.path))
+                self._file = open(self.path, "a", newline="")
+        with self.lock:
+            if self._flusher is None:
+                self._stop = False
+                self._flusher = threading.Thread(
+                    target=self._flush_loop, name="interaction-log-flusher", daemon=True
+                )
+                self._flusher.start()
+        return self
+
+    def append(self, user_id, movie_id, action, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+
+        line = io.StringIO()
+        csv.writer(line).writerow([user_id, movie_id, action, f"{timestamp:.3f}"])
+
+        with self.lock:
+            self._queue.append(line.getvalue())
+            self.count += 1
+            if len(self._queue) >= self.fsync_every:
+                self.wakeup.notify()
+
+    @property
+    def pending(self):
+        """Events queued but not on disk yet."""
+        with self.lock:
+            return len(self._queue)
+
+    def _flush_loop(self):
+        while True:
+            with self.lock:
+                if not self._stop and len(self._queue) < self.fsync_every:
+                    self.wakeup.wait(self.fsync_interval)
+                if self._stop:
+                    return
+            try:
+                self.flush()
+            except OSError as e:
+                logger.error("interaction log flush failed: %s", e)
+
+    def _write_queued(self):
+        # caller holds io_lock; the queue is swapped out so appends don't wait on the disk
+        with self.lock:
+            lines, self._queue = self._queue, []
+        if lines and self._file is not None:
+            self._file.write("".join(lines))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def flush(self):
+        """Write and fsync everything queued so far (one group commit)."""
+        with self.io_lock:
+            self._write_queued()
+
+    def rotate(self):
+        """
+        Move the active file aside for compaction and start a new one.
+        Queued events go to the old file first (they are already in the
+        rows being compacted). If an earlier compaction died half way its
+        file is still there, so the active events are appended to it
+        instead of replacing it. A log that was never opened (read-only
+        stores) only has its file moved aside, if there is one.
+        """
+        with self.io_lock:
+            self._write_queued()
+            was_open = self._file is not None
+            if was_open:
+                self._file.close()
+
+            if not os.path.exists(self.path):
+                pass
+            elif os.path.exists(self.compacting_path):
+                with open(self.path, newline="") as src, open(self.compacting_path, "a", newline="") as dst:
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self.compacting_path)
+
+            self._file = open(self.path, "a", newline="") if was_open else None
+            with self.lock:
+                self.count = len(self._queue)
+
+    def finish_compaction(self):
+        """The snapshot now covers the rotated events, drop them."""
+        if os.path.exists(self.compacting_path):
+            os.remove(self.compacting_path)
+
+    def close(self):
+        """Stop the flusher and write out whatever is still queued."""
+        with self.lock:
+            self._stop = True
+            self.wakeup.notify()
+            flusher, self._flusher = self._flusher, None
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join()
+        with self.io_lock:
+            if self._file is not None:
+                self._write_queued()
+                self._file.close()
+                self._file = None
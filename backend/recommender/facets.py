@@ -0,0 +1,172 @@
+"""
+Faceted filtering: year / rating / runtime / votes / gross ranges and
+certificates, used by /get_genre_movies and /recommend.
+
+Built once per catalog from the already parsed numeric columns:
+
+    * range facets: movie ids sorted by value (unknown values left out),
+      so a range is two searchsorted calls and one slice; each movie's
+      position in that order is kept too, so further ranges are checked
+      on the (smaller) slice with one comparison each
+    * certificates: one packed bitset per value, ANDed with the genre's
+      bitset (from the genre matrix) a byte for 8 movies at a time
+
+`mask` turns a set of filters into one boolean array over movie ids.
+"""
+
+import numpy as np
+
+
+RANGE_FACETS = ("year", "rating", "runtime", "votes", "gross")
+
+
+class Filters:
+    """Parsed filter values (see parse_filters); `key` identifies them in caches."""
+
+    def __init__(self, ranges, certificates):
+        self.ranges = ranges                # facet -> (low, high), None = open end
+        self.certificates = certificates    # normalized certificate values, or None
+
+    @property
+    def key(self):
+        return (tuple(sorted(self.ranges.items())), self.certificates)
+
+
+def _certificate_key(value):
+    return value.strip().upper()
+
+
+def parse_filters(params):
+    """
+    (Filters or None, error) from request args or a JSON object: any of
+    <facet>_min / <facet>_max (numbers) and certificate (a list, or a
+    comma separated string). (None, None) when no filter is given.
+    """
+    if params is None:
+        return None, None
+    if not hasattr(params, "get"):
+        return None, "filters must be an object"
+
+    ranges = {}
+    for facet in RANGE_FACETS:
+        bounds = []
+        for end in ("min", "max"):
+            value = params.get(f"{facet}_{end}")
+            if value is None or value == "":
+                bounds.append(None)
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return None, f"{facet}_{end} must be a number"
+            if np.isnan(value):
+                return None, f"{facet}_{end} must be a number"
+            bounds.append(value)
+        if bounds != [None, None]:
+            ranges[facet] = tuple(bounds)
+
+    certificates = params.get("certificate")
+    if isinstance(certificates, str):
+        certificates = certificates.split(",")
+    if certificates is not None:
+        if not isinstance(certificates, list) or not all(isinstance(c, str) for c in certificates):
+            return None, "certificate must be a string or a list of strings"
+        certificates = tuple(sorted({_certificate_key(c) for c in certificates if c.strip()})) or None
+
+    if not ranges and certificates is None:
+        return None, None
+    return Filters(ranges, certificates), None
+
+
+class FacetIndex:
+    """Sorted range indexes and certificate / genre bitsets over one catalog."""
+
+    def __init__(self, columns, numeric, genre_index):
+        self.n_movies = n = len(columns["Series_Title"])
+
+        ratings = np.asarray(columns["IMDB_Rating"], dtype=np.float64)
+        values = {
+            "year": numeric["year"],
+            "rating": ratings,
+            "runtime": numeric["runtime"],
+            "votes": np.asarray(columns["No_of_Votes"], dtype=np.int64),
+            "gross": numeric["gross"],
+        }
+        known = {
+            "year": numeric["year"] >= 0,
+            "rating": ~np.isnan(ratings),
+            "runtime": numeric["runtime"] >= 0,
+            "votes": np.ones(n, dtype=bool),
+            "gross": numeric["gross"] >= 0,
+        }
+
+        self.order = {}         # facet -> movie ids with a known value, by value
+        self.sorted = {}        # facet -> their values, ascending
+        self.position = {}      # facet -> movie id -> index into order (-1 = unknown)
+        for facet in RANGE_FACETS:
+            ids = np.flatnonzero(known[facet])
+            order = ids[np.argsort(values[facet][ids], kind="stable")]
+            position = np.full(n, -1, dtype=np.int64)
+            position[order] = np.arange(len(order))
+            self.order[facet] = order
+            self.sorted[facet] = values[facet][order]
+            self.position[facet] = position
+
+        self.certificates = {}  # normalized value -> packed bitset
+        by_value = {}
+        for movie_id, value in enumerate(columns["Certificate"]):
+            if isinstance(value, str) and value.strip():
+                by_value.setdefault(_certificate_key(value), []).append(movie_id)
+        for value, ids in by_value.items():
+            self.certificates[value] = self._bits(ids)
+
+        self.genres = {
+            genre.lower(): np.packbits(genre_index.matrix[:, i].astype(bool))
+            for genre, i in genre_index.genre_ids.items()
+        }
+
+    def _bits(self, ids):
+        members = np.zeros(self.n_movies, dtype=bool)
+        members[ids] = True
+        return np.packbits(members)
+
+    def _range(self, facet, low, high):
+        """[start, end) of the movies with low <= value <= high in self.order[facet]."""
+        values = self.sorted[facet]
+        start = 0 if low is None else np.searchsorted(values, low, side="left")
+        end = len(values) if high is None else np.searchsorted(values, high, side="right")
+        return start, max(start, end)
+
+    def mask(self, filters, genre=None):
+        """Boolean array over movie ids: in `genre` (if given) and passing every filter."""
+        bits = None
+        if genre is not None:
+            bits = self.genres.get(genre.strip().lower())
+            if bits is None:
+                return np.zeros(self.n_movies, dtype=bool)
+        if filters is not None and filters.certificates is not None:
+            allowed = np.zeros((self.n_movies + 7) // 8, dtype=np.uint8)
+            for value in filters.certificates:
+                if value in self.certificates:
+                    allowed |= self.certificates[value]
+            bits = allowed if bits is None else bits & allowed
+
+        members = None if bits is None else np.unpackbits(bits, count=self.n_movies).view(bool)
+        if filters is None or not filters.ranges:
+            return np.ones(self.n_movies, dtype=bool) if members is None else members
+
+        # narrowest range gives the candidates, the others are position checks on them
+        spans = {facet: self._range(facet, *bounds) for facet, bounds in filters.ranges.items()}
+        narrowest = min(spans, key=lambda facet: spans[facet][1] - spans[facet][0])
+        start, end = spans[narrowest]
+        ids = self.order[narrowest][start:end]
+        for facet, (lo, hi) in spans.items():
+            if facet != narrowest:
+                position = self.position[facet][ids]
+                ids = ids[(position >= lo) & (position < hi)]
+        if members is not None:
+            ids = ids[members[ids]]
+
+        result = np.zeros(self.n_movies, dtype=bool)
+        result[ids] = True
+        return result
@@ -0,0 +1,123 @@
+import json
+
+import numpy as np
+
+
+class GenreIndex:
+    """
+    Genre structures built once from the movie dataset (see catalog.py).
+
+    * `matrix`      movie x genre 0/1 matrix (row = movie id)
+    * `by_genre`    genre -> movie ids sorted by IMDB_Rating (best first)
+    * `by_rating`   all movie ids sorted by IMDB_Rating (best first)
+    * `movie_genres` movie id -> genre names in dataset order (first = primary)
+
+    Rating sorts are stable, so equal ratings keep dataset order.
+    """
+
+    def __init__(self, columns, genres=None, matrix=None):
+        # columns: DataFrame or {name: array}; genres/matrix: prebuilt (snapshot)
+        self.titles = np.asarray(columns["Series_Title"], dtype=object)
+        self.ratings = np.asarray(columns["IMDB_Rating"], dtype=np.float64)
+
+        self.movie_genres = [
+            [g.strip() for g in genre.split(",")] if isinstance(genre, str) else []
+            for genre in columns["Genre"]
+        ]
+
+        if genres is None or matrix is None:
+            genres = sorted({g for names in self.movie_genres for g in names})
+            matrix = np.zeros((len(self.titles), len(genres)), dtype=np.uint8)
+            genre_ids = {g: i for i, g in enumerate(genres)}
+            for movie_id, names in enumerate(self.movie_genres):
+                for g in names:
+                    matrix[movie_id, genre_ids[g]] = 1
+
+        self.genres = list(genres)
+        self.genre_ids = {g: i for i, g in enumerate(self.genres)}
+        self.matrix = matrix
+
+        self.by_rating = np.argsort(-self.ratings, kind="stable")
+        self.by_genre = {
+            g: self.by_rating[self.matrix[self.by_rating, i] == 1]
+            for g, i in self.genre_ids.items()
+        }
+
+    def genre_scores(self, genre_weights):
+        """Per-movie sum of the weights of its genres (one dot product)."""
+        weights = np.zeros(len(self.genres), dtype=np.float64)
+        for g, w in genre_weights.items():
+            if g in self.genre_ids:
+                weights[self.genre_ids[g]] = w
+        return self.matrix @ weights
+
+    def top_rated(self, top_n, genre=None, exclude=(), allowed=None):
+        """Best rated movie ids, optionally within one genre / an `allowed` mask (facets.py)."""
+        ids = self.by_rating if genre is None else self.by_genre.get(genre, self.by_rating[:0])
+        if allowed is not None:
+            ids = ids[allowed[ids]]
+        if len(exclude):
+            # only the head of the list can be affected by the exclusions
+            ids = ids[:top_n + len(exclude)]
+            ids = ids[~np.isin(ids, list(exclude))]
+        return ids[:top_n]
+
+
+class GenreListings:
+    """
+    Ready-to-send /get_genre_movies pages.
+
+    Every movie's listing record is serialized to JSON once, and each
+    genre keeps its rating-sorted ids (exact genre match, case-insensitive,
+    so "Music" no longer matches "Musical"). A page is then a slice plus
+    a bytes join, with no DataFrame filtering or per-request serialization.
+    """
+
+    FIELDS = ["Series_Title", "Poster_Link", "IMDB_Rating", "Released_Year", "Genre"]
+
+    def __init__(self, records, genre_index):
+        # same layout as Flask's jsonify (sorted keys, compact)
+        self.items = [
+            json.dumps(
+                {field: record[field] for field in self.FIELDS},
+                sort_keys=True,
+                separators=(",", ":"),
+            ).encode("utf-8")
+            for record in records
+        ]
+        self.by_genre = {
+            genre.lower(): ids.tolist() for genre, ids in genre_index.by_genre.items()
+        }
+        self._id_arrays = {genre.lower(): ids for genre, ids in genre_index.by_genre.items()}
+        self._full = {}     # genre -> whole listing bytes, built on first request
+
+    def count(self, genre):
+        return len(self.by_genre.get(genre.strip().lower(), ()))
+
+    def full(self, genre):
+        """The whole listing as one JSON array."""
+        key = genre.strip().lower()
+        body = self._full.get(key)
+        if body is None:
+            body = self.page(genre, 0, None)[0]
+            # only real genres are kept, any ?genre= string would grow the dict
+            if key in self.by_genre:
+                self._full[key] = body
+        return body
+
+    def page(self, genre, cursor=0, limit=None, allowed=None):
+        """
+        (JSON array bytes, next cursor or None) for `limit` movies from
+        position `cursor` (the cursor is the offset into the listing).
+        With `allowed` (boolean array over movie ids, see facets.py) the
+        listing only has those movies and the cursor counts within it.
+        """
+        key = genre.strip().lower()
+        if allowed is None:
+            ids = self.by_genre.get(key, [])
+        else:
+            ids = self._id_arrays.get(key, np.empty(0, dtype=np.int64))
+            ids = ids[allowed[ids]].tolist()
+        end = len(ids) if limit is None else min(cursor + limit, len(ids))
+        body = b"[" + b",".join(self.items[i] for i in ids[cursor:end]) + b"]"
+        return body, (end if end < len(ids) else None)
@@ -1,72 +1,55 @@
-import pandas as pd  # type: ignore
-from config import IMDB_PATH
+import numpy as np
+from recommender.catalog import get_catalog
+from recommender.logs import get_logger
 
-def recommend_by_genre(liked_movies, top_n=5):
+logger = get_logger("genre")
 
-    # Load movie dataset
-    df_imbd = pd.read_csv(IMDB_PATH)
+def recommend_by_genre(liked_movies, top_n=5, allowed=None, catalog=None):
+    """
+    Movies sharing the most genres with the liked ones (only `allowed` ids,
+    if given). `catalog`: the one `allowed` was built on (default: live).
+    """
+
+    # Genre index is built once per process (no CSV parsing per call)
+    catalog = catalog or get_catalog()
+    index = catalog.genres
 
     # ---------------- COLD START HANDLE ----------------
     # if no liked movies → return top rated movies
     if not liked_movies:
-        print("No liked movies → returning default top rated movies")
-        return df_imbd.sort_values(
-            "IMDB_Rating", ascending=False
-        )["Series_Title"].head(top_n).tolist()
+        logger.debug("No liked movies -> returning default top rated movies")
+        return index.titles[index.top_rated(top_n, allowed=allowed)].tolist()
     # ---------------------------------------------------
 
-    # Task 1: extract genres from liked movies
-    liked_genre_temp = []
-
-    for title in liked_movies:
-        row = df_imbd[df_imbd["Series_Title"] == title]
+    # Task 1 + 2: genre frequency of the liked movies
+    genre_score = {}
 
-        if row.empty:
+    for movie_id in catalog.resolve_many(liked_movies):
+        if movie_id is None:
             continue
 
-        genre = row.iloc[0]["Genre"].split(",")
-
-        for g in genre:
-            liked_genre_temp.append(g.strip())
+        for g in index.movie_genres[movie_id]:
+            genre_score[g] = genre_score.get(g, 0) + 1
 
     # safety check — if no genres extracted (edge case)
-    if not liked_genre_temp:
-        print("Liked movies had no genre match → fallback to top rated")
-        return df_imbd.sort_values(
-            "IMDB_Rating", ascending=False
-        )["Series_Title"].head(top_n).tolist()
+    if not genre_score:
+        logger.debug("Liked movies had no genre match -> fallback to top rated")
+        return index.titles[index.top_rated(top_n, allowed=allowed)].tolist()
 
-    # Task 2: calculate genre frequency score
-    genre_score = {}
-
-    for g in liked_genre_temp:
-        genre_score[g] = genre_score.get(g, 0) + 1
+    # Task 3: score all movies at once (movie x genre matrix . genre weights)
+    scores = index.genre_scores(genre_score)
+    scores[np.isin(index.titles, list(liked_movies))] = 0
+    if allowed is not None:
+        scores[~allowed] = 0
 
-    recommendations = []
+    candidates = np.flatnonzero(scores > 0)
 
-    # Task 3: score all other movies
-    for index, row in df_imbd.iterrows():
-        title = row["Series_Title"]
-        IMDB_rating = row["IMDB_Rating"]
-
-        if title in liked_movies:
-            continue
-
-        movie_genres = [g.strip() for g in row["Genre"].split(",")]
-
-        score = 0
-        for g in movie_genres:
-            score += genre_score.get(g, 0)
-
-        if score > 0:
-            recommendations.append((title, score, IMDB_rating))
-
-    # sort by (genre score, imdb rating)
-    recommendations.sort(key=lambda i: (i[1], i[2]), reverse=True)
+    # sort by (genre score, imdb rating), dataset order on ties
+    order = np.lexsort((
+        candidates,
+        -index.ratings[candidates],
+        -scores[candidates],
+    ))[:top_n]
 
     # return top N movie names
-    recommendations_movies_name = [
-        title for title, score, rating in recommendations[:top_n]
-    ]
-
-    return recommendations_movies_name
+    return index.titles[candidates[order]].tolist()
@@ -0,0 +1,154 @@
+import threading
+
+import numpy as np
+from config import ITEM_NEIGHBOURS
+from recommender.store import get_store
+from recommender.catalog import get_catalog
+
+
+class ItemItemIndex:
+    """
+    Item-item co-occurrence table with cached top-K neighbour lists.
+
+    co[i, j] = number of users who liked both i and j (co[i, i] = likes of i).
+    Similarity is cosine on the binary item columns:
+        sim(i, j) = co[i, j] / sqrt(co[i, i] * co[j, j])
+
+    The catalog is small (1000 titles), so the dense table fits in a few MB.
+    Every like/dislike updates the table in O(user's like count) and marks
+    the affected items dirty; their neighbour lists are rebuilt on next read.
+    """
+
+    def __init__(self, k=ITEM_NEIGHBOURS):
+        self.k = k
+        self.co = None
+        self._neighbours = {}   # item -> (neighbour ids, similarities)
+        self.lock = threading.Lock()
+
+    # ---------------- store hooks ----------------
+
+    def rebuild(self, store):
+        matrix = store.to_csr()
+        with self.lock:
+            self.co = (matrix.T @ matrix).toarray().astype(np.int32)
+            self._neighbours = {}
+
+    def on_write(self, store, row, movie_id, action):
+        liked = store.rows[row]
+        others = np.fromiter((m for m in liked if m != movie_id), dtype=np.int64)
+        delta = 1 if action == 1 else -1
+
+        with self.lock:
+            # every item whose similarity to movie_id changes (count of movie_id moved)
+            dirty = np.flatnonzero(self.co[movie_id])
+
+            self.co[movie_id, others] += delta
+            self.co[others, movie_id] += delta
+            self.co[movie_id, movie_id] += delta
+
+            for item in dirty:
+                self._neighbours.pop(item, None)
+            for item in others:
+                self._neighbours.pop(item, None)
+            self._neighbours.pop(movie_id, None)
+
+    def on_remap(self, store, mapping, rows):
+        # co-occurrence counts don't depend on the ids, just move them: one
+        # array copy in the swap, writes until then still count in the old ids
+        def swap(touched):
+            kept = np.flatnonzero(mapping >= 0)
+            co = np.zeros((store.n_movies, store.n_movies), dtype=np.int32)
+            with self.lock:
+                co[np.ix_(mapping[kept], mapping[kept])] = self.co[np.ix_(kept, kept)]
+                self.co = co
+                self._neighbours = {}
+        return swap
+
+    # ---------------- query ----------------
+
+    def neighbours(self, item):
+        """Top-K most similar items to `item` as (ids, similarities)."""
+        with self.lock:
+            cached = self._neighbours.get(item)
+            if cached is not None:
+                return cached
+
+            shared = self.co[item].astype(np.float64)
+            counts = np.diagonal(self.co).astype(np.float64)
+
+        shared[item] = 0
+        ids = np.flatnonzero(shared)
+        if len(ids):
+            sims = shared[ids] / np.sqrt(counts[item] * counts[ids])
+            if len(ids) > self.k:
+                top = np.argpartition(-sims, self.k - 1)[:self.k]
+                ids, sims = ids[top], sims[top]
+            order = np.lexsort((ids, -sims))
+            ids, sims = ids[order], sims[order]
+        else:
+            sims = np.empty(0)
+
+        with self.lock:
+            self._neighbours[item] = (ids, sims)
+        return ids, sims
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_item_index(store):
+    """Build the table over the store once and keep it in sync with its writes."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = ItemItemIndex()
+                with store.lock:
+                    index.rebuild(store)
+                    store.add_listener(index.on_write)
+                    store.add_remap_listener(index.on_remap)
+                    store.add_reset_listener(index.rebuild)
+                _index = index
+    return _index
+
+
+def recommend_by_items(user_id, top_n=5, allowed=None):
+    """
+    Item-based collaborative filtering: sum the neighbour lists of the
+    user's liked movies, drop what they already liked (and anything not
+    `allowed`), best score first (lower movie id on ties). Cost depends
+    on the user's like count only.
+    """
+
+    store = get_store()
+    index = get_item_index(store)
+
+    # liked ids, the table and titles all move together under this lock (catalog
+    # reload); neighbour lists are mostly cached, so scoring inside it is cheap
+    with store.lock:
+        titles = get_catalog().titles
+        liked = store.liked(user_id)
+        ranked = _rank_by_items(index, liked, store.n_movies, top_n, allowed)
+    return [titles[m] for m in ranked if m < len(titles)]
+
+
+def _rank_by_items(index, liked, n_movies, top_n, allowed):
+    if not liked or top_n <= 0:
+        return []
+
+    movie_scores = np.zeros(n_movies, dtype=np.float64)
+    for item in liked:
+        ids, sims = index.neighbours(item)
+        movie_scores[ids] += sims
+
+    movie_scores[liked] = 0
+    if allowed is not None:
+        movie_scores[:len(allowed)][~allowed[:n_movies]] = 0
+    candidates = np.flatnonzero(movie_scores > 0)
+    if not len(candidates):
+        return []
+
+    scores = movie_scores[candidates]
+    order = np.lexsort((candidates, -scores))[:top_n]
+    return candidates[order].tolist()
@@ -0,0 +1,59 @@
+"""
+Leveled, sampled logging for the backend.
+
+Records go through a queue to a background thread that does the actual
+write, so a request never blocks on stdout. Per-request tracing is
+logged at DEBUG, and of those only a LOG_SAMPLE_RATE fraction is kept,
+so it can be switched on in production without logging every request.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+
+from config import LOG_LEVEL, LOG_SAMPLE_RATE
+
+
+class SampleFilter(logging.Filter):
+    """Keep every INFO+ record and a `rate` fraction of the DEBUG ones."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.INFO or self.rate >= 1 or random.random() < self.rate
+
+
+_listener = None
+
+
+def setup_logging(level=LOG_LEVEL, sample_rate=LOG_SAMPLE_RATE):
+    """Configure the "recommender" logger once (idempotent)."""
+    global _listener
+    logger = logging.getLogger("recommender")
+    if _listener is not None:
+        return logger
+
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.addFilter(SampleFilter(sample_rate))
+    logger.addHandler(queue_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+
+def get_logger(name):
+    """Logger under the "recommender" hierarchy, e.g. get_logger("store")."""
+    setup_logging()
+    return logging.getLogger(f"recommender.{name}")
@@ -0,0 +1,153 @@
+import threading
+
+import numpy as np
+from config import LSH_NUM_PERM, LSH_BANDS, LSH_MAX_CANDIDATES
+
+
+_PRIME = (1 << 31) - 1
+_EMPTY = np.iinfo(np.int64).max
+
+
+class MinHashLSH:
+    """
+    Approximate neighbour index over the users' liked sets.
+
+    Each user gets a MinHash signature of `num_perm` values, split into
+    `bands` bands. Users whose signatures agree on a whole band land in
+    the same bucket, so candidates are found without scanning everyone.
+    More bands (fewer rows per band) -> higher recall, more candidates.
+
+    Signatures are updated incrementally from the store's write
+    listener: a like is a min() per permutation, a dislike recomputes
+    that user's signature from their remaining likes.
+    """
+
+    def __init__(self, num_perm=LSH_NUM_PERM, bands=LSH_BANDS, seed=7):
+        if num_perm % bands:
+            raise ValueError("LSH_NUM_PERM must be divisible by LSH_BANDS")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.int64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.int64)
+
+        self.signatures = []                        # row -> int64[num_perm]
+        self.buckets = [{} for _ in range(bands)]   # band -> {key: set(rows)}
+        self.lock = threading.Lock()
+
+    # ---------------- signatures ----------------
+
+    def _hash(self, movie_ids):
+        movie_ids = np.asarray(list(movie_ids), dtype=np.int64).reshape(-1, 1)
+        return (self._a * movie_ids + self._b) % _PRIME
+
+    def _signature(self, liked):
+        if not liked:
+            return np.full(self.num_perm, _EMPTY, dtype=np.int64)
+        return self._hash(liked).min(axis=0)
+
+    def _band_keys(self, signature):
+        if signature[0] == _EMPTY:
+            return []
+        r = self.rows_per_band
+        return [signature[i * r:(i + 1) * r].tobytes() for i in range(self.bands)]
+
+    def _set_signature(self, row, signature):
+        while len(self.signatures) <= row:
+            self.signatures.append(np.full(self.num_perm, _EMPTY, dtype=np.int64))
+
+        for band, key in enumerate(self._band_keys(self.signatures[row])):
+            bucket = self.buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(row)
+                if not bucket:
+                    del self.buckets[band][key]
+
+        self.signatures[row] = signature
+        for band, key in enumerate(self._band_keys(signature)):
+            self.buckets[band].setdefault(key, set()).add(row)
+
+    # ---------------- store hooks ----------------
+
+    def _build(self, rows):
+        signatures = [self._signature(liked) for liked in rows]
+        buckets = [{} for _ in range(self.bands)]
+        for row, signature in enumerate(signatures):
+            for band, key in enumerate(self._band_keys(signature)):
+                buckets[band].setdefault(key, set()).add(row)
+        return signatures, buckets
+
+    def rebuild(self, store):
+        # built aside and swapped in: queries keep the old index meanwhile
+        # (shared_store workers rebuild on a background thread)
+        signatures, buckets = self._build(store.rows)
+        with self.lock:
+            self.signatures, self.buckets = signatures, buckets
+
+    def on_write(self, store, row, movie_id, action):
+        with self.lock:
+            if action == 1 and row < len(self.signatures):
+                signature = np.minimum(self.signatures[row], self._hash([movie_id])[0])
+            else:
+                signature = self._signature(store.rows[row])
+            if row >= len(self.signatures) or not np.array_equal(signature, self.signatures[row]):
+                self._set_signature(row, signature)
+
+    def on_remap(self, store, mapping, rows):
+        # signatures hash the movie ids: only moved ids need a rebuild,
+        # built from the remapped rows before the store's exclusive section
+        if not np.any(mapping != np.arange(len(mapping))):
+            return None
+        signatures, buckets = self._build(rows)
+
+        def swap(touched):
+            with self.lock:
+                self.signatures, self.buckets = signatures, buckets
+                for row in sorted(touched):
+                    self._set_signature(row, self._signature(store.rows[row]))
+        return swap
+
+    # ---------------- query ----------------
+
+    def candidates(self, row, budget=LSH_MAX_CANDIDATES):
+        """Rows sharing at least one band with `row`, capped at `budget`."""
+        with self.lock:
+            if row >= len(self.signatures):
+                return np.empty(0, dtype=np.int64), np.empty(0)
+            signature = self.signatures[row]
+            found = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                found.update(self.buckets[band].get(key, ()))
+                if len(found) > budget:
+                    break
+            found.discard(row)
+            rows = np.fromiter(found, dtype=np.int64, count=len(found))[:budget]
+            if not len(rows):
+                return rows, np.empty(0)
+            others = np.stack([self.signatures[i] for i in rows])
+
+        # fraction of agreeing MinHash values estimates the Jaccard index
+        jaccard = (others == signature).mean(axis=1)
+        return rows, jaccard
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_lsh_index(store):
+    """Build the index over the store once and keep it in sync with its writes."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = MinHashLSH()
+                with store.lock:
+                    index.rebuild(store)
+                    store.add_listener(index.on_write)
+                    store.add_remap_listener(index.on_remap)
+                    store.add_reset_listener(index.rebuild)
+                _index = index
+    return _index
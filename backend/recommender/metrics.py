@@ -0,0 +1,150 @@
+"""
+In-process metrics: counters, latency histograms and callback gauges,
+rendered in the Prometheus text format by GET /metrics.
+
+    with timed("similarity", tier="collaborative"):
+        similar_users = get_similar_users(...)
+
+Recording is a perf_counter pair plus a bisect and a few additions under
+one lock, cheap enough for every request.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+# seconds; fine at the low end, recommendation calls are mostly sub-10ms
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    inner = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + inner + "}"
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)     # last = +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Metrics:
+    """Registry of named metrics, each split by a label set."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._help = {}             # name -> (type, help)
+        self._counters = {}         # name -> {label key: value}
+        self._histograms = {}       # name -> {label key: _Histogram}
+        self._callbacks = []        # (name, type, help, fn -> {label dict or None: value})
+
+    def _declare(self, name, kind, help_text):
+        if name not in self._help:
+            self._help[name] = (kind, help_text)
+
+    def inc(self, name, amount=1, help_text="", **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self._declare(name, "counter", help_text)
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, help_text="", **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self._declare(name, "histogram", help_text)
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram()
+            histogram.observe(value)
+
+    def register(self, name, kind, help_text, fn):
+        """
+        Value read at scrape time: fn() returns a number or a list of
+        (labels dict, number). Used for stats other components already keep.
+        """
+        with self.lock:
+            self._callbacks.append((name, kind, help_text, fn))
+
+    def render(self):
+        lines = []
+
+        def header(name, kind, help_text):
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            for name, series in sorted(self._counters.items()):
+                header(name, *self._help[name])
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+
+            for name, series in sorted(self._histograms.items()):
+                header(name, *self._help[name])
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.total:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+
+            callbacks = list(self._callbacks)
+
+        # outside our lock: callbacks take the owners' locks
+        for name, kind, help_text, fn in callbacks:
+            try:
+                value = fn()
+            except Exception as e:      # a broken gauge must not break the scrape
+                lines.append(f"# {name} unavailable: {e}")
+                continue
+            header(name, kind, help_text)
+            samples = value if isinstance(value, list) else [({}, value)]
+            for labels, sample in samples:
+                lines.append(f"{name}{_format_labels(_label_key(labels))} {sample}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def timed(stage, **labels):
+    """Time a block into the stage latency histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(
+            "recommender_stage_seconds",
+            time.perf_counter() - started,
+            "Time spent per processing stage",
+            stage=stage,
+            **labels,
+        )
@@ -0,0 +1,297 @@
+"""
+Offline precompute of collaborative recommendations for every user.
+
+    python -m recommender.precompute                 (run from backend/)
+    python -m recommender.precompute --full --workers 8
+
+Users are split into chunks and scored on a multiprocessing pool
+(score_batch, exact mode). The results go to PRECOMPUTE_DIR:
+
+    manifest.json         generation, creation time, parameters
+    user_ids.npy          user ids (index = position in the other arrays)
+    fingerprints.npy      crc32 of each user's liked ids when computed
+    recs.npy              users x top_n ranked movie ids (-1 = padding)
+    neighbours.npy        users x neighbours, indices into user_ids (-1 = padding)
+    generations.npy       generation in which each row was last computed
+
+A run is incremental by default: only users whose likes changed since the
+last generation, users sharing a liked movie with them and users who had
+one of them as a neighbour are recomputed; every other row is carried over.
+
+`/recommend` serves a precomputed list while the user's fingerprint still
+matches, the generation is younger than PRECOMPUTE_MAX_AGE_S and the
+catalog still has the same movie ids, and computes live otherwise.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import zlib
+
+import numpy as np
+from config import MIN_SIMILARITY_SCORE, MAX_RECOMMENDATIONS
+from config import PRECOMPUTE_DIR, PRECOMPUTE_MAX_AGE_S, PRECOMPUTE_WORKERS
+from recommender.store import get_store
+from recommender.catalog import get_catalog
+from recommender.batch import score_batch
+from recommender.logs import get_logger
+
+logger = get_logger("precompute")
+
+
+SCHEMA_VERSION = 1
+CHUNK_SIZE = 1024           # users per pool task
+RELOAD_CHECK_S = 10         # how often the server looks for a new generation
+
+
+def fingerprint(liked):
+    """crc32 of a user's sorted liked ids (changes with every like/dislike)."""
+    return zlib.crc32(np.asarray(liked, dtype=np.int32).tobytes())
+
+
+def _params(top_n):
+    return {
+        "top_n": top_n,
+        "neighbours": MAX_RECOMMENDATIONS,
+        "min_similarity": MIN_SIMILARITY_SCORE,
+        # movie ids in recs are only valid for the catalog they were computed with
+        "catalog": get_catalog().fingerprint,
+    }
+
+
+def _read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _load_arrays(out_dir, mmap_mode=None):
+    def load(name):
+        return np.load(os.path.join(out_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+
+    return {
+        name: load(name)
+        for name in ("user_ids", "fingerprints", "recs", "neighbours", "generations")
+    }
+
+
+# ---------------- offline job ----------------
+
+def _init_worker():
+    # forked workers already hold the parent's store; spawned ones load it read-only
+    get_store(read_only=True)
+
+
+def _score_chunk(args):
+    user_ids, top_n = args
+    recs = np.full((len(user_ids), top_n), -1, dtype=np.int32)
+    neighbours = np.full((len(user_ids), MAX_RECOMMENDATIONS), -1, dtype=np.int32)
+    results = score_batch(user_ids, MIN_SIMILARITY_SCORE, MAX_RECOMMENDATIONS, top_n)
+    for i, (_, rows, ranked) in enumerate(results):
+        recs[i, :len(ranked)] = ranked
+        neighbours[i, :len(rows)] = rows
+    return recs, neighbours
+
+
+def _stale_users(previous, user_ids, fingerprints, matrix):
+    """
+    Mask of users to recompute: new or changed users, users sharing a liked
+    movie with one of them (their cosine moved), and users who had one of
+    them as a neighbour (it may have dropped out).
+    """
+    old_index = {uid: i for i, uid in enumerate(previous["user_ids"].tolist())}
+    old_pos = np.array([old_index.get(uid, -1) for uid in user_ids], dtype=np.int64)
+
+    stale = old_pos < 0
+    known = ~stale
+    stale[known] = previous["fingerprints"][old_pos[known]] != fingerprints[known]
+
+    # neighbour lists are stored by old position -> mark old positions of changed users
+    changed_old = np.zeros(len(old_index) + 1, dtype=bool)     # last slot = padding
+    changed_old[old_pos[stale & known]] = True
+    gone = np.ones(len(old_index), dtype=bool)
+    gone[old_pos[known]] = False
+    changed_old[:-1] |= gone
+
+    old_neighbours = previous["neighbours"][old_pos[known]]
+    neighbour_changed = changed_old[old_neighbours].any(axis=1)
+
+    changed = np.flatnonzero(stale)
+    if len(changed):
+        co_likers = (matrix[changed] @ matrix.T).tocsc()
+        stale[np.diff(co_likers.indptr) > 0] = True
+    stale[known] |= neighbour_changed
+    return stale, old_pos
+
+
+def run(out_dir=PRECOMPUTE_DIR, top_n=10, workers=PRECOMPUTE_WORKERS, full=False):
+    """Compute (or refresh) the precomputed recommendations and swap them in."""
+    started = time.time()
+    store = get_store(read_only=True)
+
+    with store.lock:
+        user_ids = list(store.user_ids)
+        fingerprints = np.array(
+            [fingerprint(sorted(liked)) for liked in store.rows], dtype=np.uint32
+        )
+        matrix = store.to_csr()     # built once here so forked workers share it
+
+    manifest = _read_manifest(out_dir)
+    params = _params(top_n)
+    incremental = (
+        not full
+        and manifest is not None
+        and manifest.get("schema") == SCHEMA_VERSION
+        and manifest.get("params") == params
+    )
+
+    generation = manifest["generation"] + 1 if manifest else 1
+    recs = np.full((len(user_ids), top_n), -1, dtype=np.int32)
+    neighbours = np.full((len(user_ids), MAX_RECOMMENDATIONS), -1, dtype=np.int32)
+    generations = np.full(len(user_ids), generation, dtype=np.int64)
+
+    if incremental:
+        previous = _load_arrays(out_dir)
+        stale, old_pos = _stale_users(previous, user_ids, fingerprints, matrix)
+
+        # carry the untouched rows over (neighbour indices remapped to the new order)
+        keep = ~stale
+        remap = np.full(len(previous["user_ids"]) + 1, -1, dtype=np.int32)     # last slot = padding
+        remap[old_pos[old_pos >= 0]] = np.flatnonzero(old_pos >= 0)
+        recs[keep] = previous["recs"][old_pos[keep]]
+        neighbours[keep] = remap[previous["neighbours"][old_pos[keep]]]
+        generations[keep] = previous["generations"][old_pos[keep]]
+        todo = np.flatnonzero(stale)
+    else:
+        todo = np.arange(len(user_ids))
+
+    logger.info(
+        "Precompute generation %s: %s of %s users (%s, %s workers)",
+        generation, len(todo), len(user_ids),
+        "incremental" if incremental else "full", workers or os.cpu_count(),
+    )
+
+    chunks = [todo[i:i + CHUNK_SIZE] for i in range(0, len(todo), CHUNK_SIZE)]
+    tasks = [([user_ids[i] for i in chunk], top_n) for chunk in chunks]
+    if tasks:
+        with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+            for done, (chunk, (chunk_recs, chunk_neighbours)) in enumerate(
+                zip(chunks, pool.imap(_score_chunk, tasks)), 1
+            ):
+                recs[chunk] = chunk_recs
+                neighbours[chunk] = chunk_neighbours
+                logger.info("  chunk %s/%s done", done, len(chunks))
+
+    _write(out_dir, {
+        "user_ids": np.array(user_ids, dtype=str),
+        "fingerprints": fingerprints,
+        "recs": recs,
+        "neighbours": neighbours,
+        "generations": generations,
+    }, {
+        "schema": SCHEMA_VERSION,
+        "generation": generation,
+        "created": time.time(),
+        "users": len(user_ids),
+        "recomputed": len(todo),
+        "params": params,
+    })
+
+    logger.info("Precompute generation %s written in %.1fs -> %s", generation, time.time() - started, out_dir)
+    return generation
+
+
+def _write(out_dir, arrays, manifest):
+    """Write into a side directory, then swap it in (readers keep their old mmaps)."""
+    tmp_dir = out_dir + ".building"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), values)
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    old_dir = out_dir + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+# ---------------- serving ----------------
+
+class PrecomputedRecommendations:
+    """
+    Read side used by the server. Memory-maps the latest generation and
+    picks up new ones (checked at most every RELOAD_CHECK_S seconds).
+    """
+
+    def __init__(self, out_dir=PRECOMPUTE_DIR, max_age=PRECOMPUTE_MAX_AGE_S):
+        self.out_dir = out_dir
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.generation = None
+        self._manifest = None
+        self._arrays = None
+        self._index = {}
+        self._checked = 0.0
+
+    def _refresh(self):
+        now = time.monotonic()
+        if not self.out_dir or now - self._checked < RELOAD_CHECK_S:
+            return
+        self._checked = now
+
+        manifest = _read_manifest(self.out_dir)
+        if manifest is None or manifest.get("generation") == self.generation:
+            return
+        params = manifest.get("params", {})
+        if (
+            manifest.get("schema") != SCHEMA_VERSION
+            or params.get("neighbours") != MAX_RECOMMENDATIONS
+            or params.get("min_similarity") != MIN_SIMILARITY_SCORE
+        ):
+            return      # built with other settings -> live computation
+        try:
+            arrays = _load_arrays(self.out_dir, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.error("precomputed recommendations unreadable: %s", e)
+            return
+
+        self._index = {uid: i for i, uid in enumerate(arrays["user_ids"].tolist())}
+        self._arrays = arrays
+        self._manifest = manifest
+        self.generation = manifest["generation"]
+        logger.info("Precomputed recommendations loaded: generation %s, %s users", self.generation, len(self._index))
+
+    def lookup(self, user_id, liked, top_n):
+        """Precomputed movie ids for the user, or None when missing or stale."""
+        with self.lock:
+            self._refresh()
+            if self._arrays is None or top_n > self._manifest["params"]["top_n"]:
+                return None
+            if time.time() - self._manifest["created"] > self.max_age:
+                return None
+            if self._manifest["params"].get("catalog") != get_catalog().fingerprint:
+                return None     # catalog reloaded with other movie ids since
+            i = self._index.get(str(user_id))
+            if i is None or self._arrays["fingerprints"][i] != fingerprint(liked):
+                return None
+            ranked = self._arrays["recs"][i, :top_n]
+        return [int(m) for m in ranked if m >= 0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute collaborative recommendations")
+    parser.add_argument("--full", action="store_true", help="recompute every user")
+    parser.add_argument("--workers", type=int, default=PRECOMPUTE_WORKERS)
+    parser.add_argument("--top-n", type=int, default=10)
+    args = parser.parse_args()
+    run(top_n=args.top_n, workers=args.workers, full=args.full)
@@ -1,53 +1,89 @@
-import pandas as pd
-from config import MATRIX_PATH, IMDB_PATH
+import numpy as np
+from recommender.store import get_store
+from recommender.catalog import get_catalog
 
 
-def recommend_movies(user_id, similar_users, top_n=5):
+def rank_candidates(watched, neighbour_likes, weights, n_movies, top_n, allowed=None):
+    """
+    Movie ids ranked by the summed weight of the neighbours who liked them.
 
-    user_item = pd.read_csv(MATRIX_PATH)
-    movies = pd.read_csv(IMDB_PATH)
+    `neighbour_likes[i]` is the sorted liked-id array of the i-th neighbour
+    (most similar first) and `weights[i]` its similarity. Shared by the
+    single-user and batch paths so both rank identically. `allowed`
+    (boolean array over movie ids) restricts the candidates.
+    """
+    if top_n <= 0 or not neighbour_likes:
+        return np.empty(0, dtype=np.int64)
 
-    
-    user_item["user_id"] = user_item["user_id"].astype(type(user_id))
+    cols = np.concatenate(neighbour_likes).astype(np.int64, copy=False)
+    if not len(cols):
+        return cols
+    lengths = [len(liked) for liked in neighbour_likes]
+    ranks = np.repeat(np.arange(len(neighbour_likes), dtype=np.int64), lengths)
+    weights = np.repeat(np.asarray(weights, dtype=np.float64), lengths)
 
-    if user_id not in user_item["user_id"].values:
-        return []
+    # add.at accumulates in neighbour order, same sums as the old loop
+    movie_scores = np.zeros(n_movies, dtype=np.float64)
+    np.add.at(movie_scores, cols, weights)
+    first_rank = np.full(n_movies, len(neighbour_likes), dtype=np.int64)
+    np.minimum.at(first_rank, cols, ranks)
+
+    candidate = np.zeros(n_movies, dtype=bool)
+    candidate[cols] = True
+    candidate[watched] = False
+    if allowed is not None:
+        candidate[:len(allowed)] &= allowed[:n_movies]
+    candidates = np.flatnonzero(candidate)
+
+    if not len(candidates):
+        return candidates
 
-    # Movies watched by target user
-    user_row = user_item[user_item["user_id"] == user_id]
-    user_row = user_row.drop(columns=["user_id"])
+    # partial selection: keep everything scoring at least the k-th best
+    # (so ties at the cut are resolved by the ordering below), then sort
+    scores = movie_scores[candidates]
+    if len(candidates) > top_n:
+        kth = np.partition(scores, len(scores) - top_n)[len(scores) - top_n]
+        keep = scores >= kth
+        candidates, scores = candidates[keep], scores[keep]
 
-    user_watched = set()
-    for col in user_row.columns:
-        if user_row.iloc[0][col] == 1:
-            user_watched.add(col)
+    order = np.lexsort((candidates, first_rank[candidates], -scores))[:top_n]
+    return candidates[order]
 
-    movie_scores = {}
 
-    # Loop through similar users
-    for sim_user_id, sim_score in similar_users:
-        sim_row = user_item[user_item["user_id"] == sim_user_id]
-        if sim_row.empty:
-            continue
+def recommend_movies(user_id, similar_users, top_n=5, allowed=None):
+    """
+    Score unseen movies by the summed similarity of the neighbours who liked them.
 
-        sim_row = sim_row.drop(columns=["user_id"])
+    One weighted aggregation over the neighbours' rows (no per-column loop),
+    masked by the user's liked set, then partial top-k selection.
 
-        for col in sim_row.columns:
-            if sim_row.iloc[0][col] == 1 and col not in user_watched:
-                movie_scores[col] = movie_scores.get(col, 0) + sim_score
+    Ties are broken the same way as the old dict-based version: a movie
+    first liked by a more similar neighbour comes first, and within one
+    neighbour the lower movie id comes first.
+    """
 
-    if not movie_scores:
+    if top_n <= 0:
         return []
 
-    ranked_movies = sorted(movie_scores.items(), key=lambda item: item[1], reverse=True)
+    store = get_store()
+
+    with store.lock:
+        # titles read with the ids: a catalog reload swaps both under this lock
+        titles = get_catalog().titles
+        if not store.has_user(user_id):
+            return []
+
+        # Movies watched by target user
+        user_watched = store.liked(user_id)
+
+        neighbour_likes = [
+            np.asarray(store.liked(sim_user_id), dtype=np.int64)
+            for sim_user_id, _ in similar_users
+        ]
+        weights = [sim_score for _, sim_score in similar_users]
+        n_movies = store.n_movies
 
-    # Convert movie IDs -> titles safely
-    recommendations = []
-    for movie_id, _ in ranked_movies[:top_n]:
-        movie_row = movies[movies.index.astype(str) == movie_id]
-        if movie_row.empty:
-            continue
-        title = movie_row.iloc[0]["Series_Title"]
-        recommendations.append(title)
+    ranked = rank_candidates(user_watched, neighbour_likes, weights, n_movies, top_n, allowed)
 
-    return recommendations
+    # Convert movie IDs -> titles through a direct array lookup
+    return [titles[m] for m in ranked if m < len(titles)]
@@ -0,0 +1,232 @@
+"""
+Typeahead search over titles, directors and stars (GET /search).
+
+Every title and every person name is a "doc" (one per distinct name and
+role, pointing to its movies, most voted first). The index keeps
+
+    * a sorted list of every word-start suffix of every doc
+      ("the dark knight", "dark knight", "knight"), so a prefix lookup is
+      two bisects and the matches are one contiguous range
+    * a trigram -> docs posting list, for fuzzy matches (typos, missing
+      punctuation) when the prefix matches don't fill the page
+
+Results are movies ranked by match quality (exact title, exact name,
+title prefix, name prefix, prefix of an inner word, fuzzy) and then by
+No_of_Votes. Queries whose prefix range is large (one or two letters)
+are answered once and memoized.
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+from config import SEARCH_LIMIT
+
+
+MAX_LIMIT = 50              # results per query at most (also the memoized depth)
+MEMO_MIN_RANGE = 2000       # prefix ranges at least this long are memoized
+MEMO_MAX_ENTRIES = 20_000
+FUZZY_MIN_LENGTH = 3        # shorter queries only get prefix matches
+FUZZY_MIN_SCORE = 0.5       # share of the query's trigrams a fuzzy match must contain
+
+TITLE, DIRECTOR, STAR = 0, 1, 2
+FIELDS = ("title", "director", "star")
+STAR_COLUMNS = ("Star1", "Star2", "Star3", "Star4")
+
+# match quality, best first
+EXACT_TITLE, EXACT_NAME, TITLE_PREFIX, NAME_PREFIX, WORD_PREFIX, FUZZY = range(6)
+QUALITIES = ("exact", "exact", "prefix", "prefix", "word", "fuzzy")
+
+
+def normalize_query(text):
+    """Lower case, single spaces (titles, names and queries alike)."""
+    return " ".join(text.lower().split())
+
+
+def _trigrams(text, closed=True):
+    # padded like pg_trgm; an open query gets no end-of-string padding
+    padded = "  " + text + (" " if closed else "")
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Prefix + trigram index over one catalog (built with the Catalog)."""
+
+    def __init__(self, columns):
+        votes = np.asarray(columns["No_of_Votes"], dtype=np.int64)
+        self.votes = votes
+
+        docs = {}               # (normalized, field) -> doc id
+        names = []              # display string per doc
+        fields = []
+        movies = []             # doc -> movie ids
+        for movie_id in range(len(votes)):
+            people = [(columns["Director"][movie_id], DIRECTOR)]
+            people += [(columns[c][movie_id], STAR) for c in STAR_COLUMNS]
+            for text, field in [(columns["Series_Title"][movie_id], TITLE)] + people:
+                if not isinstance(text, str) or not text.strip():
+                    continue
+                key = (normalize_query(text), field)
+                doc = docs.get(key)
+                if doc is None:
+                    doc = docs[key] = len(names)
+                    names.append(text.strip())
+                    fields.append(field)
+                    movies.append([])
+                if not movies[doc] or movies[doc][-1] != movie_id:
+                    movies[doc].append(movie_id)
+
+        self.names = names
+        self.doc_text = [text for text, _ in docs]
+        self.doc_field = np.array(fields, dtype=np.int8)
+        self.doc_len = np.array([len(t) for t in self.doc_text], dtype=np.int32)
+
+        # doc -> movies CSR, most voted first
+        ordered = [sorted(m, key=lambda i: (-votes[i], i)) for m in movies]
+        self.doc_indptr = np.zeros(len(names) + 1, dtype=np.int64)
+        self.doc_indptr[1:] = np.cumsum([len(m) for m in ordered])
+        self.doc_movies = np.array([i for m in ordered for i in m], dtype=np.int64)
+        self.doc_votes = np.array([votes[m[0]] for m in ordered], dtype=np.int64)
+        # rank key = quality * scale - votes, smaller is better
+        self.scale = int(votes.max(initial=0)) + 1
+
+        # word-start suffixes, sorted
+        suffixes = []
+        for doc, text in enumerate(self.doc_text):
+            suffixes.append((text, doc, False))
+            for i, ch in enumerate(text):
+                if ch == " " and i + 1 < len(text):
+                    suffixes.append((text[i + 1:], doc, True))
+        suffixes.sort()
+        self.keys = [s for s, _, _ in suffixes]
+        self.key_doc = np.array([d for _, d, _ in suffixes], dtype=np.int64)
+        self.key_inner = np.array([inner for _, _, inner in suffixes], dtype=bool)
+
+        # trigram postings (doc ids ascending)
+        postings = {}
+        for doc, text in enumerate(self.doc_text):
+            for gram in _trigrams(text):
+                postings.setdefault(gram, []).append(doc)
+        self.postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+        self._memo = {}
+        self._memo_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    # ---------------- prefix ----------------
+
+    def _prefix_candidates(self, query, lo, hi, depth):
+        """
+        (qualities, movie ids, docs) of the best `depth` movies among the
+        prefix range [lo, hi), best first, one entry per movie.
+        """
+        docs = self.key_doc[lo:hi]
+        exact = ~self.key_inner[lo:hi] & (self.doc_len[docs] == len(query))
+        person = self.doc_field[docs] != TITLE
+        quality = np.where(
+            self.key_inner[lo:hi], WORD_PREFIX,
+            np.where(exact, EXACT_TITLE, TITLE_PREFIX) + person,
+        )
+        # best possible key of each entry (its doc's most voted movie)
+        entry_keys = quality * self.scale - self.doc_votes[docs]
+
+        take = depth
+        while True:
+            if take < len(entry_keys):
+                picked = np.argpartition(entry_keys, take - 1)[:take]
+                # a movie is only certain to be in the top `depth` if it beats
+                # every entry left out (ties included, for a stable order)
+                cutoff = entry_keys[picked].max()
+            else:
+                picked = np.arange(len(entry_keys))
+                cutoff = None
+
+            counts = self.doc_indptr[docs[picked] + 1] - self.doc_indptr[docs[picked]]
+            starts = np.repeat(self.doc_indptr[docs[picked]], counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            movies = self.doc_movies[starts + offsets]
+            movie_docs = np.repeat(docs[picked], counts)
+            movie_quality = np.repeat(quality[picked], counts)
+            keys = movie_quality * self.scale - self.votes[movies]
+
+            order = np.lexsort((movies, keys))
+            _, first = np.unique(movies[order], return_index=True)
+            order = order[np.sort(first)]
+            if cutoff is not None:
+                order = order[keys[order] < cutoff]
+            if len(order) >= depth or cutoff is None:
+                order = order[:depth]
+                return movie_quality[order], movies[order], movie_docs[order]
+            take *= 2
+
+    def _prefix(self, query, depth):
+        lo = bisect_left(self.keys, query)
+        hi = bisect_right(self.keys, query + "\U0010ffff", lo)
+        if hi - lo < MEMO_MIN_RANGE:
+            return self._prefix_candidates(query, lo, hi, depth)
+
+        result = self._memo.get(query)
+        if result is None:
+            result = self._prefix_candidates(query, lo, hi, MAX_LIMIT)
+            with self._memo_lock:
+                if len(self._memo) >= MEMO_MAX_ENTRIES:
+                    self._memo.clear()
+                self._memo[query] = result
+        return tuple(part[:depth] for part in result)
+
+    # ---------------- fuzzy ----------------
+
+    def _fuzzy(self, query, depth, exclude):
+        """(movie ids, docs) of trigram matches not in `exclude`, best first."""
+        grams = _trigrams(query, closed=False)
+        need = int(np.ceil(FUZZY_MIN_SCORE * len(grams)))
+        postings = [self.postings[g] for g in grams if g in self.postings]
+        if len(postings) < need:
+            return [], []
+
+        counts = np.bincount(np.concatenate(postings), minlength=len(self.names))
+        docs = np.flatnonzero(counts >= need)
+
+        # best docs first (grams hit, then votes of their top movie), then their movies
+        rank = counts[docs] * self.scale + self.doc_votes[docs]
+        take = depth + len(exclude)
+        if take < len(docs):
+            picked = np.argpartition(-rank, take - 1)[:take]
+            docs, rank = docs[picked], rank[picked]
+        found = []
+        seen = set(exclude)
+        for doc in docs[np.lexsort((docs, -rank))].tolist():
+            for movie in self.doc_movies[self.doc_indptr[doc]:self.doc_indptr[doc + 1]].tolist():
+                if movie not in seen:
+                    seen.add(movie)
+                    found.append((-counts[doc], -self.votes[movie], movie, doc))
+        found.sort()
+        return [m for _, _, m, _ in found[:depth]], [d for _, _, _, d in found[:depth]]
+
+    # ---------------- query ----------------
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """
+        [(movie id, quality, field, matched name)] best first, at most
+        `limit` (capped at MAX_LIMIT) movies.
+        """
+        query = normalize_query(text)
+        limit = min(limit, MAX_LIMIT)
+        if not query or limit <= 0:
+            return []
+
+        qualities, movies, docs = self._prefix(query, limit)
+        results = [
+            (m, QUALITIES[q], FIELDS[self.doc_field[d]], self.names[d])
+            for q, m, d in zip(qualities.tolist(), movies.tolist(), docs.tolist())
+        ]
+
+        if len(results) < limit and len(query) >= FUZZY_MIN_LENGTH:
+            movies, docs = self._fuzzy(query, limit - len(results), [m for m, *_ in results])
+            results += [
+                (m, QUALITIES[FUZZY], FIELDS[self.doc_field[d]], self.names[d])
+                for m, d in zip(movies, docs)
+            ]
+        return results
@@ -0,0 +1,769 @@
+"""
+Shared interaction data for multi-worker (pre-fork) deployments.
+
+    python -m recommender.shared_store             (run from backend/: the owner process)
+
+With STORE_MODE = "worker" the server processes don't load the matrix
+themselves. One owner process holds the real InteractionStore (event
+log, compaction) and publishes it to SHARED_STORE_DIR:
+
+    g<N>/manifest.json          generation, sizes, inbox offsets applied
+    g<N>/indptr.npy             users x movies CSR of likes (indptr / indices / data)
+    g<N>/indices.npy
+    g<N>/data.npy
+    g<N>/movie_indptr.npy       the same by movie (CSC), for co-liker lookups
+    g<N>/movie_rows.npy
+    g<N>/user_ids.npy           row -> user id
+    g<N>/sorted_ids.npy         user ids sorted, with their rows in
+    g<N>/sorted_rows.npy        ... (binary search instead of a dict per worker)
+    g<N>/versions.npy           per-row change counter
+    current                     8-byte generation counter
+
+Workers memory-map the newest generation, so every worker shares the same
+pages and memory stays flat as workers are added. Before each request a
+worker reads the counter (one memory read) and, when it moved, switches
+to the new generation with one reference swap.
+
+A worker's likes/dislikes are appended to its own inbox file
+(inbox/<pid>-<n>.log, event log format plus the fingerprint of the
+worker's catalog). The owner tails the inboxes, applies the events to
+its store (and so to the event log) and publishes them with the next
+generation, at most SHARED_PUBLISH_INTERVAL_MS later. Events stamped
+with an older catalog are moved to the live ids first (see
+StoreOwner.follow_catalog), ones it can't place are dropped.
+A worker sees its own pending writes right away; the others see them
+once published.
+
+Owner and workers each build their own Catalog from the memory-mapped
+catalog snapshot (CATALOG_SNAPSHOT_DIR): its numeric arrays are shared
+pages, its strings and lookup tables are per-process (catalog_snapshot.py).
+Every generation records the fingerprint of the catalog its movie ids
+belong to. A worker only switches to generations of its own catalog;
+when the owner has reloaded, the worker reloads too and moves to the
+owner's generation inside that reload (see _follow_catalog), so a
+worker's movie ids and its catalog always change together.
+"""
+
+import csv
+import io
+import json
+import os
+import shutil
+import signal
+import threading
+import time
+from collections.abc import Set
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from config import SHARED_STORE_DIR, SHARED_PUBLISH_INTERVAL_MS
+from config import CATALOG_WATCH_INTERVAL_S
+from recommender.store import InteractionStore
+from recommender.catalog import catalogs
+from recommender.event_log import LIKE, DISLIKE
+from recommender.logs import get_logger
+
+logger = get_logger("shared_store")
+
+
+SCHEMA_VERSION = 1
+KEEP_GENERATIONS = 3            # older generation dirs are deleted (open mmaps stay valid)
+ATTACH_TIMEOUT_S = 30           # how long a worker waits for the owner's first generation
+INBOX_ROTATE_BYTES = 1 << 20    # a worker starts a new inbox file past this size
+KEEP_CATALOG_MAPPINGS = 16      # old catalogs whose inbox events the owner can still remap
+CATALOG_RETRY_S = 5             # a failed reload to follow the owner's catalog is retried this much later
+
+
+def _counter(shared_dir, mode):
+    return np.memmap(os.path.join(shared_dir, "current"), dtype=np.uint64, mode=mode, shape=(1,))
+
+
+def _read_manifest(path):
+    try:
+        with open(os.path.join(path, "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _generation_dirs(shared_dir):
+    if not os.path.isdir(shared_dir):
+        return []
+    return sorted(
+        int(name[1:]) for name in os.listdir(shared_dir)
+        if name.startswith("g") and name[1:].isdigit()
+    )
+
+
+# ---------------- owner ----------------
+
+class StoreOwner:
+    """Applies the workers' inboxes to the store and publishes generations."""
+
+    def __init__(self, store, shared_dir=SHARED_STORE_DIR, interval_ms=SHARED_PUBLISH_INTERVAL_MS):
+        self.store = store
+        self.shared_dir = shared_dir
+        self.inbox_dir = os.path.join(shared_dir, "inbox")
+        self.interval = interval_ms / 1000.0
+        self._stop = threading.Event()
+        os.makedirs(self.inbox_dir, exist_ok=True)
+
+        # resume where the last published generation left off
+        generations = _generation_dirs(shared_dir)
+        manifest = _read_manifest(os.path.join(shared_dir, f"g{generations[-1]}")) if generations else None
+        self.generation = manifest["generation"] if manifest else 0
+        self.offsets = dict(manifest["inbox_offsets"]) if manifest else {}
+        self._published_changes = None
+        self._remaps = {}       # old catalog fingerprint -> (next fingerprint, mapping)
+
+        counter_path = os.path.join(shared_dir, "current")
+        self._counter = _counter(shared_dir, "r+" if os.path.exists(counter_path) else "w+")
+
+    def follow_catalog(self, old, new, mapping):
+        """
+        Catalog listener: remap the store, and remember the mapping so
+        inbox events a worker wrote under `old` still land on the right
+        movies when they are consumed after the reload.
+        """
+        self.store.remap_movies(mapping, len(new))
+        if old.fingerprint != new.fingerprint:
+            self._remaps.pop(old.fingerprint, None)
+            self._remaps[old.fingerprint] = (new.fingerprint, np.asarray(mapping))
+            while len(self._remaps) > KEEP_CATALOG_MAPPINGS:
+                del self._remaps[next(iter(self._remaps))]
+
+    def _live_movie_id(self, movie_id, catalog):
+        """`movie_id` of catalog fingerprint `catalog` in the live catalog's ids, None if gone or unknown."""
+        live = catalogs.get().fingerprint
+        while catalog is not None and catalog != live:
+            if catalog not in self._remaps:
+                return None
+            catalog, mapping = self._remaps[catalog]
+            if movie_id >= len(mapping) or mapping[movie_id] < 0:
+                return None
+            movie_id = int(mapping[movie_id])
+        return movie_id
+
+    def consume_inboxes(self):
+        """Apply every complete inbox line not applied yet. Returns the number of events."""
+        applied = dropped = 0
+        for name in sorted(os.listdir(self.inbox_dir)):
+            path = os.path.join(self.inbox_dir, name)
+            offset = self.offsets.get(name, 0)
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+            # a worker may be mid-write: stop at the last full line
+            data = data[:data.rfind(b"\n") + 1]
+            if not data:
+                continue
+
+            for record in csv.reader(io.StringIO(data.decode("utf-8"))):
+                try:
+                    user_id, movie_id, action = record[0], int(record[1]), int(record[2])
+                    # lines written before the stamp was added are in the live ids
+                    catalog = int(record[4]) if len(record) > 4 else None
+                except (IndexError, ValueError):
+                    continue
+                # the user's write lock: a catalog reload can't remap the ids in between
+                with self.store.user_lock(user_id):
+                    movie_id = self._live_movie_id(movie_id, catalog)
+                    if movie_id is None:
+                        dropped += 1
+                        continue
+                    if action == LIKE:
+                        self.store.like(user_id, [movie_id])
+                    else:
+                        self.store.unlike(user_id, movie_id)
+                applied += 1
+            self.offsets[name] = offset + len(data)
+        if dropped:
+            logger.warning("%s inbox events dropped: movie gone or catalog unknown", dropped)
+        return applied
+
+    def _prune_inboxes(self):
+        """Drop fully applied inbox files that will not grow any more."""
+        latest = {}
+        for name in os.listdir(self.inbox_dir):
+            pid, seq = name.split(".")[0].split("-")
+            latest[pid] = max(latest.get(pid, -1), int(seq))
+
+        for name in os.listdir(self.inbox_dir):
+            path = os.path.join(self.inbox_dir, name)
+            pid, seq = name.split(".")[0].split("-")
+            if self.offsets.get(name, 0) < os.path.getsize(path):
+                continue
+            rotated = int(seq) < latest[pid]
+            try:
+                os.kill(int(pid), 0)
+                alive = True
+            except ProcessLookupError:
+                alive = False
+            except PermissionError:
+                alive = True
+            if rotated or not alive:
+                os.remove(path)
+                self.offsets.pop(name, None)
+
+    def publish(self):
+        """Write the store as a new generation and bump the counter."""
+        store = self.store
+        with store.lock:
+            # catalog reloads remap under the store lock too, so ids and fingerprint agree
+            catalog = catalogs.get().fingerprint
+            matrix = store.to_csr()
+            user_ids = np.array(store.user_ids, dtype=str)
+            versions = np.array([store.versions.get(row, 0) for row in range(len(store.user_ids))], dtype=np.int64)
+            changes = store.changes
+        by_movie = matrix.tocsc()
+        order = np.argsort(user_ids, kind="stable")
+
+        generation = self.generation + 1
+        final_dir = os.path.join(self.shared_dir, f"g{generation}")
+        tmp_dir = final_dir + ".building"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        arrays = {
+            "indptr": matrix.indptr,
+            "indices": matrix.indices,
+            "data": matrix.data,
+            "movie_indptr": by_movie.indptr,
+            "movie_rows": by_movie.indices,
+            "user_ids": user_ids,
+            "sorted_ids": user_ids[order],
+            "sorted_rows": order.astype(np.int64),
+            "versions": versions,
+        }
+        for name, values in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), values)
+        with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+            json.dump({
+                "schema": SCHEMA_VERSION,
+                "generation": generation,
+                "created": time.time(),
+                "users": matrix.shape[0],
+                "movies": matrix.shape[1],
+                "likes": int(matrix.nnz),
+                "catalog": catalog,
+                "inbox_offsets": self.offsets,
+            }, f, indent=2)
+        os.replace(tmp_dir, final_dir)
+
+        # arrays first, counter last: a worker that sees N finds g<N> complete
+        self._counter[0] = generation
+        self._counter.flush()
+        self.generation = generation
+        self._published_changes = changes
+
+        for old in _generation_dirs(self.shared_dir)[:-KEEP_GENERATIONS]:
+            shutil.rmtree(os.path.join(self.shared_dir, f"g{old}"), ignore_errors=True)
+        return generation
+
+    def run(self):
+        """Tail the inboxes and publish whenever the store changed, until stop()."""
+        self.publish()
+        logger.info("Shared store owner publishing to %s (generation %s)", self.shared_dir, self.generation)
+        while not self._stop.wait(self.interval):
+            try:
+                applied = self.consume_inboxes()
+                if applied or self.store.changes != self._published_changes:
+                    self.publish()
+                    logger.debug("Generation %s published (%s inbox events)", self.generation, applied)
+                self._prune_inboxes()
+            except OSError as e:
+                logger.error("shared store publish failed: %s", e)
+
+    def stop(self):
+        self._stop.set()
+
+
+# ---------------- workers ----------------
+
+class _Generation:
+    """One published generation, memory-mapped read-only."""
+
+    def __init__(self, path):
+        manifest = _read_manifest(path)
+        if manifest is None or manifest.get("schema") != SCHEMA_VERSION:
+            raise ValueError(f"no usable generation in {path}")
+
+        def load(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        self.number = manifest["generation"]
+        self.offsets = manifest["inbox_offsets"]
+        self.n_movies = manifest["movies"]
+        self.catalog = manifest.get("catalog")      # fingerprint of the owner's catalog
+        self.matrix = csr_matrix(
+            (load("data"), load("indices"), load("indptr")),
+            shape=(manifest["users"], manifest["movies"]),
+            copy=False,
+        )
+        self.movie_indptr = load("movie_indptr")
+        self.movie_rows = load("movie_rows")
+        self.user_ids = load("user_ids")
+        self.sorted_ids = load("sorted_ids")
+        self.sorted_rows = load("sorted_rows")
+        self.versions = load("versions")
+
+    def row_of(self, key):
+        i = int(np.searchsorted(self.sorted_ids, key))
+        if i < len(self.sorted_ids) and self.sorted_ids[i] == key:
+            return int(self.sorted_rows[i])
+        return None
+
+    def liked(self, row):
+        indptr = self.matrix.indptr
+        return self.matrix.indices[indptr[row]:indptr[row + 1]]
+
+
+class _LikedRow(Set):
+    """A generation row as a read-only set, over its (sorted) mapped movie ids."""
+
+    __slots__ = ("movies",)
+
+    def __init__(self, movies):
+        self.movies = movies
+
+    @classmethod
+    def _from_iterable(cls, movie_ids):
+        # results of &, |, - are plain sets
+        return set(movie_ids)
+
+    def __len__(self):
+        return len(self.movies)
+
+    def __iter__(self):
+        return iter(self.movies.tolist())
+
+    def __contains__(self, movie_id):
+        i = int(np.searchsorted(self.movies, movie_id))
+        return i < len(self.movies) and self.movies[i] == movie_id
+
+
+class _Rows:
+    """
+    store.rows look-alike: row -> liked movie ids. Rows with this worker's
+    pending writes are sets with them applied, the others views of the
+    generation's arrays (nothing copied).
+    """
+
+    def __init__(self, generation, pending):
+        self.generation = generation
+        self.pending = pending      # row -> liked set, pending writes applied
+
+    def __len__(self):
+        return self.generation.matrix.shape[0]
+
+    def __getitem__(self, row):
+        liked = self.pending.get(row)
+        if liked is not None:
+            return liked
+        return _LikedRow(self.generation.liked(row))
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+
+class _Inbox:
+    """This worker's outgoing events (one file per process, rotated by size)."""
+
+    def __init__(self, inbox_dir):
+        self.inbox_dir = inbox_dir
+        self.name = None
+        self.size = 0
+        self.pending = 0        # written, not yet in a published generation
+        self._file = None
+        self._pid = None
+        self._seq = 0
+
+    def append(self, user_id, movie_id, action, catalog):
+        """Returns (file name, end offset) of the written event (`catalog`: fingerprint of its movie ids)."""
+        if self._file is None or self._pid != os.getpid():
+            if self._pid != os.getpid():    # forked: never share the parent's file
+                self._pid, self._seq = os.getpid(), 0
+            self.name = f"{self._pid}-{self._seq}.log"
+            self._file = open(os.path.join(self.inbox_dir, self.name), "ab")
+            self.size = self._file.tell()
+
+        line = io.StringIO()
+        csv.writer(line).writerow([user_id, movie_id, action, f"{time.time():.3f}", catalog])
+        data = line.getvalue().encode("utf-8")
+        self._file.write(data)
+        self._file.flush()
+        self.size += len(data)
+        return self.name, self.size
+
+    def rotate(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._seq += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SharedInteractionStore:
+    """
+    Worker-side InteractionStore: the read API over a published
+    generation, writes forwarded to the owner through the inbox.
+    """
+
+    def __init__(self, shared_dir=SHARED_STORE_DIR):
+        self.shared_dir = shared_dir
+        self.lock = threading.RLock()
+        self.listeners = []         # per-write hooks never fire here, the owner applies writes
+        self.remap_listeners = []
+        self.reset_listeners = []   # fn(store) after switching to a new generation (background thread)
+        self.log = _Inbox(os.path.join(shared_dir, "inbox"))
+        self._counter = None
+        self._gen = None
+        self._seen = None           # counter value switched to (or followed up to)
+        self._catalog_reload = None # background reload started by refresh()
+        self._retry_at = 0.0        # monotonic time before which a failed reload isn't retried
+        self._pending = []          # (inbox name, end offset, user key, movie id, action)
+        self._pending_by_user = {}  # user key -> {movie id: last action}
+        self._pending_changes = {}  # user key -> pending events that change their likes
+        self._pending_rows = {}     # generation row -> liked set with the pending writes applied
+        self._rows = None           # _Rows over the generation and _pending_rows
+        self._stale = threading.Event()     # reset listeners owe a rebuild
+        self._reindex_lock = threading.Lock()   # held while they run
+        self._reindexer = None
+        self._reindexer_pid = None
+
+    # ---------------- generations ----------------
+
+    def attach(self):
+        """Map the newest generation, waiting for the owner's first one."""
+        deadline = time.monotonic() + ATTACH_TIMEOUT_S
+        while True:
+            # the counter exists (at 0) from owner start, generation 1 follows after the first publish
+            if self._counter is None and os.path.exists(os.path.join(self.shared_dir, "current")):
+                self._counter = _counter(self.shared_dir, "r")
+            if self._counter is not None and int(self._counter[0]) > 0:
+                break
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"no interaction data published in {self.shared_dir} (is the owner running?)")
+            time.sleep(0.1)
+        self.refresh()
+        catalogs.add_listener(self._follow_catalog)
+        if not self._matches(self._gen, catalogs.get()):
+            self._reload_catalog(self._gen.number)
+        logger.info("Attached to shared interaction store: generation %s, %s users", self._gen.number, self.user_count)
+        return self
+
+    def refresh(self):
+        """Switch to the newest generation if the counter moved. Returns True if it did."""
+        number = int(self._counter[0])
+        if number == self._seen:
+            return False
+        # following the owner's catalog: _follow_catalog moves _seen once it has
+        if (self._catalog_reload is not None and self._catalog_reload.is_alive()) or time.monotonic() < self._retry_at:
+            return False
+        try:
+            generation = _Generation(os.path.join(self.shared_dir, f"g{number}"))
+        except (OSError, ValueError) as e:
+            if self._gen is None:
+                raise
+            logger.warning("generation %s not readable, staying on %s: %s", number, self._gen.number, e)
+            return False
+
+        with self.lock:
+            # the catalog swap holds this lock, so the fingerprint can't change under us
+            if self._gen is not None and not self._matches(generation, catalogs.get()):
+                self._reload_catalog(number)
+                return False
+            self._seen = number
+            self._switch(generation)
+        return True
+
+    @staticmethod
+    def _matches(generation, catalog):
+        # generations published before fingerprints were recorded match any catalog
+        return generation.catalog is None or generation.catalog == catalog.fingerprint
+
+    def _switch(self, generation):
+        self._gen = generation
+        self.log.pending = self._drop_applied(generation.offsets)
+        self._rows = _Rows(generation, self._pending_rows)
+        if self.reset_listeners:
+            self._mark_stale()
+
+    def _mark_stale(self):
+        """
+        Have the reset listeners rebuild from the new generation on a
+        background thread (one per process, switches while it runs are
+        coalesced). The indexes keep serving the previous generation
+        until their rebuilt versions are swapped in.
+        """
+        self._stale.set()
+        if self._reindexer_pid != os.getpid():     # forked: the parent's thread isn't here
+            self._reindexer_pid = os.getpid()
+            self._reindexer = threading.Thread(target=self._reindex_loop, name="shared-reindex", daemon=True)
+            self._reindexer.start()
+
+    def _reindex_loop(self):
+        while True:
+            self._stale.wait()
+            with self._reindex_lock:
+                self._stale.clear()
+                for listener in list(self.reset_listeners):
+                    try:
+                        listener(self)
+                    except Exception:   # the old index keeps serving, the next switch retries
+                        logger.exception("rebuild after generation %s failed", self._gen.number)
+
+    def _reload_catalog(self, number):
+        """The owner moved to another catalog (seen in generation `number`): reload ours in the background."""
+        if self._catalog_reload is not None and self._catalog_reload.is_alive():
+            return
+
+        def reload():
+            try:
+                catalogs.reload(force=True)
+            except (OSError, ValueError, KeyError) as e:
+                # refresh() tries again a bit later
+                self._retry_at = time.monotonic() + CATALOG_RETRY_S
+                logger.error("catalog reload to follow the owner failed: %s", e)
+
+        logger.info("owner published generation %s for another catalog, reloading", number)
+        self._catalog_reload = threading.Thread(target=reload, name="catalog-follow", daemon=True)
+        self._catalog_reload.start()
+
+    def _follow_catalog(self, old, new, mapping):
+        """
+        Catalog listener (runs inside the swap, under self.lock): switch to
+        the newest generation published for `new`. Raises ValueError when
+        the owner hasn't published one yet, which keeps the old catalog;
+        refresh() retries CATALOG_RETRY_S later.
+        """
+        for number in reversed(_generation_dirs(self.shared_dir)):
+            try:
+                generation = _Generation(os.path.join(self.shared_dir, f"g{number}"))
+            except (OSError, ValueError):
+                continue
+            if self._matches(generation, new):
+                break
+        else:
+            raise ValueError(f"no generation published for catalog {new.fingerprint:08x} yet")
+
+        # unpublished writes move to the new ids as well (movies that are gone drop out)
+        self._pending = [
+            (name, offset, key, int(mapping[movie_id]), action)
+            for name, offset, key, movie_id, action in self._pending
+            if movie_id < len(mapping) and mapping[movie_id] >= 0
+        ]
+        # the ids moved: indexes follow now (as in the owner), not with the next rebuild,
+        # and a rebuild still running from the old ids finishes first
+        with self._reindex_lock:
+            self._switch(generation)
+            for listener in self.remap_listeners:
+                # the new generation is already in the new ids and nothing writes to it
+                swap = listener(self, mapping, self.rows)
+                if swap is not None:
+                    swap(set())
+        # followed: refresh() switches from here on (to newer generations, if any)
+        self._seen = generation.number
+
+    def _drop_applied(self, offsets):
+        self._pending = [p for p in self._pending if p[1] > offsets.get(p[0], 0)]
+        self._pending_by_user = {}
+        self._pending_changes = {}
+        self._pending_rows = {}
+        liked = {}
+        for _, _, key, movie_id, action in self._pending:
+            if key not in liked:
+                row = self._gen.row_of(key)
+                liked[key] = set(self._gen.liked(row).tolist()) if row is not None else set()
+            # replayed over the generation: only events that change something count (as in the owner)
+            if (movie_id in liked[key]) != (action == LIKE):
+                self._pending_changes[key] = self._pending_changes.get(key, 0) + 1
+                if action == LIKE:
+                    liked[key].add(movie_id)
+                else:
+                    liked[key].discard(movie_id)
+            self._pending_by_user.setdefault(key, {})[movie_id] = action
+        for key, movies in liked.items():
+            row = self._gen.row_of(key)
+            if row is not None:
+                self._pending_rows[row] = movies
+        if not self._pending and self.log.size > INBOX_ROTATE_BYTES:
+            self.log.rotate()
+        return len(self._pending)
+
+    @property
+    def generation(self):
+        return self._gen.number
+
+    # ---------------- reads ----------------
+
+    @staticmethod
+    def _key(user_id):
+        return str(user_id)
+
+    @property
+    def n_movies(self):
+        return self._gen.n_movies
+
+    @property
+    def user_ids(self):
+        return self._gen.user_ids
+
+    @property
+    def rows(self):
+        return self._rows
+
+    @property
+    def user_count(self):
+        return self._gen.matrix.shape[0]
+
+    def row_of(self, user_id):
+        return self._gen.row_of(self._key(user_id))
+
+    def has_user(self, user_id):
+        key = self._key(user_id)
+        return self._gen.row_of(key) is not None or LIKE in self._pending_by_user.get(key, {}).values()
+
+    def liked(self, user_id):
+        """Sorted liked movie ids, this worker's unpublished writes included."""
+        key = self._key(user_id)
+        with self.lock:
+            row = self._gen.row_of(key)
+            liked = self._gen.liked(row).tolist() if row is not None else []
+            changes = self._pending_by_user.get(key)
+        if not changes:
+            return liked
+        liked = set(liked)
+        for movie_id, action in changes.items():
+            if action == LIKE:
+                liked.add(movie_id)
+            else:
+                liked.discard(movie_id)
+        return sorted(liked)
+
+    def liked_count(self, user_id):
+        return len(self.liked(user_id))
+
+    def is_liked(self, user_id, movie_id):
+        return movie_id in self.liked(user_id)
+
+    def version(self, user_id):
+        key = self._key(user_id)
+        with self.lock:
+            row = self._gen.row_of(key)
+            base = int(self._gen.versions[row]) if row is not None else 0
+            return base + self._pending_changes.get(key, 0)
+
+    def co_liked_counts(self, row):
+        """
+        Same as InteractionStore.co_liked_counts, from the shared by-movie
+        arrays; rows with pending writes (this worker's) are counted from
+        their pending sets.
+        """
+        gen, pending = self._gen, self._pending_rows
+        movies = self._rows[row]
+        if not len(movies):
+            return {}
+        others = np.concatenate([
+            gen.movie_rows[gen.movie_indptr[m]:gen.movie_indptr[m + 1]] for m in movies
+        ])
+        rows, counts = np.unique(others, return_counts=True)
+        overlap = dict(zip(rows.tolist(), counts.tolist()))
+        for other, liked in pending.items():
+            shared = len(movies & liked)
+            if shared:
+                overlap[other] = shared
+            else:
+                overlap.pop(other, None)
+        overlap.pop(row, None)
+        return overlap
+
+    def to_csr(self):
+        return self._gen.matrix
+
+    # ---------------- writes ----------------
+
+    def _write(self, user_id, movie_id, action):
+        key = self._key(user_id)
+        changes = self.is_liked(user_id, int(movie_id)) != (action == LIKE)
+        # callers hold self.lock, which the catalog swap holds too: ids and fingerprint agree
+        name, offset = self.log.append(key, int(movie_id), action, catalogs.get().fingerprint)
+        if changes:
+            self._pending_changes[key] = self._pending_changes.get(key, 0) + 1
+        self._pending.append((name, offset, key, int(movie_id), action))
+        self._pending_by_user.setdefault(key, {})[int(movie_id)] = action
+        self.log.pending = len(self._pending)
+        row = self._gen.row_of(key)
+        if row is not None:
+            self._pending_rows[row] = set(self.liked(key))
+
+    def like(self, user_id, movie_ids):
+        with self.lock:
+            for movie_id in movie_ids:
+                self._write(user_id, movie_id, LIKE)
+
+    def unlike(self, user_id, movie_id):
+        with self.lock:
+            if self.has_user(user_id):
+                self._write(user_id, movie_id, DISLIKE)
+
+    # ---------------- hooks ----------------
+
+    def add_listener(self, listener):
+        with self.lock:
+            self.listeners.append(listener)
+
+    def add_remap_listener(self, listener):
+        with self.lock:
+            self.remap_listeners.append(listener)
+
+    def add_reset_listener(self, listener):
+        with self.lock:
+            self.reset_listeners.append(listener)
+
+    def prepare_remap(self, mapping, n_movies):
+        pass
+
+    def remap_movies(self, mapping, n_movies):
+        """The owner remaps (its catalog reloads too); _follow_catalog picks up its generation."""
+        return False
+
+    def user_lock(self, user_id):
+        return self.lock
+
+    def exclusive(self):
+        return self.lock
+
+    def close(self):
+        self.log.close()
+
+
+def main():
+    # the owner always holds the real store, whatever STORE_MODE says
+    store = InteractionStore().load().open()
+    owner = StoreOwner(store)
+
+    # catalog reloads remap the likes here; workers get the new ids with the next generation
+    catalogs.add_preparer(lambda old, new, mapping: store.prepare_remap(mapping, len(new)))
+    catalogs.add_listener(owner.follow_catalog)
+    catalogs.guard_swaps(store.exclusive)
+    catalogs.watch(CATALOG_WATCH_INTERVAL_S)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: owner.stop())
+    try:
+        owner.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        owner.consume_inboxes()
+        owner.publish()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,101 @@
-import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from config import IMDB_PATH, MATRIX_PATH
+from config import SIMILARITY_MODE
+from recommender.store import get_store
+from recommender.lsh import get_lsh_index
 
 
-def get_similar_users(user_id, min_similarity=0.1, top_n=10):
+def get_similar_users(user_id, min_similarity=0.1, top_n=10, mode=None):
+    """
+    Top similar users as (user_id, cosine score), best first.
 
-    # load the matrix
-    df = pd.read_csv(MATRIX_PATH)
+    mode="exact" scores every user sharing a liked movie, mode="lsh"
+    only scores the MinHash/LSH candidates (estimated scores, bounded
+    work). Defaults to SIMILARITY_MODE from config; the exact path stays
+    available for verifying the approximate one.
+    """
+    mode = mode or SIMILARITY_MODE
+    if mode == "lsh":
+        return _approximate_similar_users(user_id, min_similarity, top_n)
+    return _exact_similar_users(user_id, min_similarity, top_n)
 
-    # ensure user_id type consistency
-    df["user_id"] = df["user_id"].astype(type(user_id))
 
-    if user_id not in df['user_id'].values:
-        return []
+def _top_users(user_ids, candidates, similarity_scores, min_similarity, top_n):
+    keep = similarity_scores >= min_similarity
+    candidates = candidates[keep]
+    similarity_scores = similarity_scores[keep]
 
-    user_ids = df['user_id'].values
-    movie_matrix = df.drop(columns=['user_id']).values
+    # highest score first, lower row first on ties
+    order = np.lexsort((candidates, -similarity_scores))[:top_n]
 
-    user_idx = np.where(user_ids == user_id)[0][0]
-    target_vector = movie_matrix[user_idx]
+    return [(user_ids[candidates[i]], similarity_scores[i]) for i in order]
 
-    # If user has no liked movies -> similarity meaningless
-    if np.sum(target_vector) == 0:
-        return []
 
-    similarity_scores = cosine_similarity(target_vector.reshape(1, -1), movie_matrix)[0]
+def _exact_similar_users(user_id, min_similarity, top_n):
+    """
+    Cosine similarity between the user and every other user, computed
+    only for users sharing at least one liked movie (inverted index).
 
-    similar_users = []
+    For binary like vectors cos(A, B) = |A ∩ B| / sqrt(|A| * |B|), so users
+    with no overlap score 0 and can never pass a positive `min_similarity`.
+    Ties keep matrix row order, as before.
+    """
 
-    for i in range(len(similarity_scores)):
-        if i == user_idx:
-            continue
-        if similarity_scores[i] < min_similarity:
-            continue
+    store = get_store()
 
-        similar_users.append((user_ids[i], similarity_scores[i]))
+    with store.lock:
+        user_idx = store.row_of(user_id)
+        if user_idx is None:
+            return []
 
-    similar_users.sort(key=lambda x: x[1], reverse=True)
+        # If user has no liked movies -> similarity meaningless
+        target_size = len(store.rows[user_idx])
+        if target_size == 0:
+            return []
 
-    return similar_users[:top_n]
+        overlap = store.co_liked_counts(user_idx)
+        if not overlap:
+            return []
+
+        candidates = np.fromiter(overlap.keys(), dtype=np.int64, count=len(overlap))
+        shared = np.fromiter(overlap.values(), dtype=np.float64, count=len(overlap))
+        sizes = np.fromiter(
+            (len(store.rows[i]) for i in candidates), dtype=np.float64, count=len(candidates)
+        )
+        user_ids = store.user_ids
+
+    similarity_scores = shared / np.sqrt(target_size * sizes)
+
+    return _top_users(user_ids, candidates, similarity_scores, min_similarity, top_n)
+
+
+def _approximate_similar_users(user_id, min_similarity, top_n):
+    """
+    Cosine estimated from the MinHash Jaccard estimate J and the set sizes:
+    |A ∩ B| = J / (1 + J) * (|A| + |B|).
+    """
+
+    store = get_store()
+    index = get_lsh_index(store)
+
+    with store.lock:
+        user_idx = store.row_of(user_id)
+        if user_idx is None:
+            return []
+
+        target_size = len(store.rows[user_idx])
+        if target_size == 0:
+            return []
+
+        candidates, jaccard = index.candidates(user_idx)
+        if not len(candidates):
+            return []
+
+        sizes = np.fromiter(
+            (len(store.rows[i]) for i in candidates), dtype=np.float64, count=len(candidates)
+        )
+        user_ids = store.user_ids
+
+    shared = jaccard / (1 + jaccard) * (target_size + sizes)
+    similarity_scores = shared / np.sqrt(target_size * sizes)
+
+    return _top_users(user_ids, candidates, similarity_scores, min_similarity, top_n)
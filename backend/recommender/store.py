@@ -0,0 +1,575 @@
+import atexit
+import csv
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from config import IMDB_PATH, MATRIX_PATH
+from config import LOG_FSYNC_EVERY, LOG_FSYNC_INTERVAL_MS
+from config import COMPACT_INTERVAL_S, COMPACT_MAX_EVENTS
+from config import STORE_MODE
+from recommender.event_log import EventLog, LIKE, DISLIKE
+from recommender.logs import get_logger
+from recommender.metrics import timed
+
+logger = get_logger("store")
+
+
+USER_LOCK_STRIPES = 64      # per-user write locks (users hashed onto stripes)
+
+
+def _build_csr(rows, n_movies):
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    for row, liked in enumerate(rows):
+        indptr[row + 1] = indptr[row] + len(liked)
+    indices = np.fromiter(
+        (m for liked in rows for m in sorted(liked)),
+        dtype=np.int32,
+        count=int(indptr[-1]),
+    )
+    data = np.ones(len(indices), dtype=np.float64)
+    return csr_matrix((data, indices, indptr), shape=(len(rows), n_movies))
+
+
+class _Remap:
+    """
+    The store's rows, inverted index and CSR moved to new movie ids,
+    plus the remap listeners' swaps (see InteractionStore.prepare_remap).
+    Nothing to build when no id moved.
+    """
+
+    def __init__(self, store, mapping, n_movies, rows):
+        self.mapping = mapping
+        self.moved = bool(np.any(mapping != np.arange(len(mapping))))
+        self.rows = []
+        self.movie_users = {}
+        self.changed = set()    # rows whose ids differ (their version is bumped)
+        self.csr = None
+        if self.moved:
+            self._lookup = mapping.tolist()
+            for row, liked in enumerate(rows):
+                self.put(row, liked)
+            self.csr = _build_csr(self.rows, n_movies)
+        swaps = (listener(store, mapping, self.rows if self.moved else store.rows)
+                 for listener in list(store.remap_listeners))
+        self.swaps = [swap for swap in swaps if swap is not None]
+
+    def put(self, row, liked):
+        """(Re)place `row` from its liked set in the old ids; rows past the end come in order."""
+        lookup = self._lookup
+        remapped = {lookup[m] for m in liked if lookup[m] >= 0}
+        if row < len(self.rows):
+            for movie_id in self.rows[row]:
+                self.movie_users[movie_id].discard(row)
+            self.rows[row] = remapped
+        else:
+            self.rows.append(remapped)
+        for movie_id in remapped:
+            self.movie_users.setdefault(movie_id, set()).add(row)
+        if remapped != liked:
+            self.changed.add(row)
+        else:
+            self.changed.discard(row)
+
+
+class InteractionStore:
+    """
+    Process-wide, in-memory view of the user-item matrix.
+
+    The CSV on disk is dense (one column per movie), but only the liked
+    movies of each user are kept here, so memory grows with the number
+    of likes instead of users x catalog size.
+
+    Rows are kept in the same order as the CSV and every user_id maps
+    to its row through `user_index`. A CSR matrix of the whole store is
+    built lazily and cached; after writes only the changed rows are
+    rebuilt, the rest is copied over in bulk. `movie_users` is the
+    inverted index (movie id -> rows that liked it), kept in sync on
+    every write so neighbour search only visits overlapping users.
+
+    Locking: a write holds its user's stripe lock (so one user's events
+    reach memory and the log in the same order) and takes the store
+    lock only for the in-memory update itself. Readers that walk many
+    rows hold the store lock.
+
+    The CSV is only the snapshot. Every like/dislike is queued for an
+    event log next to it (O(1) per action, written behind in groups by
+    the log's flusher thread), and a background thread
+    periodically compacts the log back into the snapshot. On startup the
+    snapshot is loaded and the log tail replayed on top of it.
+    """
+
+    def __init__(self, path=MATRIX_PATH, n_movies=None):
+        self.path = path
+        self.n_movies = n_movies
+        self.user_ids = []      # row -> user_id
+        self.user_index = {}    # user_id -> row
+        self.rows = []          # row -> set of liked movie ids
+        self.movie_users = {}   # movie id -> set of rows that liked it
+        self.listeners = []     # fn(store, row, movie_id, action) after each write
+        self.remap_listeners = []   # fn(store, mapping, rows) -> fn(touched), see add_remap_listener
+        self.reset_listeners = []   # fn(store) when the whole store is replaced (shared_store workers)
+        self.versions = {}      # row -> number of changes (cache invalidation)
+        self.changes = 0        # total changes, for "anything new since?" checks
+        self.lock = threading.RLock()
+        self._stripes = [threading.RLock() for _ in range(USER_LOCK_STRIPES)]
+        self._csr = None
+        self._dirty = set()     # rows changed since _csr was built
+        self.log = EventLog(
+            path + ".log",
+            fsync_every=LOG_FSYNC_EVERY,
+            fsync_interval_ms=LOG_FSYNC_INTERVAL_MS,
+        )
+        self._last_compact = time.monotonic()
+        self._compact_lock = threading.RLock()  # one snapshot writer at a time
+        self._remap_writer = None               # compaction started by the last remap
+        self._remap = None                      # built by prepare_remap, swapped in by remap_movies
+        self._touched = None                    # rows written since prepare_remap copied them
+        self._stop = threading.Event()
+        self._worker = None
+
+    # ---------------- loading / saving ----------------
+
+    def load(self):
+        """Parse the snapshot once (liked cells only) and replay the log tail."""
+        with self.lock:
+            self.user_ids = []
+            self.user_index = {}
+            self.rows = []
+            self.movie_users = {}
+            self.versions = {}
+            self._csr = None
+            self._dirty = set()
+
+            if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+                logger.info("user_item matrix is not created, starting with empty store")
+                if self.n_movies is None:
+                    self.n_movies = len(pd.read_csv(IMDB_PATH, usecols=["Series_Title"]))
+            else:
+                self._load_snapshot()
+
+            replayed = 0
+            for user_id, movie_id, action, _ in self.log.replay():
+                self._apply(user_id, movie_id, action)
+                replayed += 1
+
+        logger.info("Interaction store loaded: %s users, %s log events replayed", len(self.user_ids), replayed)
+        return self
+
+    def _load_snapshot(self):
+        with open(self.path, newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            movie_ids = [int(col) for col in header[1:]]
+            if self.n_movies is None:
+                self.n_movies = max(movie_ids) + 1 if movie_ids else 0
+
+            for record in reader:
+                if not record:
+                    continue
+                liked = set()
+                for movie_id, value in zip(movie_ids, record[1:]):
+                    if value not in ("0", "0.0", "") and float(value) != 0:
+                        liked.add(movie_id)
+                self._add_user(record[0], liked)
+
+    def _write_snapshot(self, user_ids, rows):
+        """
+        Write the dense CSV the rest of the tooling expects.
+        Written to a temp file first so a crash never leaves a half-written matrix.
+        """
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["user_id"] + [str(i) for i in range(self.n_movies)])
+            for user_id, liked in zip(user_ids, rows):
+                values = [0] * self.n_movies
+                for movie_id in liked:
+                    values[movie_id] = 1
+                writer.writerow([user_id] + values)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    # ---------------- log / compaction ----------------
+
+    def open(self):
+        """Start the log (and its flusher) and run the background compaction job."""
+        self.log.open()
+        if self._worker is None:
+            self._worker = threading.Thread(
+                target=self._maintenance, name="interaction-log", daemon=True
+            )
+            self._worker.start()
+            atexit.register(self.close)
+        return self
+
+    def _maintenance(self):
+        # the log flushes itself (group commit), this thread only compacts
+        tick = max(self.log.fsync_interval, 0.05)
+        while not self._stop.wait(tick):
+            if self.log.count and (
+                self.log.count >= COMPACT_MAX_EVENTS
+                or time.monotonic() - self._last_compact >= COMPACT_INTERVAL_S
+            ):
+                try:
+                    self.compact()
+                except OSError as e:
+                    logger.error("compaction failed: %s", e)
+
+    def compact(self):
+        """
+        Fold the log into a fresh snapshot.
+        Only the log rotation and a copy of the rows happen under the lock,
+        the (dense) CSV is written outside it.
+        """
+        with self._compact_lock:
+            with self.lock:
+                self.log.rotate()
+                user_ids = list(self.user_ids)
+                rows = [frozenset(liked) for liked in self.rows]
+
+            self._write_snapshot(user_ids, rows)
+            self.log.finish_compaction()
+            self._last_compact = time.monotonic()
+
+    def prepare_remap(self, mapping, n_movies):
+        """
+        The slow half of remap_movies, run before its exclusive section
+        (the catalog reload does, see CatalogManager.add_preparer): moves
+        a copy of the rows to the new ids and builds the inverted index,
+        the CSR and the remap listeners' state from it while reads and
+        writes go on. Rows written meanwhile are noted; remap_movies
+        moves just those again and swaps everything in.
+        """
+        mapping = np.asarray(mapping, dtype=np.int64)
+        moved = bool(np.any(mapping != np.arange(len(mapping))))
+        with self.lock:
+            # a copy, like compact(): the Python-level remap runs on it outside the lock
+            rows = [frozenset(liked) for liked in self.rows] if moved else []
+            self._touched = set()
+        self._remap = _Remap(self, mapping, n_movies, rows)
+
+    def remap_movies(self, mapping, n_movies):
+        """
+        Follow a catalog reload: mapping[old movie id] = new id (-1 = movie
+        gone), n_movies = new catalog size.
+
+        If no existing id moved (e.g. movies appended) only the column count
+        changes. Otherwise every like is moved to its new id and the log is
+        rotated under the same lock, so the active log never mixes old and
+        new ids; a compaction on a background thread then writes the
+        snapshot in the new ids.
+
+        Called by the catalog reload inside `exclusive()`, so readers and
+        writers see the new ids and the new catalog together. After
+        prepare_remap with the same mapping only the rows written since
+        are moved here and the rest is reference swaps; without it the
+        whole O(total likes) remap runs in the exclusive section.
+        """
+        mapping = np.asarray(mapping, dtype=np.int64)
+
+        # every stripe too: no write is between its memory update and its log line
+        with self.exclusive():
+            remap, self._remap = self._remap, None
+            touched, self._touched = self._touched, None
+            if remap is None or not np.array_equal(remap.mapping, mapping):
+                touched = set()
+                remap = _Remap(self, mapping, n_movies, self.rows)
+
+            self.n_movies = n_movies
+            if remap.moved:
+                self.log.rotate()
+                # rows written since the copy (new users included) move now
+                for row in sorted(touched.union(range(len(remap.rows), len(self.rows)))):
+                    remap.put(row, self.rows[row])
+                for row in remap.changed:
+                    self.versions[row] = self.versions.get(row, 0) + 1
+                self.rows, self.movie_users = remap.rows, remap.movie_users
+                self._csr = remap.csr
+                self._dirty = set(touched)      # built from the copy: patched on next to_csr
+            else:
+                self._csr = None
+                self._dirty = set()
+            self.changes += 1
+            for swap in remap.swaps:
+                swap(touched)
+
+            if remap.moved:
+                # not inline: the caller may still hold the store lock (see exclusive)
+                self._remap_writer = threading.Thread(target=self._compact_after_remap, name="remap-snapshot")
+                self._remap_writer.start()
+
+        return remap.moved
+
+    def _compact_after_remap(self):
+        try:
+            self.compact()
+        except OSError as e:
+            logger.error("snapshot after remap failed, the next compaction retries: %s", e)
+
+    def _stripe(self, key):
+        return self._stripes[hash(key) % USER_LOCK_STRIPES]
+
+    @contextmanager
+    def _all_stripes(self):
+        # always in stripe order, so two callers can't deadlock
+        for stripe in self._stripes:
+            stripe.acquire()
+        try:
+            yield
+        finally:
+            for stripe in reversed(self._stripes):
+                stripe.release()
+
+    def user_lock(self, user_id):
+        """
+        The lock writes of this user hold (re-entrant). Hold it while
+        resolving titles to movie ids for a write: a catalog reload can't
+        remap the ids in between.
+        """
+        return self._stripe(self._key(user_id))
+
+    @contextmanager
+    def exclusive(self):
+        """
+        No compaction, write or locked read runs meanwhile (lock order:
+        compaction, stripes, store lock). The catalog reload remaps the
+        store and swaps the catalog in one such section.
+        """
+        with self._compact_lock, self._all_stripes(), self.lock:
+            yield
+
+    def close(self):
+        """Stop the background job and flush whatever the log still has queued."""
+        self._stop.set()
+        writer = self._remap_writer
+        if writer is not None:
+            writer.join()
+        self.log.close()
+
+    # ---------------- reads ----------------
+
+    @staticmethod
+    def _key(user_id):
+        # ids round-trip through the CSV as strings
+        return str(user_id)
+
+    def has_user(self, user_id):
+        return self._key(user_id) in self.user_index
+
+    def row_of(self, user_id):
+        return self.user_index.get(self._key(user_id))
+
+    @property
+    def user_count(self):
+        return len(self.user_ids)
+
+    def liked(self, user_id):
+        """Sorted list of liked movie ids ([] for unknown users)."""
+        row = self.row_of(user_id)
+        if row is None:
+            return []
+        return sorted(self.rows[row])
+
+    def liked_count(self, user_id):
+        row = self.row_of(user_id)
+        return 0 if row is None else len(self.rows[row])
+
+    def version(self, user_id):
+        """Bumped on every change to the user's likes (0 for unknown users)."""
+        row = self.row_of(user_id)
+        return 0 if row is None else self.versions.get(row, 0)
+
+    def is_liked(self, user_id, movie_id):
+        row = self.row_of(user_id)
+        return row is not None and movie_id in self.rows[row]
+
+    def co_liked_counts(self, row):
+        """
+        {other_row: number of movies liked by both} for every user sharing
+        at least one liked movie with `row` (itself excluded).
+        Cost is the sum of popularity of the user's liked movies.
+        """
+        counts = {}
+        for movie_id in self.rows[row]:
+            for other in self.movie_users.get(movie_id, ()):
+                counts[other] = counts.get(other, 0) + 1
+        counts.pop(row, None)
+        return counts
+
+    def to_csr(self):
+        """
+        users x movies CSR matrix of likes. Cached; after writes only the
+        changed rows are rebuilt (a new matrix, callers may keep the old one).
+        """
+        with self.lock:
+            if self._csr is None:
+                self._csr = _build_csr(self.rows, self.n_movies)
+            elif self._dirty or self._csr.shape[0] != len(self.rows):
+                self._csr = self._patch_csr(self._csr, self._dirty)
+            self._dirty = set()
+            return self._csr
+
+    def _patch_csr(self, base, dirty):
+        """
+        `base` with the `dirty` rows (and rows added since) taken from
+        self.rows: the untouched rows are copied with one masked
+        assignment, so Python only walks the changed rows.
+        """
+        n_rows, old_rows = len(self.rows), base.shape[0]
+        dirty = np.array(sorted(dirty), dtype=np.int64)
+        liked = [sorted(self.rows[row]) for row in dirty.tolist()]
+
+        old_lengths = np.diff(base.indptr)
+        lengths = np.zeros(n_rows, dtype=np.int64)
+        lengths[:old_rows] = old_lengths
+        lengths[dirty] = [len(movies) for movies in liked]
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+
+        # rows kept as they are: same order in both matrices
+        kept = np.ones(n_rows, dtype=bool)
+        kept[dirty] = False
+        kept[old_rows:] = False
+        indices = np.empty(int(indptr[-1]), dtype=np.int32)
+        indices[np.repeat(kept, lengths)] = base.indices[np.repeat(kept[:old_rows], old_lengths)]
+        for row, movies in zip(dirty.tolist(), liked):
+            indices[indptr[row]:indptr[row + 1]] = movies
+
+        data = np.ones(len(indices), dtype=np.float64)
+        return csr_matrix((data, indices, indptr), shape=(n_rows, self.n_movies))
+
+    # ---------------- writes ----------------
+
+    def _add_user(self, user_id, liked=None):
+        key = self._key(user_id)
+        row = len(self.user_ids)
+        self.user_ids.append(key)
+        self.user_index[key] = row
+        self.rows.append(set(liked or ()))
+        for movie_id in self.rows[row]:
+            self.movie_users.setdefault(movie_id, set()).add(row)
+        return row
+
+    def _apply(self, user_id, movie_id, action):
+        row = self.row_of(user_id)
+        if action == LIKE:
+            if row is None:
+                row = self._add_user(user_id)
+            if movie_id in self.rows[row]:
+                return
+            self.rows[row].add(movie_id)
+            self.movie_users.setdefault(movie_id, set()).add(row)
+        else:
+            if row is None or movie_id not in self.rows[row]:
+                return
+            self.rows[row].discard(movie_id)
+            self.movie_users[movie_id].discard(row)
+        # only real changes reach the listeners (repeated likes are no-ops)
+        self._dirty.add(row)
+        if self._touched is not None:
+            self._touched.add(row)
+        self.changes += 1
+        self.versions[row] = self.versions.get(row, 0) + 1
+        for listener in self.listeners:
+            listener(self, row, movie_id, action)
+
+    def add_listener(self, listener):
+        """
+        Register a derived index to keep in sync with writes.
+        Called under the store lock, so listeners must be cheap.
+        """
+        with self.lock:
+            self.listeners.append(listener)
+
+    def add_remap_listener(self, listener):
+        """
+        Register a derived index to follow movie id remaps.
+        `listener(store, mapping, rows)` runs first, outside the locks
+        (prepare_remap), with the rows already in the new ids: it builds
+        its new state aside and returns `swap(touched)` (or None).
+        remap_movies calls that inside its exclusive section, after the
+        store's own swap, with the rows written in between (store.rows
+        has them in the new ids by then).
+        """
+        with self.lock:
+            self.remap_listeners.append(listener)
+
+    def add_reset_listener(self, listener):
+        """
+        Register a derived index to rebuild when the whole store is replaced.
+        Never happens here; a shared_store worker does it on every new generation.
+        """
+        with self.lock:
+            self.reset_listeners.append(listener)
+
+    def refresh(self):
+        """Pick up state published by another process (only shared_store workers have any)."""
+        return False
+
+    def like(self, user_id, movie_ids):
+        """Mark movies as liked, creating the user row if needed."""
+        key = self._key(user_id)
+        with self._stripe(key):
+            if not self.has_user(key):
+                logger.debug("User %s not present in store, creating row", user_id)
+            for movie_id in movie_ids:
+                # memory first, then the log: a compaction in between folds
+                # the change into the snapshot and replaying it is a no-op
+                with self.lock:
+                    self._apply(key, int(movie_id), LIKE)
+                self.log.append(key, int(movie_id), LIKE)
+
+    def apply_unlogged(self, events):
+        """
+        Apply (user_id, movie_id, action) events without logging them.
+        For bulk imports: the caller compacts afterwards, which is what
+        makes the events durable.
+        """
+        with self.lock:
+            for user_id, movie_id, action in events:
+                self._apply(user_id, int(movie_id), action)
+
+    def unlike(self, user_id, movie_id):
+        """Clear a like. Unknown users are ignored (nothing to undo)."""
+        key = self._key(user_id)
+        with self._stripe(key):
+            if not self.has_user(key):
+                return
+            with self.lock:
+                self._apply(key, int(movie_id), DISLIKE)
+            self.log.append(key, int(movie_id), DISLIKE)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(read_only=False):
+    """
+    Return the process-wide store, loading it on first use.
+
+    read_only=True (offline jobs) loads without opening the log, so the
+    process never appends to it or compacts it under the server's feet.
+
+    With STORE_MODE = "worker" the store is a view of the data published
+    by the shared_store owner process instead (see shared_store.py).
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if STORE_MODE == "worker":
+                    from recommender.shared_store import SharedInteractionStore
+                    with timed("matrix_attach"):
+                        _store = SharedInteractionStore().attach()
+                else:
+                    with timed("matrix_load"):
+                        store = InteractionStore().load()
+                    _store = store if read_only else store.open()
+    return _store
@@ -0,0 +1,362 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from config import YT_API_KEY, YT_SEARCH_URL
+from config import TRAILER_CACHE_PATH, TRAILER_CACHE_SIZE
+from config import TRAILER_CACHE_TTL_S, TRAILER_NEGATIVE_TTL_S, TRAILER_TIMEOUT_S
+from config import TRAILER_MAX_CONNECTIONS
+
+try:
+    import httpx
+except ImportError:     # async lookups fall back to the requests session on a thread pool
+    httpx = None
+from recommender.validator import normalize_title
+from recommender.logs import get_logger
+
+logger = get_logger("trailer")
+
+
+FOUND = "found"
+NOT_FOUND = "not_found"     # search returned no items
+NOT_VIDEO = "not_video"     # first item is a channel/playlist
+
+
+class TrailerLookupError(Exception):
+    """
+    The upstream search failed (HTTP error / timeout / unexpected body).
+    Never cached. The message never carries the request URL (it has the
+    API key in its query string).
+    """
+
+
+def _wake(future):
+    if not future.done():   # the waiting task may have been cancelled meanwhile
+        future.set_result(None)
+
+
+class _Flight:
+    """
+    One upstream call in progress. Callers of the same title wait on it,
+    from threads (wait) or from event loops (wait_async), whichever path
+    started it.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self._lock = threading.Lock()
+        self._loop_waiters = []     # (loop, future) of wait_async callers
+
+    def finish(self, result=None, error=None):
+        with self._lock:
+            self.result, self.error = result, error
+            self.done.set()
+            waiters, self._loop_waiters = self._loop_waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:    # that loop is closed, nobody is waiting there any more
+                pass
+
+    def _outcome(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def wait(self):
+        self.done.wait()
+        return self._outcome()
+
+    async def wait_async(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self.done.is_set():
+                future.set_result(None)
+            else:
+                self._loop_waiters.append((loop, future))
+        # a follower giving up only cancels its own future, never the leader's call
+        await future
+        return self._outcome()
+
+
+class TrailerResolver:
+    """
+    title -> YouTube videoId with caching in front of the search API.
+
+    * in-memory LRU with TTL (negative results get their own, shorter TTL)
+    * persistent on-disk cache (JSON lines, last entry per title wins),
+      so restarts don't spend API quota again
+    * one pooled HTTP session with timeouts
+    * single-flight: concurrent lookups of the same title share one upstream
+      call, whether they come through resolve or resolve_async
+    * resolve_async for the ASGI app (asgi.py): the search is awaited on
+      the event loop (httpx when installed), at most `max_connections`
+      calls in flight, each bounded by `timeout` as a whole
+
+    `base_url` can point at a local stub server for testing.
+    """
+
+    def __init__(
+        self,
+        api_key=YT_API_KEY,
+        base_url=YT_SEARCH_URL,
+        cache_path=TRAILER_CACHE_PATH,
+        max_entries=TRAILER_CACHE_SIZE,
+        ttl=TRAILER_CACHE_TTL_S,
+        negative_ttl=TRAILER_NEGATIVE_TTL_S,
+        timeout=TRAILER_TIMEOUT_S,
+        max_connections=TRAILER_MAX_CONNECTIONS,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.max_connections = max_connections
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_connections)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.lock = threading.Lock()
+        self._file_lock = threading.Lock()  # disk cache appends (never under self.lock)
+        self._cache = OrderedDict()     # key -> (status, video_id, expires_at)
+        self._flights = {}              # key -> _Flight (resolve and resolve_async)
+        self._async_client = None       # httpx.AsyncClient, created on first use
+        self._io_pool = None            # requests on threads when httpx is missing
+        self.hits = 0
+        self.misses = 0         # upstream calls started
+        self.coalesced = 0      # lookups that waited on someone else's call
+
+        self._load_disk_cache()
+
+    # ---------------- cache ----------------
+
+    def _load_disk_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        now = time.time()
+        lines = 0
+        try:
+            with open(self.cache_path) as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                        key, status, video_id = entry["key"], entry["status"], entry["video_id"]
+                        expires = float(entry["expires"])
+                    except (ValueError, KeyError, TypeError):
+                        continue    # torn last line / hand-edited entry
+                    if expires > now:
+                        self._remember(key, status, video_id, expires)
+        except OSError as e:
+            logger.warning("Trailer cache %s not readable, starting empty: %s", self.cache_path, e)
+            return
+
+        # mostly superseded/expired lines -> rewrite with the live entries only
+        if lines > 2 * len(self._cache) + 100:
+            tmp_path = self.cache_path + ".tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    for key, (status, video_id, expires) in self._cache.items():
+                        f.write(json.dumps({"key": key, "status": status, "video_id": video_id, "expires": expires}) + "\n")
+                os.replace(tmp_path, self.cache_path)
+            except OSError as e:
+                logger.warning("Trailer cache %s not compacted: %s", self.cache_path, e)
+
+    def _remember(self, key, status, video_id, expires):
+        self._cache[key] = (status, video_id, expires)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def _persist(self, key, status, video_id, expires):
+        if not self.cache_path:
+            return
+        line = json.dumps({"key": key, "status": status, "video_id": video_id, "expires": expires})
+        try:
+            with self._file_lock, open(self.cache_path, "a") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            # the lookup itself succeeded, it just won't survive a restart
+            logger.warning("Trailer cache %s not written: %s", self.cache_path, e)
+
+    def _cached(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[2] <= time.time():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry[0], entry[1]
+
+    # ---------------- lookup ----------------
+
+    def _params(self, title):
+        return {
+            "part": "snippet",
+            "q": f"{title} trailer",
+            "type": "video",
+            "maxResults": 1,
+            "key": self.api_key,
+        }
+
+    def _search(self, title):
+        try:
+            res = self.session.get(self.base_url, params=self._params(title), timeout=self.timeout)
+        except requests.RequestException as e:
+            # not str(e): requests puts the URL, API key included, in the message
+            raise TrailerLookupError(f"request failed ({type(e).__name__})") from None
+        return self._parse(res)
+
+    async def _search_async(self, title):
+        if httpx is None:
+            if self._io_pool is None:
+                self._io_pool = ThreadPoolExecutor(self.max_connections, thread_name_prefix="trailer")
+            return await asyncio.get_running_loop().run_in_executor(self._io_pool, self._search, title)
+
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections),
+            )
+        try:
+            res = await self._async_client.get(self.base_url, params=self._params(title))
+        except httpx.HTTPError as e:
+            raise TrailerLookupError(f"request failed ({type(e).__name__})") from None
+        return self._parse(res)
+
+    def _parse(self, res):
+        """(status, video_id) from a search response (requests or httpx)."""
+        if res.status_code != 200:
+            raise TrailerLookupError(f"YouTube API returned {res.status_code}")
+
+        try:
+            body = res.json()
+        except ValueError:
+            raise TrailerLookupError("YouTube API returned invalid JSON") from None
+
+        items = body.get("items", []) if isinstance(body, dict) else None
+        if not isinstance(items, list):
+            raise TrailerLookupError("YouTube API returned an unexpected body")
+        if not items:
+            return NOT_FOUND, None
+
+        video = items[0].get("id") if isinstance(items[0], dict) else None
+        if not isinstance(video, dict):
+            raise TrailerLookupError("YouTube API returned an unexpected item")
+        if video.get("kind") != "youtube#video":
+            return NOT_VIDEO, None
+
+        video_id = video.get("videoId")
+        if not isinstance(video_id, str) or not video_id:
+            raise TrailerLookupError("YouTube API returned a video without an id")
+        return FOUND, video_id
+
+    def _join(self, key):
+        """(cached result, None, None) or (None, flight, whether this caller leads it)."""
+        with self.lock:
+            cached = self._cached(key)
+            if cached is not None:
+                self.hits += 1
+                return cached, None, False
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+            return None, flight, leader
+
+    def _land(self, key, flight, result=None, error=None):
+        with self.lock:
+            del self._flights[key]
+        flight.finish(result, error)
+
+    def resolve(self, title):
+        """
+        (status, video_id) for a title. Raises TrailerLookupError when the
+        upstream call fails; failures are not cached.
+        """
+        key = normalize_title(title)
+        cached, flight, leader = self._join(key)
+        if cached is not None:
+            return cached
+        if not leader:
+            # someone is already asking upstream for this title
+            return flight.wait()
+
+        try:
+            result = self._store(key, *self._search(title))
+        except BaseException as e:
+            self._land(key, flight, error=e if isinstance(e, Exception) else TrailerLookupError("lookup interrupted"))
+            raise
+        self._land(key, flight, result)
+        return result
+
+    async def resolve_async(self, title):
+        """
+        resolve() for callers on an event loop: same cache and flights, the
+        upstream call is awaited instead of blocking a thread. Raises
+        TrailerLookupError on failure or when it takes longer than `timeout`.
+        """
+        key = normalize_title(title)
+        cached, flight, leader = self._join(key)
+        if cached is not None:
+            return cached
+        if not leader:
+            return await flight.wait_async()
+
+        try:
+            try:
+                result = await asyncio.wait_for(self._search_async(title), self.timeout)
+            except asyncio.TimeoutError:
+                raise TrailerLookupError(f"no answer within {self.timeout}s") from None
+            result = self._store(key, *result)
+        except BaseException as e:
+            # followers see the same error (a cancelled leader fails them too)
+            self._land(key, flight, error=e if isinstance(e, Exception) else TrailerLookupError("lookup cancelled"))
+            raise
+        self._land(key, flight, result)
+        return result
+
+    def _store(self, key, status, video_id):
+        expires = time.time() + (self.ttl if status == FOUND else self.negative_ttl)
+        with self.lock:
+            self._remember(key, status, video_id, expires)
+        # outside the lock: cache hits never wait on the disk
+        self._persist(key, status, video_id, expires)
+        return status, video_id
+
+    async def aclose(self):
+        """Release the async HTTP client / thread pool (ASGI shutdown)."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._io_pool is not None:
+            self._io_pool.shutdown(wait=False)
+            self._io_pool = None
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "size": len(self._cache),
+            }
@@ -10,7 +10,7 @@ def normalize_title(title: str) -> str:
     return title.strip().lower()
 
 
-def validate_request(data, df_movies):
+def validate_request(data):
     if not data:
         return False, "Request body must be JSON"
 
@@ -26,4 +26,22 @@ def validate_request(data, df_movies):
 
     
 
+    return True, None
+
+
+
+def validate_batch_request(data, max_users):
+    if not data:
+        return False, "Request body must be JSON"
+
+    user_ids = data.get("user_ids")
+    if not isinstance(user_ids, list):
+        return False, "user_ids must be a list"
+    if len(user_ids) > max_users:
+        return False, f"at most {max_users} user_ids per batch"
+
+    for user_id in user_ids:
+        if not isinstance(user_id, USER_ID_TYPE):
+            return False, f"user_id must be {USER_ID_TYPE.__name__}"
+
     return True, None
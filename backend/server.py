@@ -1,28 +1,180 @@
 from config import SERVER_HOST, SERVER_PORT, DEBUG
-from config import IMDB_PATH
 from config import MAX_RECOMMENDATIONS,MIN_SIMILARITY_SCORE 
-from config import MATRIX_PATH,YT_API_KEY
-
-from recommender.validator import validate_request
+from config import COLLAB_ENGINE
+from config import GENRE_PAGE_SIZE, SEARCH_LIMIT
+from config import COLD_START_SIMILAR
+from config import RECOMMEND_CACHE_SIZE
+from config import SIMILARITY_MODE, BATCH_MAX_USERS
+from config import CATALOG_WATCH_INTERVAL_S, ADMIN_TOKEN
+
+from recommender.validator import validate_request, validate_batch_request
 from recommender.matrix import update_user_matrix
 from recommender.similarity import get_similar_users
 from recommender.genre_recommender import recommend_by_genre
 from recommender.recommend import recommend_movies
-
-import pandas as pd
-import requests
+from recommender.batch import recommend_batch
+from recommender.precompute import PrecomputedRecommendations
+from recommender.item_recommender import recommend_by_items
+from recommender.als import get_als_model, recommend_by_als
+from recommender.store import get_store
+from recommender.catalog import get_catalog, catalogs
+from recommender.facets import parse_filters
+from recommender.trailer import TrailerResolver, TrailerLookupError
+from recommender.trailer import FOUND, NOT_FOUND
+from recommender.cache import RecommendationCache
+from recommender.metrics import metrics, timed
+from recommender.logs import get_logger
+
+import hmac
 import json
 import random
+import signal
+import sys
+import time
 
 
-from flask import Flask, request, jsonify # type: ignore
+from flask import Flask, Response, g, request, jsonify # type: ignore
 from flask_cors import CORS
 
+logger = get_logger("server")
+
 app = Flask(__name__)
 CORS(app) 
 
-# Load datasets once
-df_movies = pd.read_csv(IMDB_PATH)
+# Load datasets once (the catalog can be reloaded later, see follow_catalog)
+get_catalog()
+interactions = get_store()
+trailers = TrailerResolver()
+rec_cache = RecommendationCache(RECOMMEND_CACHE_SIZE)
+precomputed = PrecomputedRecommendations()
+# None unless COLLAB_ENGINE is "als" and a trained model exists (then user-CF serves)
+als_model = get_als_model() if COLLAB_ENGINE == "als" else None
+
+
+def follow_catalog(old, new, mapping):
+    '''runs on every catalog reload, before the new catalog goes live:
+    move likes (and model rows) to the new movie ids, drop cached cards'''
+    interactions.remap_movies(mapping, len(new))
+    if als_model is not None:
+        als_model.remap(mapping, len(new))
+    rec_cache.clear()
+
+# the slow part of moving the likes runs first, outside the store's locks
+catalogs.add_preparer(lambda old, new, mapping: interactions.prepare_remap(mapping, len(new)))
+catalogs.add_listener(follow_catalog)
+# remap + swap in one exclusive section of the store: anyone holding the store
+# lock (or a user's write lock) sees ids and catalog change together
+catalogs.guard_swaps(interactions.exclusive)
+catalogs.watch(CATALOG_WATCH_INTERVAL_S)
+
+
+# stats the components already keep, read when /metrics is scraped
+def _stats_counters(stats, keys):
+    return [({"kind": key}, stats[key]) for key in keys]
+
+metrics.register("recommend_cache_events_total", "counter", "Recommendation cache hits and misses",
+                 lambda: _stats_counters(rec_cache.stats(), ("hits", "misses")))
+metrics.register("recommend_cache_entries", "gauge", "Entries in the recommendation cache",
+                 lambda: rec_cache.stats()["size"])
+metrics.register("trailer_lookups_total", "counter", "Trailer lookups by outcome",
+                 lambda: _stats_counters(trailers.stats(), ("hits", "misses", "coalesced")))
+metrics.register("trailer_cache_entries", "gauge", "Entries in the trailer cache",
+                 lambda: trailers.stats()["size"])
+metrics.register("interaction_users", "gauge", "Users in the interaction store",
+                 lambda: interactions.user_count)
+metrics.register("interaction_log_pending", "gauge", "Interaction events queued for the log",
+                 lambda: interactions.log.pending)
+metrics.register("catalog_movies", "gauge", "Movies in the live catalog",
+                 lambda: len(get_catalog()))
+metrics.register("catalog_reloads_total", "counter", "Catalog reloads since startup",
+                 lambda: catalogs.reloads)
+metrics.register("precompute_generation", "gauge", "Loaded precomputed generation (0 = none)",
+                 lambda: precomputed.generation or 0)
+
+
+
+
+@app.before_request
+def start_timer():
+    # asgi.py sets it when it worked on the request before Flask (trailer lookups)
+    g.started = request.environ.get("recommender.started", time.perf_counter())
+    # shared_store workers: switch to the owner's newest generation (no-op otherwise)
+    interactions.refresh()
+
+
+@app.after_request
+def record_request(response):
+    '''latency + count per endpoint (and recommendation tier where one applies)'''
+    started = g.get("started")
+    if started is not None:
+        labels = {
+            "endpoint": request.url_rule.rule if request.url_rule else "unmatched",
+            "method": request.method,
+            "status": response.status_code,
+            "tier": g.get("tier", "none"),
+        }
+        metrics.observe("http_request_duration_seconds", time.perf_counter() - started,
+                        "Request latency (streamed bodies: until the first byte)", **labels)
+        metrics.inc("http_requests_total", 1, "Requests handled", **labels)
+    return response
+
+
+
+
+def movie_cards(catalog, titles):
+    '''titles -> the movie objects the frontend renders (one batch lookup)'''
+    return [
+        {
+            "title": movie_row["Series_Title"],
+            "rating": movie_row["IMDB_Rating"],
+            "poster": movie_row["Poster_Link"]  # adjust if column name differs
+        }
+        for _, movie_row in catalog.rows(titles)
+    ]
+
+
+def recommendation_tier(liked_count, user_count):
+    '''which stage of the recommendation strategy applies'''
+    if liked_count == 0:
+        return "cold"
+    if liked_count < 10 or user_count < 5:
+        return "genre"
+    return "collaborative"
+
+
+def cold_start_titles(catalog, movie_id, cache_key, allowed=None):
+    '''Stage 1: the opened movie's closest content neighbours, then top rated
+    of its primary genre, shuffled a little (only `allowed` movies, if given)'''
+    genre_index = catalog.genres
+    if movie_id is None:
+        # Opened movie not found -> fallback to global top rated
+        recommended_titles = genre_index.titles[genre_index.top_rated(10, allowed=allowed)].tolist()
+
+    else:
+        # extract primary genre only (no genre -> the global top rated pool)
+        genres = genre_index.movie_genres[movie_id]
+        base_genre = genres[0] if genres else None
+
+        # "more like this" first (precomputed, no text processing here)
+        similar_ids, _ = catalog.similar.similar(movie_id, COLD_START_SIMILAR)
+        if allowed is not None:
+            similar_ids = similar_ids[allowed[similar_ids]]
+        similar_ids = similar_ids.tolist()
+
+        # take a high-quality pool (top 30) of the same primary genre,
+        # already sorted by rating (quality first) in the genre index
+        top_pool = genre_index.top_rated(
+            30, genre=base_genre, exclude=[movie_id, *similar_ids], allowed=allowed,
+        ).tolist()
+
+        # randomize selection inside that pool
+        # (seeded by the cache key so cached and fresh answers agree)
+        random.Random(rec_cache.seed(cache_key)).shuffle(top_pool)
+
+        # final recommendation list
+        recommended_titles = genre_index.titles[(similar_ids + top_pool)[:15]].tolist()
+
+    return recommended_titles
 
 
 
@@ -33,51 +185,65 @@ def get_trailer():
     '''we suppose to receive the movie title in request 
     and using the yt url we fetch the videoID and return as response
     )'''
-    print("[GET] Trailer hit...")
     title = request.args.get("title")
 
     if not title:
         return jsonify({"error": "title is required"}), 400
 
-    print(f"Fetching trailer from YT for {title}")
+    logger.debug("Fetching trailer for %s", title)
 
-    
+    # cached / coalesced lookup, only misses reach the YT search API
+    # (under asgi.py it was awaited on the event loop already)
+    try:
+        outcome = request.environ.get("recommender.trailer")
+        if isinstance(outcome, TrailerLookupError):
+            raise outcome
+        status, video_id = outcome or trailers.resolve(title)
+    except TrailerLookupError as e:
+        logger.warning("YouTube API failed: %s", e)
+        return jsonify({"error": "YouTube API failed !!"}), 500
 
-    query = f"{title} trailer"
-    #yt URL
-    url = (
-        "https://www.googleapis.com/youtube/v3/search"
-        f"?part=snippet&q={query}&type=video&maxResults=1&key={YT_API_KEY}"
-    )
-    
-    res = requests.get(url)
+    if status == NOT_FOUND:
+        return {"error": "No results found"}, 404
 
-    if res.status_code != 200:
-        print("YouTube API failed..")
-        return jsonify({"error": "YouTube API failed !!"}), 500
-    
-    print("YouTube API fetched success")
-    response = res.json()
-    
+    if status != FOUND:
+        return {"error": "First result is not a video"}, 400
 
-    items = response.get("items", [])
+    logger.debug("Video ID: %s", video_id)
+    return jsonify({"videoId": video_id})
 
-    if not items:
-        return {"error": "No results found"}, 404
 
-    first_item = items[0]
 
-    if first_item.get("id", {}).get("kind") != "youtube#video":
-        return {"error": "First result is not a video"}, 400
 
-    video_id = first_item["id"]["videoId"]
 
-    print("Video ID:", video_id)
+@app.route("/movie/similar", methods=["GET"])
+def similar_movies():
+    '''"more like this": movies closest to the given title by overview,
+    director, stars and genre (lists precomputed with the catalog)
+    '''
+    movie_title = request.args.get("title")
+    if not movie_title:
+        return jsonify({"error": "movie title is required"}), 400
 
+    try:
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
 
+    if limit <= 0:
+        return jsonify({"error": "limit must be > 0"}), 400
 
-    print("Sending back response from /movie/trailer")
-    return jsonify({"videoId": video_id})
+    catalog = get_catalog()
+    movie_id = catalog.resolve(movie_title)
+    if movie_id is None:
+        return jsonify({"error": "Movie not found"}), 404
+
+    similar_ids, scores = catalog.similar.similar(movie_id, limit)
+    response = movie_cards(catalog, catalog.titles[similar_ids].tolist())
+    for card, score in zip(response, scores.tolist()):
+        card["score"] = round(score, 4)
+
+    return jsonify(response)
 
 
 
@@ -91,8 +257,6 @@ def handle_user_like_dislike():
     based on this we update the user_item matrix an
     '''
 
-    print("[POST] handle user action hit..")
-
     if not request.is_json:
         return jsonify({"error": "Request must be JSON"}), 400
 
@@ -103,46 +267,32 @@ def handle_user_like_dislike():
     action = data.get("action")   # 1 = like, 0 = dislike
 
 
-    print(f"user_id:{user_id} movie:{movie_title} action:{action}")
+    logger.debug("user_id:%s movie:%s action:%s", user_id, movie_title, action)
 
     if user_id is None or movie_title is None or action not in [0, 1]:
         return jsonify({"error": "Invalid payload"}), 400
 
-    # find movie in dataset
-    movie_row = df_movies[
-        df_movies["Series_Title"].str.strip().str.lower()
-        == movie_title.strip().lower()
-    ]
-
-    if movie_row.empty:
-        return jsonify({"error": "Movie not found"}), 404
-
-    movie_id = str(movie_row.index[0])
-
-    #matrix update
-    print("Updating user_item matrix  .")
-    if action == 1:
-        # LIKE  --> use matrix update(or create new user row if needed)
-        update_user_matrix(user_id, [movie_title])
-    else:
-        # DISLIKE --> set column to 0 manually
-        df_matrix = pd.read_csv(MATRIX_PATH)
-        df_matrix["user_id"] = df_matrix["user_id"].astype(type(user_id))
+    # resolve + write under the user's write lock, so a catalog reload can't
+    # remap the store's ids in between
+    with interactions.user_lock(user_id):
+        # find movie in dataset
+        movie_id = get_catalog().resolve(movie_title)
 
-        if user_id in df_matrix["user_id"].values:
-            df_matrix.loc[df_matrix["user_id"] == user_id, movie_id] = 0
-            df_matrix.to_csv(MATRIX_PATH, index=False)
+        if movie_id is None:
+            return jsonify({"error": "Movie not found"}), 404
 
-    # reload matrix to compute liked_count
-    
-    df_matrix = pd.read_csv(MATRIX_PATH)
-    df_matrix["user_id"] = df_matrix["user_id"].astype(type(user_id))
+        #matrix update
+        if action == 1:
+            # LIKE  --> use matrix update(or create new user row if needed)
+            update_user_matrix(user_id, [movie_title])
+        else:
+            # DISLIKE --> clear the like (ignored for users not in matrix)
+            interactions.unlike(user_id, movie_id)
 
-    user_row = df_matrix[df_matrix["user_id"] == user_id].drop(columns=["user_id"])
-    liked_count = int(user_row.sum(axis=1).values[0])
+    # liked_count straight from the in-memory store
+    liked_count = interactions.liked_count(user_id)
 
-    print(f"Liked count now: {liked_count}")
-    print("Sending back response from /user/action")
+    logger.debug("Liked count now: %s", liked_count)
 
     return jsonify({
         "status": "success",
@@ -160,27 +310,22 @@ def load_movie_details():
      The req contain the movies title 
      based on that we return the movies details using DB(df_movies)
     '''
-    print("[GET] load movie details  hit..")
     movie_title = request.args.get("title")
-    print("Movie title ",movie_title)
+    logger.debug("Movie details for %s", movie_title)
 
     if not movie_title:
         return jsonify({"error": "movie title is required"}), 400
 
     
 
-    # Normalize title for safe matching
-    movie_row = df_movies[
-        df_movies["Series_Title"].str.strip().str.lower()
-        == movie_title.strip().lower()
-    ]
+    # Normalized title lookup (catalog index)
+    catalog = get_catalog()
+    movie_id = catalog.resolve(movie_title)
 
-    if movie_row.empty:
+    if movie_id is None:
         return jsonify({"error": "Movie not found"}), 404
 
-    movie = movie_row.iloc[0]
-
-    print("Sending back response from /movie")
+    movie = catalog.record(movie_id)
 
     response = {
         "title": movie["Series_Title"],
@@ -199,6 +344,43 @@ def load_movie_details():
 
 
 
+@app.route("/search", methods=["GET"])
+def search_movies():
+    '''
+    Typeahead: movies whose title, director or star starts with (or
+    fuzzily matches) `q`, best match first, then most voted.
+    '''
+    query = request.args.get("q", "")
+    if not query.strip():
+        return jsonify({"error": "q is required"}), 400
+
+    try:
+        limit = int(request.args.get("limit", SEARCH_LIMIT))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    if limit <= 0:
+        return jsonify({"error": "limit must be > 0"}), 400
+
+    catalog = get_catalog()
+    results = []
+    for movie_id, quality, field, matched in catalog.search.search(query, limit):
+        movie = catalog.record(movie_id)
+        results.append({
+            "title": movie["Series_Title"],
+            "year": movie["Released_Year"],
+            "rating": movie["IMDB_Rating"],
+            "poster": movie["Poster_Link"],
+            "match": field,             # title / director / star
+            "matched": matched,
+            "quality": quality,         # exact / prefix / word / fuzzy
+        })
+
+    return jsonify({"query": query, "results": results})
+
+
+
+
 #home page
 @app.route("/genres", methods=["GET"])
 def get_genres():
@@ -206,12 +388,8 @@ def get_genres():
         and we have to  server the movie poster of the genres 
 
     '''
-    print("[GET] load home page hits")
-    # Extract unique genres from db
-    genre_set = set()
-    for g in df_movies["Genre"].dropna():
-        for genre in g.split(","):
-            genre_set.add(genre.strip())
+    # Unique genres, extracted once by the genre index
+    genre_set = get_catalog().genres.genres
 
     # Genre and  image mapping
     genreImages = {
@@ -237,7 +415,6 @@ def get_genres():
     }
 
     #response
-    print("Sending back response from /genres")
     response = []
     for genre in sorted(genre_set):
         response.append({
@@ -257,30 +434,48 @@ def get_same_genre_movies():
     '''
     Here the req have the specific genre
     based on that genre we have to server the movies 
+
+    Without paging params the whole listing is returned (a JSON array).
+    With `limit` and/or `cursor` one page is returned as
+    {"movies": [...], "next_cursor": <cursor or null>}
+
+    Facet filters narrow the listing: year_min / year_max, rating_*,
+    runtime_*, votes_*, gross_* and certificate (comma separated)
     '''
-    print("[GET] get same genre movies hit..")
     selected_genre = request.args.get("genre")
-    print(" User click genre ",selected_genre)
+    logger.debug("User clicked genre %s", selected_genre)
 
     if not selected_genre:
         return jsonify({"error": "genre is required"}), 400
 
+    filters, error = parse_filters(request.args)
+    if error:
+        return jsonify({"error": error}), 400
 
-    movies = df_movies[df_movies["Genre"].str.contains(selected_genre, case=False, na=False)]
+    catalog = get_catalog()
+    listings = catalog.listings
+    # genre bitset AND filters, from the facet index built at catalog load
+    allowed = catalog.facets.mask(filters, selected_genre) if filters else None
 
-    response = movies[
-        #each movie contain this info
-        [
-        "Series_Title",
-        "Poster_Link",
-        "IMDB_Rating",
-        "Released_Year",
-        "Genre"
-    ]
-    ].to_dict(orient="records")
-    print("Sending back response from  /get_genre_movies")
+    # listings are prebuilt and pre-serialized at catalog load
+    if "limit" not in request.args and "cursor" not in request.args:
+        if allowed is not None:
+            return Response(listings.page(selected_genre, allowed=allowed)[0], mimetype="application/json")
+        return Response(listings.full(selected_genre), mimetype="application/json")
 
-    return jsonify(response)
+    try:
+        limit = int(request.args.get("limit", GENRE_PAGE_SIZE))
+        cursor = int(request.args.get("cursor", 0))
+    except ValueError:
+        return jsonify({"error": "limit and cursor must be integers"}), 400
+
+    if limit <= 0 or cursor < 0:
+        return jsonify({"error": "limit must be > 0 and cursor >= 0"}), 400
+
+    page, next_cursor = listings.page(selected_genre, cursor, limit, allowed)
+    body = b'{"movies":' + page + b',"next_cursor":' + json.dumps(next_cursor).encode() + b"}"
+
+    return Response(body, mimetype="application/json")
 
 
 
@@ -293,21 +488,16 @@ def user_like_state():
     and have to return the user_like state 
     i.e which movies uer liked so far
     '''
-    print("[GET] get user state hit..")
-    
-
     try:
         user_id = request.args.get("user_id")
         movie_title = request.args.get("movie_title")
 
         if not user_id or not movie_title:
             return jsonify({"error": "Missing user_id or movie_title"}), 400
-        print(f"User id {user_id} Opened movie {movie_title}")
+        logger.debug("User id %s opened movie %s", user_id, movie_title)
 
-        df_matrix = pd.read_csv(MATRIX_PATH)
         # Check user exists
-        if user_id not in df_matrix["user_id"].values:
-            print("User is not in user_item matrix {did not like any  movie yet}")
+        if not interactions.has_user(user_id):
             # New user --> no likes yet
             return jsonify({
                 "liked_count": 0,
@@ -315,26 +505,19 @@ def user_like_state():
             })
 
         
-        # Get user row
-        user_row = df_matrix[df_matrix["user_id"] == user_id].iloc[0]
-        # Count total liked movies
-        liked_count = int(user_row.drop("user_id").sum())
+        # catalog and store ids read together (a reload swaps both under the store lock)
+        with interactions.lock:
+            # Count total liked movies
+            liked_count = interactions.liked_count(user_id)
 
-        # Check if current movie is liked
-        movie_match = df_movies[
-            df_movies["Series_Title"].str.strip() == movie_title.strip()
-        ]
+            # Check if current movie is liked
+            movie_index = get_catalog().resolve(movie_title)
 
-        has_liked_current_movie = False
+            has_liked_current_movie = False
 
-        if not movie_match.empty:
-            movie_index = str(movie_match.index[0])  # column name as string
-
-            if movie_index in user_row.index:
-                has_liked_current_movie = user_row[movie_index] == 1
-        print("like count :",liked_count)
+            if movie_index is not None:
+                has_liked_current_movie = interactions.is_liked(user_id, movie_index)
         # Response
-        print("Sending back response from  /user/state")
         return jsonify({
             "liked_count": liked_count,
             "has_liked_current_movie": bool(has_liked_current_movie)
@@ -342,7 +525,7 @@ def user_like_state():
     
 
     except Exception as e:
-        print("[USER STATE ERROR]", e)
+        logger.exception("user state failed: %s", e)
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -357,138 +540,241 @@ def recommend():
         based on that our target is to recommend movies 
     '''
 
-    print("[POST] recommend Request hit..")
     if not request.is_json:
-        print("400,Not a json request...")
         return jsonify({"error": "Request must be JSON"}), 400
 
     data = request.get_json()
 
     # now validate the json data
-    print("Validating request...")
-    valid, error = validate_request(data, df_movies)
+    valid, error = validate_request(data)
     if not valid:
-        print(f"Invalid request ,ERR{error}")
+        logger.debug("Invalid /recommend request: %s", error)
+        return jsonify({"error": error}), 400
+
+    # optional facet filters, e.g. {"year_min": 2000, "certificate": ["U", "UA"]}
+    filters, error = parse_filters(data.get("filters"))
+    if error:
         return jsonify({"error": error}), 400
-    print("Request validation successful..")
 
-    # extract user id
-    user_id = data["user_id"]
-    print(f"User id :{user_id}")
-    opened_movie = data['opened_movie']
+    # one catalog for the whole computation. A reload remaps the store and swaps
+    # the catalog together under the store lock; if one landed meanwhile, the
+    # store's ids may already be the new ones -> compute again on the new catalog
+    for _ in range(2):
+        catalog = get_catalog()
+        response_movies, cache_key = recommendations(catalog, data["user_id"], data["opened_movie"], filters)
+        with interactions.lock:
+            if get_catalog() is catalog:
+                # cached under the lock too: a reload clears the cache inside it
+                if cache_key is not None:
+                    rec_cache.put(cache_key, response_movies)
+                break
 
-    # load matrix
-    df_matrix = pd.read_csv(MATRIX_PATH)
+    with timed("serialization", tier=g.tier):
+        return jsonify(response_movies)
 
-    # check if user exists in matrix
-    user_row = df_matrix[df_matrix["user_id"] == user_id]
+
+def recommendations(catalog, user_id, opened_movie, filters):
+    '''(movie cards, cache key to store them under or None) on `catalog`'''
+    allowed = catalog.facets.mask(filters) if filters else None
 
     liked_movies = []
     liked_count = 0
-   
-    if not user_row.empty:
-        print("User exists on user_item matrix ..")
-        # get liked movie ids (columns marked 1)
-        liked_cols = user_row.drop("user_id", axis=1)
-        liked_movie_ids = liked_cols.loc[:, (liked_cols == 1).any()].columns.tolist()
 
-        # convert movie ids to titles
-        liked_movies = df_movies.loc[
-            df_movies.index.astype(str).isin(liked_movie_ids),
-            "Series_Title"
-        ].tolist()
+    with timed("liked_set"):
+        with interactions.lock:
+            # check if user exists in matrix
+            if interactions.has_user(user_id):
+                # get liked movie ids
+                liked_movie_ids = interactions.liked(user_id)
 
-        liked_count = len(liked_movies)
+                # convert movie ids to titles (live catalog: the ids are its ids)
+                liked_movies = get_catalog().titles[liked_movie_ids].tolist()
 
-    print(f"Liked count : {liked_count}")
-    print("User count : ",(df_matrix.shape)[0])
-    user_count = (df_matrix.shape)[0]
+                liked_count = len(liked_movies)
 
-    # Recommendation decision 
-    #cold start
-    if liked_count == 0:
-        print("Cold start user --> genre-based recommendation using opened movie")
+    user_count = interactions.user_count
 
-        movie_row = df_movies[
-            df_movies["Series_Title"].str.strip().str.lower()
-            == opened_movie.strip().lower()
-        ]
+    tier = recommendation_tier(liked_count, user_count)
+    g.tier = tier
+    logger.debug("User %s: liked %s, users %s -> %s", user_id, liked_count, user_count, tier)
 
-        if movie_row.empty:
-            print("Opened movie not found -> fallback to global top rated")
-            recommended_titles = df_movies.sort_values(
-                "IMDB_Rating", ascending=False
-            )["Series_Title"].head(10).tolist()
+    # opened movie only matters for cold start
+    movie_id = catalog.resolve(opened_movie) if tier == "cold" else None
 
-        else:
-            print("Opened movie found -> recommending same genre top rated (with variation)")
+    # same user, same likes, same tier -> same answer
+    cache_key = (str(user_id), interactions.version(user_id), tier, movie_id)
+    if filters:
+        cache_key += (filters.key,)
+    cached = rec_cache.get(cache_key)
+    if cached is not None:
+        metrics.inc("recommendations_total", 1, "Recommendation lists served", tier=tier, source="cache")
+        return cached, None
 
-            # extract primary genre only
-            base_genres = []
-            for g in movie_row.iloc[0]["Genre"].split(","):
-                base_genres.append(g.strip())
-            base_genres = base_genres[:1]   # keep primary genre
-            print("Current movie based genres:", base_genres)
+    source = "live"
 
-            genre_movies = []
+    # Recommendation decision 
+    #cold start
+    if tier == "cold":
+        with timed("scoring", tier=tier):
+            recommended_titles = cold_start_titles(catalog, movie_id, cache_key, allowed)
 
-            # collect movies with same primary genre
-            for _, row in df_movies.iterrows():
-                title = row["Series_Title"]
+    elif tier == "genre":
+        with timed("scoring", tier=tier):
+            recommended_titles = recommend_by_genre(liked_movies, top_n=10, allowed=allowed, catalog=catalog)
 
-                if title == opened_movie:
-                    continue
+    elif COLLAB_ENGINE == "item":
+        with timed("scoring", tier=tier):
+            recommended_titles = recommend_by_items(user_id, 5, allowed)
 
-                movie_genres = [g.strip() for g in row["Genre"].split(",")]
+    elif als_model is not None:
+        with timed("scoring", tier=tier):
+            recommended_titles = recommend_by_als(user_id, 5, allowed)
+        source = "als"
 
-                if any(g in base_genres for g in movie_genres):
-                    genre_movies.append((title, row["IMDB_Rating"]))
+    else:
+        # precomputed lists are unfiltered, filtered requests are scored live
+        ranked = None
+        if allowed is None:
+            with timed("precomputed_lookup", tier=tier):
+                ranked = precomputed.lookup(user_id, interactions.liked(user_id), 5)
+        if ranked is not None:
+            source = "precomputed"
+            recommended_titles = [catalog.titles[m] for m in ranked if m < len(catalog)]
+        else:
+            with timed("similarity", tier=tier):
+                similar_users = get_similar_users(user_id, MIN_SIMILARITY_SCORE, MAX_RECOMMENDATIONS)
+            with timed("scoring", tier=tier):
+                recommended_titles = recommend_movies(user_id, similar_users, 5, allowed)
 
-            # sort by rating (quality first)
-            genre_movies.sort(key=lambda x: x[1], reverse=True)
+    logger.debug("Recommended titles (%s, %s): %s", tier, source, recommended_titles)
+    metrics.inc("recommendations_total", 1, "Recommendation lists served", tier=tier, source=source)
 
-            # take a high-quality pool (top 30)
-            top_pool = genre_movies[:30]
+    #Convert titles to full movie objects for frontend 
+    with timed("title_resolution", tier=tier):
+        response_movies = movie_cards(catalog, recommended_titles)
 
-            # randomize selection inside that pool
-            random.shuffle(top_pool)
+    return response_movies, cache_key
 
-            # final recommendation list
-            recommended_titles = [title for title, _ in top_pool[:15]]
 
-        print("Recommended titles:", recommended_titles)
+@app.route("/recommend/batch", methods=["POST"])
+def recommend_batch_route():
+    '''Recommendations for many users at once, streamed back as NDJSON
+        (one {"user_id", "tier", "recommendations"} line per requested user, input order).
 
+        Collaborative users are scored together through recommend_batch
+        (one sparse matrix product per block) instead of one call each.
+    '''
 
-    elif liked_count < 10 or user_count < 5: 
-        print("Low interaction user ->  genre based recommendation")
-        recommended_titles = recommend_by_genre(liked_movies, top_n=10)
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
 
-    else:
-        print("Mature user -> collaborative filtering")
-        similar_users = get_similar_users(user_id, MIN_SIMILARITY_SCORE, MAX_RECOMMENDATIONS)
-        recommended_titles = recommend_movies(user_id, similar_users, 5)
+    data = request.get_json()
+    valid, error = validate_batch_request(data, BATCH_MAX_USERS)
+    if not valid:
+        logger.debug("Invalid /recommend/batch request: %s", error)
+        return jsonify({"error": error}), 400
 
-    print(f"Recommended titles : {recommended_titles}")
+    user_ids = data["user_ids"]
+    logger.debug("Batch of %s users", len(user_ids))
+
+    catalog = get_catalog()
+    genre_index = catalog.genres
+
+    user_count = interactions.user_count
+    plan = []
+    with interactions.lock:
+        for user_id in user_ids:
+            tier = recommendation_tier(interactions.liked_count(user_id), user_count)
+            plan.append((user_id, tier, interactions.version(user_id)))
+
+    # the batch path is exact; only cache it where /recommend would be exact too
+    batched = COLLAB_ENGINE != "item" and als_model is None
+    cache_collaborative = SIMILARITY_MODE == "exact"
+    collaborative = recommend_batch(
+        [user_id for user_id, tier, _ in plan if tier == "collaborative"],
+        MIN_SIMILARITY_SCORE, MAX_RECOMMENDATIONS, 5,
+    ) if batched else None
+
+    def generate():
+        started = time.perf_counter()
+        for user_id, tier, version in plan:
+            # no opened movie in a batch, so cold users get the global top rated list
+            cache_key = (str(user_id), version, tier, None)
+            response_movies = rec_cache.get(cache_key)
+
+            if tier == "collaborative" and batched:
+                # keep the batch generator in step even on cache hits
+                _, recommended_titles = next(collaborative)
+                if response_movies is None:
+                    response_movies = movie_cards(catalog, recommended_titles)
+                    if cache_collaborative:
+                        rec_cache.put(cache_key, response_movies)
+                metrics.inc("recommendations_total", 1, "Recommendation lists served", tier=tier, source="batch")
+
+            elif response_movies is None:
+                if tier == "cold":
+                    recommended_titles = genre_index.titles[genre_index.top_rated(10)].tolist()
+                elif tier == "genre":
+                    with interactions.lock:
+                        liked_movies = get_catalog().titles[interactions.liked(user_id)].tolist()
+                    recommended_titles = recommend_by_genre(liked_movies, top_n=10)
+                elif als_model is not None:
+                    recommended_titles = recommend_by_als(user_id, 5)
+                else:
+                    recommended_titles = recommend_by_items(user_id, 5)
+                response_movies = movie_cards(catalog, recommended_titles)
+                rec_cache.put(cache_key, response_movies)
+                metrics.inc("recommendations_total", 1, "Recommendation lists served", tier=tier, source="batch")
+
+            yield json.dumps({
+                "user_id": user_id,
+                "tier": tier,
+                "recommendations": response_movies,
+            }) + "\n"
+
+        # the request hook only sees the time to the first byte
+        metrics.observe("recommender_stage_seconds", time.perf_counter() - started,
+                        "Time spent per processing stage", stage="batch_stream")
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+
+
+@app.route("/recommend/cache", methods=["GET"])
+def recommend_cache_stats():
+    '''hit/miss counters of the recommendation cache'''
+    return jsonify(rec_cache.stats())
+
+
+
+
+@app.route("/admin/catalog/reload", methods=["POST"])
+def reload_catalog():
+    '''rebuild the catalog from the CSV and swap it in; requests keep being
+        served by the current one meanwhile (`?force=1` rebuilds an unchanged file)
+    '''
+    if ADMIN_TOKEN and not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+        return jsonify({"error": "forbidden"}), 403
 
-    #Convert titles to full movie objects for frontend 
+    force = request.args.get("force") in ("1", "true")
+    try:
+        summary = catalogs.reload(force=force)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error("catalog reload failed, keeping the current catalog: %s", e)
+        return jsonify({"error": f"reload failed: {e}"}), 500
 
-    response_movies = []
+    if summary is None:
+        return jsonify({"status": "unchanged", "movies": len(get_catalog())})
+    return jsonify({"status": "reloaded", **summary})
 
-    for title in recommended_titles:
-        movie_row = df_movies[df_movies["Series_Title"] == title]
-        if movie_row.empty:
-            continue
 
-        movie_row = movie_row.iloc[0]
 
-        response_movies.append({
-            "title": movie_row["Series_Title"],
-            "rating": movie_row["IMDB_Rating"],
-            "poster": movie_row["Poster_Link"]  # adjust if column name differs
-        })
-    print("Sending back response from /recommend")
 
-    return jsonify(response_movies)
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    '''counters and latency histograms in the Prometheus text format'''
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 
 
@@ -497,7 +783,10 @@ def recommend():
 
 
 if __name__ == "__main__":
-    print(f"Server is running on port:{SERVER_PORT}")
+    # turn SIGTERM into a normal exit so atexit flushes the interaction log
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    logger.info("Server is running on port:%s", SERVER_PORT)
     app.run(
         
         host=SERVER_HOST,
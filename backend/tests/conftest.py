@@ -0,0 +1,5 @@
+import os
+import sys
+
+# run from backend/ (python -m pytest tests); config.py is expected next to server.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,46 @@
+"""ALS: model artifacts are only served against the catalog they were trained on."""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+import recommender.store
+from recommender import als
+from recommender.catalog import get_catalog
+from recommender.store import InteractionStore
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    store = InteractionStore(path=str(tmp_path / "matrix.csv"), n_movies=len(get_catalog())).load().open()
+    rng = np.random.default_rng(0)
+    for user in range(50):
+        store.like(f"u{user}", rng.choice(100, size=10, replace=False).tolist())
+    monkeypatch.setattr(recommender.store, "_store", store)
+    monkeypatch.setattr(als, "_model", None)
+    monkeypatch.setattr(als, "_model_loaded", False)
+    model_dir = str(tmp_path / "als")
+    als.run(model_dir, rank=4, iterations=2)
+    yield model_dir
+    store.close()
+
+
+def test_model_of_the_live_catalog_is_served(model_dir):
+    model = als.get_als_model(model_dir)
+    assert model is not None
+    assert model.manifest["catalog"] == get_catalog().fingerprint
+    assert len(model.rank("u1", recommender.store._store.liked("u1"), 5)) == 5
+
+
+def test_model_of_another_catalog_is_rejected(model_dir):
+    # same number of movies, other ids (e.g. the CSV was re-sorted)
+    path = os.path.join(model_dir, "v1", "manifest.json")
+    with open(path) as f:
+        manifest = json.load(f)
+    manifest["catalog"] = get_catalog().fingerprint ^ 1
+    with open(path, "w") as f:
+        json.dump(manifest, f)
+
+    assert als.get_als_model(model_dir) is None
@@ -0,0 +1,37 @@
+"""Batch scoring against the single-user path (get_similar_users + recommend_movies)."""
+
+import numpy as np
+import pytest
+
+import recommender.store
+from recommender.batch import score_batch, recommend_batch
+from recommender.catalog import get_catalog
+from recommender.recommend import recommend_movies
+from recommender.similarity import get_similar_users
+from recommender.store import InteractionStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    n_movies = len(get_catalog())
+    store = InteractionStore(path=str(tmp_path / "matrix.csv"), n_movies=n_movies).load().open()
+    rng = np.random.default_rng(0)
+    popularity = 1.0 / np.arange(1, n_movies + 1)
+    popularity /= popularity.sum()
+    for user in range(300):
+        store.like(f"u{user:03d}", rng.choice(n_movies, size=rng.integers(1, 30), p=popularity).tolist())
+    monkeypatch.setattr(recommender.store, "_store", store)
+    yield store
+    store.close()
+
+
+def test_same_answers_as_single_user_path(store):
+    user_ids = store.user_ids[:120] + ["nobody"]
+    batch = list(score_batch(user_ids, block_size=32))
+    titles = dict(recommend_batch(user_ids, block_size=32))
+
+    assert [user_id for user_id, _, _ in batch] == user_ids
+    for user_id, neighbours, _ in batch:
+        similar = get_similar_users(user_id, 0.1, 10, mode="exact")
+        assert [store.user_ids[row] for row in neighbours] == [other for other, _ in similar]
+        assert titles[user_id] == recommend_movies(user_id, similar, top_n=5)
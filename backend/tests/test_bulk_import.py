@@ -0,0 +1,67 @@
+"""Bulk import: bad rows are counted and skipped, last action wins, result is on disk."""
+
+import functools
+
+import pytest
+
+from recommender import bulk_import
+from recommender.catalog import get_catalog
+from recommender.store import InteractionStore
+
+
+@pytest.fixture
+def matrix_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "matrix.csv")
+    monkeypatch.setattr(bulk_import, "InteractionStore", functools.partial(InteractionStore, path=path))
+    return path
+
+
+def write(tmp_path, text):
+    path = tmp_path / "history.csv"
+    path.write_text(text)
+    return str(path)
+
+
+def load(matrix_path):
+    return InteractionStore(path=matrix_path, n_movies=len(get_catalog())).load()
+
+
+def test_titles_bad_rows_and_last_action(tmp_path, matrix_path):
+    catalog = get_catalog()
+    first, second = catalog.titles[0], catalog.titles[1]
+    history = write(tmp_path, "\n".join([
+        "user_id,title,action",
+        f"alice,{first},1",
+        f"alice,  {second.upper()} ,like",
+        "alice,No Such Movie,1",            # unresolved
+        f"bob,{first},maybe",               # unknown action
+        f",{first},1",                      # no user
+        "bob",                              # short line
+        f"bob,{first},1",
+        f"bob,{first},dislike",             # same chunk: the dislike wins
+    ]) + "\n")
+
+    report = bulk_import.run(history, chunk_size=100)
+    assert report["rows"] == 8
+    assert report["invalid"] == 3
+    assert report["unresolved"] == 1
+    assert report["duplicates"] == 1
+    assert report["applied"] == 3
+
+    store = load(matrix_path)
+    assert store.liked("alice") == [0, 1]
+    assert store.liked("bob") == []
+
+
+def test_movie_ids_and_order_across_chunks(tmp_path, matrix_path):
+    history = write(tmp_path, "user_id,movie_id,action\n"
+                              "carol,5,1\ncarol,6,1\ncarol,5,0\ncarol,x,1\ncarol,999999,1\n")
+    # chunks of two: the dislike of 5 lands in a later chunk than the like
+    report = bulk_import.run(history, chunk_size=2)
+    assert (report["invalid"], report["unresolved"]) == (1, 1)
+    assert load(matrix_path).liked("carol") == [6]
+
+
+def test_header_without_movie_column_is_rejected(tmp_path, matrix_path):
+    with pytest.raises(ValueError, match="header"):
+        bulk_import.run(write(tmp_path, "user_id,film,action\nalice,1,1\n"))
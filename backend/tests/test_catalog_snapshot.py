@@ -0,0 +1,75 @@
+"""Catalog snapshot: concurrent builds (pre-fork workers), atomic swaps, bad manifests."""
+
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from recommender.catalog_snapshot import KEEP_VERSIONS, build_snapshot, is_fresh, load_catalog_data, open_snapshot
+
+
+IMDB_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "imdb_top_1000.csv")
+
+
+def _build(out_dir, start):
+    start.wait()
+    build_snapshot(IMDB_CSV, out_dir)
+
+
+def test_concurrent_builds(tmp_path):
+    out_dir = str(tmp_path / "snapshot")
+    ctx = multiprocessing.get_context("fork")
+    start = ctx.Event()
+    workers = [ctx.Process(target=_build, args=(out_dir, start)) for _ in range(4)]
+    for p in workers:
+        p.start()
+    start.set()
+    for p in workers:
+        p.join(120)
+
+    assert [p.exitcode for p in workers] == [0] * 4
+    assert is_fresh(IMDB_CSV, out_dir)
+    assert len(open_snapshot(out_dir).columns["Series_Title"]) == 1000
+    assert os.listdir(tmp_path) == ["snapshot"]
+
+
+def test_readers_always_find_a_snapshot(tmp_path):
+    out_dir = str(tmp_path / "snapshot")
+    build_snapshot(IMDB_CSV, out_dir)
+    failures, stop = [], threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            try:
+                open_snapshot(out_dir)
+            except Exception as e:     # anything, the thread would die quietly otherwise
+                failures.append(e)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for _ in range(5):
+        build_snapshot(IMDB_CSV, out_dir)
+    stop.set()
+    thread.join()
+
+    assert failures == []
+    assert len([name for name in os.listdir(out_dir) if name.startswith("v")]) <= KEEP_VERSIONS + 1
+
+
+@pytest.mark.parametrize("manifest", [None, "", "[]", '{"schema": 1}'])
+def test_unusable_manifest_is_rebuilt(tmp_path, manifest):
+    out_dir = str(tmp_path / "snapshot")
+    build_snapshot(IMDB_CSV, out_dir)
+    live = os.path.join(out_dir, open(os.path.join(out_dir, "current")).read())
+    if manifest is None:
+        os.remove(os.path.join(live, "manifest.json"))
+    else:
+        with open(os.path.join(live, "manifest.json"), "w") as f:
+            f.write(manifest)
+
+    with pytest.raises(ValueError):
+        open_snapshot(out_dir)
+    data = load_catalog_data(IMDB_CSV, out_dir)
+    assert data.source == "snapshot"
+    assert is_fresh(IMDB_CSV, out_dir)
@@ -0,0 +1,27 @@
+"""Cold-start recommendations for the opened movie."""
+
+import os
+
+import pandas as pd
+
+import server
+from recommender.catalog import Catalog
+from recommender.catalog_snapshot import read_csv_columns
+
+
+IMDB_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "imdb_top_1000.csv")
+
+
+def test_movie_without_genre_falls_back_to_top_rated(tmp_path):
+    movies = pd.read_csv(IMDB_CSV)
+    movies.loc[10, "Genre"] = None
+    movies.to_csv(tmp_path / "imdb.csv", index=False)
+    catalog = Catalog(read_csv_columns(str(tmp_path / "imdb.csv")))
+
+    titles = server.cold_start_titles(catalog, 10, ("guest", 0, "cold", 10))
+    similar = catalog.titles[catalog.similar.similar(10, server.COLD_START_SIMILAR)[0]].tolist()
+    top_rated = catalog.titles[catalog.genres.top_rated(40, exclude=[10])].tolist()
+
+    assert titles[:len(similar)] == similar
+    assert set(titles[len(similar):]) <= set(top_rated)
+    assert catalog.titles[10] not in titles
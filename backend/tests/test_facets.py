@@ -0,0 +1,96 @@
+"""Facet filters: parsing, and FacetIndex.mask vs. filtering every movie by hand."""
+
+import random
+
+import numpy as np
+import pytest
+
+from recommender.catalog import get_catalog
+from recommender.facets import parse_filters
+
+
+def brute_force(catalog, filters, genre=None):
+    """Every movie checked against every filter, unknown values never match."""
+    columns, numeric = catalog.columns, catalog.numeric
+    values = {
+        "year": numeric["year"].astype(np.float64),
+        "runtime": numeric["runtime"].astype(np.float64),
+        "gross": numeric["gross"].astype(np.float64),
+        "rating": np.asarray(columns["IMDB_Rating"], dtype=np.float64),
+        "votes": np.asarray(columns["No_of_Votes"], dtype=np.float64),
+    }
+    keep = []
+    for movie_id in range(len(catalog)):
+        ok = True
+        for facet, (low, high) in (filters.ranges.items() if filters else ()):
+            value = values[facet][movie_id]
+            unknown = np.isnan(value) if facet == "rating" else value < 0
+            ok &= not unknown and (low is None or value >= low) and (high is None or value <= high)
+        if filters and filters.certificates is not None:
+            certificate = columns["Certificate"][movie_id]
+            ok &= isinstance(certificate, str) and certificate.strip().upper() in filters.certificates
+        if genre is not None:
+            genres = columns["Genre"][movie_id]
+            ok &= isinstance(genres, str) and genre.lower() in [g.strip().lower() for g in genres.split(",")]
+        keep.append(bool(ok))
+    return np.array(keep)
+
+
+def random_params(rng):
+    params = {}
+    if rng.random() < 0.6:
+        params["year_min"] = rng.randint(1920, 2020)
+    if rng.random() < 0.4:
+        params["year_max"] = rng.randint(1950, 2021)
+    if rng.random() < 0.5:
+        params["rating_min"] = rng.choice([7.6, 8, 8.3, 8.5])
+    if rng.random() < 0.3:
+        params["runtime_max"] = rng.randint(80, 200)
+    if rng.random() < 0.3:
+        params["votes_min"] = rng.randint(25_000, 1_000_000)
+    if rng.random() < 0.2:
+        params["gross_min"] = rng.randint(0, 10**8)
+    if rng.random() < 0.4:
+        params["certificate"] = rng.sample(["U", "ua", "A", "R", "PG-13", "Passed", "X"], rng.randint(1, 3))
+    return params
+
+
+def test_mask_matches_brute_force():
+    catalog = get_catalog()
+    rng = random.Random(0)
+    checked = 0
+    for _ in range(200):
+        filters, error = parse_filters(random_params(rng))
+        assert error is None
+        genre = rng.choice([None, "Drama", "crime", "Sci-Fi", "Nope"])
+        expected = brute_force(catalog, filters, genre)
+        assert np.array_equal(catalog.facets.mask(filters, genre), expected), (filters.key if filters else None, genre)
+        checked += expected.any()
+    assert checked > 50     # most combinations leave something to compare
+
+
+def test_bounds_are_inclusive():
+    catalog = get_catalog()
+    year = int(catalog.numeric["year"][0])
+    filters, _ = parse_filters({"year_min": year, "year_max": year})
+    assert np.array_equal(np.flatnonzero(catalog.facets.mask(filters)),
+                          np.flatnonzero(catalog.numeric["year"] == year))
+
+
+@pytest.mark.parametrize("params, error", [
+    ({"year_min": "soon"}, "year_min must be a number"),
+    ({"rating_max": "nan"}, "rating_max must be a number"),
+    ({"certificate": [1, 2]}, "certificate must be a string or a list of strings"),
+    ([1, 2], "filters must be an object"),
+])
+def test_bad_filters(params, error):
+    assert parse_filters(params) == (None, error)
+
+
+def test_filter_parsing():
+    assert parse_filters(None) == (None, None)
+    assert parse_filters({"year_min": "", "certificate": " , "}) == (None, None)
+    filters, _ = parse_filters({"votes_max": "1e6", "certificate": "ua, u,UA"})
+    assert filters.ranges == {"votes": (None, 1e6)}
+    assert filters.certificates == ("U", "UA")
+    assert filters.key == parse_filters({"certificate": ["U", "UA"], "votes_max": 1000000})[0].key
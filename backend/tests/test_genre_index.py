@@ -0,0 +1,75 @@
+"""GenreIndex / GenreListings: rating order, exact genre match, paging boundaries."""
+
+import json
+
+import numpy as np
+
+from recommender.genre_index import GenreIndex, GenreListings
+
+
+MOVIES = [
+    # title, rating, genre
+    ("A", 8.0, "Drama, Music"),
+    ("B", 9.0, "Musical"),
+    ("C", 8.5, "Music"),
+    ("D", 8.0, "Music, Drama"),
+    ("E", 7.0, "Music"),
+    ("F", 9.5, None),
+]
+
+
+def listings():
+    columns = {
+        "Series_Title": [m[0] for m in MOVIES],
+        "IMDB_Rating": [m[1] for m in MOVIES],
+        "Genre": [m[2] for m in MOVIES],
+        "Poster_Link": ["p"] * len(MOVIES),
+        "Released_Year": ["2000"] * len(MOVIES),
+    }
+    records = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    index = GenreIndex(columns)
+    return index, GenreListings(records, index)
+
+
+def titles(body):
+    return [movie["Series_Title"] for movie in json.loads(body)]
+
+
+def test_rating_order_and_exact_match():
+    index, pages = listings()
+    # equal ratings (A, D) keep dataset order; "Music" doesn't match "Musical"
+    assert titles(pages.full(" music ")) == ["C", "A", "D", "E"]
+    assert pages.count("MUSIC") == 4
+    assert titles(pages.full("Musical")) == ["B"]
+    assert index.movie_genres[5] == []
+    assert index.titles[index.top_rated(2)].tolist() == ["F", "B"]
+
+
+def test_paging_boundaries():
+    _, pages = listings()
+    body, cursor = pages.page("Music", 0, 3)
+    assert (titles(body), cursor) == (["C", "A", "D"], 3)
+    body, cursor = pages.page("Music", cursor, 3)
+    assert (titles(body), cursor) == (["E"], None)
+    # exactly at the end, past the end, limit matching the listing size
+    assert pages.page("Music", 4, 3) == (b"[]", None)
+    assert pages.page("Music", 10, 3) == (b"[]", None)
+    assert titles(pages.page("Music", 0, 4)[0]) == ["C", "A", "D", "E"]
+    assert pages.page("Music", 0, 4)[1] is None
+
+
+def test_allowed_mask_pages_within_the_filtered_listing():
+    _, pages = listings()
+    allowed = np.array([True, True, True, False, True, True])
+    body, cursor = pages.page("Music", 0, 2, allowed=allowed)
+    assert (titles(body), cursor) == (["C", "A"], 2)
+    body, cursor = pages.page("Music", cursor, 2, allowed=allowed)
+    assert (titles(body), cursor) == (["E"], None)
+
+
+def test_unknown_genres_are_not_cached():
+    _, pages = listings()
+    assert pages.full("Western") == b"[]"
+    assert pages.page("Western", 0, 5) == (b"[]", None)
+    pages.full("Music")
+    assert list(pages._full) == ["music"]
@@ -0,0 +1,69 @@
+"""Precompute: incremental runs recompute exactly the stale users, lookups reject stale rows."""
+
+import numpy as np
+import pytest
+
+import recommender.store
+from recommender import precompute
+from recommender.catalog import get_catalog
+from recommender.store import InteractionStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = InteractionStore(path=str(tmp_path / "matrix.csv"), n_movies=len(get_catalog())).load().open()
+    rng = np.random.default_rng(1)
+    # two groups liking disjoint movies: a change in one can't make the other stale
+    for user in range(60):
+        base = 0 if user < 30 else 100
+        store.like(f"u{user:02d}", (base + rng.choice(40, size=8, replace=False)).tolist())
+    monkeypatch.setattr(recommender.store, "_store", store)
+    yield store
+    store.close()
+
+
+def load(out_dir):
+    return precompute._load_arrays(out_dir), precompute._read_manifest(out_dir)
+
+
+def test_incremental_run_recomputes_stale_users_only(store, tmp_path):
+    out_dir = str(tmp_path / "precomputed")
+    assert precompute.run(out_dir, workers=1) == 1
+
+    store.like("u03", [39, 38, 37])
+    store.like("newcomer", [105])
+    assert precompute.run(out_dir, workers=1) == 2
+    arrays, manifest = load(out_dir)
+    generation = dict(zip(arrays["user_ids"].tolist(), arrays["generations"].tolist()))
+
+    assert generation["u03"] == generation["newcomer"] == 2
+    # everyone sharing a movie with a changed user is recomputed, some rows carry over
+    for changed in ("u03", "newcomer"):
+        liked = set(store.liked(changed))
+        assert all(generation[user] == 2 for user in store.user_ids if liked & set(store.liked(user)))
+    assert 0 < manifest["recomputed"] < len(arrays["user_ids"])
+    assert 1 in generation.values()
+
+    # carried-over rows equal what a full run computes
+    full_dir = str(tmp_path / "full")
+    precompute.run(full_dir, workers=1, full=True)
+    full, _ = load(full_dir)
+    assert arrays["user_ids"].tolist() == full["user_ids"].tolist()
+    assert np.array_equal(arrays["recs"], full["recs"])
+    assert np.array_equal(arrays["neighbours"], full["neighbours"])
+
+
+def test_lookup_serves_only_fresh_rows(store, tmp_path):
+    out_dir = str(tmp_path / "precomputed")
+    precompute.run(out_dir, workers=1)
+    arrays, _ = load(out_dir)
+    row = arrays["user_ids"].tolist().index("u01")
+    expected = [int(m) for m in arrays["recs"][row, :5] if m >= 0]
+
+    served = precompute.PrecomputedRecommendations(out_dir)
+    assert served.lookup("u01", store.liked("u01"), 5) == expected
+    assert served.lookup("u01", store.liked("u01"), 50) is None     # more than computed
+    assert served.lookup("nobody", [], 5) is None
+
+    store.like("u01", [39])
+    assert served.lookup("u01", store.liked("u01"), 5) is None      # likes changed since
@@ -0,0 +1,46 @@
+"""rank_candidates against the original dict-based scoring loop."""
+
+import numpy as np
+import pytest
+
+from recommender.recommend import rank_candidates
+
+
+N_MOVIES = 300
+
+
+def dict_loop(watched, neighbour_likes, weights, top_n, allowed=None):
+    # the pre-vectorization recommend_movies: neighbours in order, columns by id
+    movie_scores = {}
+    for liked, weight in zip(neighbour_likes, weights):
+        for movie_id in liked:
+            if movie_id not in watched and (allowed is None or allowed[movie_id]):
+                movie_scores[movie_id] = movie_scores.get(movie_id, 0) + weight
+    ranked = sorted(movie_scores.items(), key=lambda item: item[1], reverse=True)
+    return [movie_id for movie_id, _ in ranked[:top_n]]
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_same_ranking_as_dict_loop(seed):
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, N_MOVIES + 1)
+    popularity /= popularity.sum()
+
+    def likes(n):
+        return np.unique(rng.choice(N_MOVIES, size=n, p=popularity))
+
+    watched = likes(rng.integers(1, 20))
+    neighbour_likes = [likes(rng.integers(1, 40)) for _ in range(rng.integers(1, 11))]
+    # coarse weights, so equal scores (and the tie order) come up often
+    weights = sorted(rng.choice([0.1, 0.2, 0.25, 0.5], size=len(neighbour_likes)), reverse=True)
+    allowed = rng.random(N_MOVIES) < 0.7 if seed % 2 else None
+    top_n = int(rng.integers(1, 15))
+
+    ranked = rank_candidates(watched, neighbour_likes, weights, N_MOVIES, top_n, allowed)
+    assert ranked.tolist() == dict_loop(set(watched.tolist()), neighbour_likes, weights, top_n, allowed)
+
+
+def test_nothing_to_rank():
+    assert rank_candidates([1], [], [], N_MOVIES, 5).tolist() == []
+    assert rank_candidates([1], [np.array([1])], [0.5], N_MOVIES, 5).tolist() == []
+    assert rank_candidates([], [np.array([2, 3])], [0.5], N_MOVIES, 0).tolist() == []
@@ -0,0 +1,52 @@
+"""Catalog reloads: readers under the store lock never pair new ids with old titles."""
+
+import os
+import threading
+
+import pandas as pd
+
+from recommender.catalog import CatalogManager
+from recommender.store import InteractionStore
+
+
+IMDB_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "imdb_top_1000.csv")
+
+
+def test_remap_and_swap_are_atomic_for_readers(tmp_path):
+    csv_path = tmp_path / "imdb.csv"
+    movies = pd.read_csv(IMDB_CSV)
+    movies.to_csv(csv_path, index=False)
+
+    catalogs = CatalogManager(csv_path=str(csv_path), snapshot_dir=str(tmp_path / "snapshot"))
+    store = InteractionStore(path=str(tmp_path / "matrix.csv"), n_movies=len(catalogs.get())).load().open()
+    catalogs.add_preparer(lambda old, new, mapping: store.prepare_remap(mapping, len(new)))
+    catalogs.add_listener(lambda old, new, mapping: store.remap_movies(mapping, len(new)))
+    catalogs.guard_swaps(store.exclusive)
+
+    liked = movies["Series_Title"].sample(20, random_state=0).tolist()
+    store.like("reader", catalogs.get().resolve_many(liked))
+
+    mismatches = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            with store.lock:
+                titles = catalogs.get().titles[store.liked("reader")].tolist()
+            if sorted(titles) != sorted(liked):
+                mismatches.append(titles)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for seed in range(5):
+        movies.sample(frac=1, random_state=seed).to_csv(csv_path, index=False)
+        catalogs.reload(force=True)
+    stop.set()
+    for t in threads:
+        t.join()
+    store.close()
+
+    assert mismatches == []
+    reloaded = InteractionStore(path=str(tmp_path / "matrix.csv"), n_movies=len(catalogs.get())).load()
+    assert sorted(catalogs.get().titles[reloaded.liked("reader")].tolist()) == sorted(liked)
@@ -0,0 +1,97 @@
+"""SearchIndex: match ranking, misspellings, and prefix lookups vs. a full scan."""
+
+import random
+
+import pytest
+
+from recommender import search
+from recommender.catalog import get_catalog
+from recommender.search import SearchIndex, TITLE
+
+
+MOVIES = [
+    # title, director, stars, votes
+    ("Inception", "Christopher Nolan", ["Leonardo DiCaprio", "Tom Hardy"], 2000),
+    ("Interstellar", "Christopher Nolan", ["Matthew McConaughey", "Anne Hathaway"], 1500),
+    ("The Prestige", "Christopher Nolan", ["Hugh Jackman", "Christian Bale"], 1200),
+    ("Insomnia", "Christopher Nolan", ["Al Pacino", "Robin Williams"], 300),
+    ("Nolan", "Someone Else", ["Hugh Grant"], 10),
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    columns = {
+        "Series_Title": [title for title, *_ in MOVIES],
+        "Director": [director for _, director, _, _ in MOVIES],
+        "No_of_Votes": [votes for *_, votes in MOVIES],
+    }
+    for i in range(4):
+        columns[f"Star{i + 1}"] = [stars[i] if i < len(stars) else None for _, _, stars, _ in MOVIES]
+    return SearchIndex(columns)
+
+
+def hits(index, text, limit=10):
+    return [(movie, quality, field) for movie, quality, field, _ in index.search(text, limit)]
+
+
+def test_title_prefixes_rank_by_votes(index):
+    assert hits(index, "in") == [(0, "prefix", "title"), (1, "prefix", "title"), (3, "prefix", "title")]
+    assert hits(index, "in", limit=2) == [(0, "prefix", "title"), (1, "prefix", "title")]
+
+
+def test_exact_matches_come_first(index):
+    assert hits(index, "  INCEPTION ") == [(0, "exact", "title")]
+    # the exact title beats the director's more voted movies (matched on an inner word)
+    assert hits(index, "nolan") == [(4, "exact", "title")] + [(m, "word", "director") for m in (0, 1, 2, 3)]
+    assert hits(index, "christopher nolan") == [(m, "exact", "director") for m in (0, 1, 2, 3)]
+
+
+def test_each_movie_once_with_its_best_match(index):
+    # The Prestige: "Hugh Jackman" (name prefix); Nolan: "Hugh Grant" (name prefix, fewer votes)
+    assert hits(index, "hugh") == [(2, "prefix", "star"), (4, "prefix", "star")]
+    # "christian bale" and "christopher nolan" both start with "christ": one entry per movie
+    assert [movie for movie, *_ in hits(index, "christ")] == [0, 1, 2, 3]
+
+
+def test_misspellings_fall_back_to_trigrams(index):
+    assert hits(index, "interstelar") == [(1, "fuzzy", "title")]
+    assert hits(index, "cristopher nolan") == [(m, "fuzzy", "director") for m in (0, 1, 2, 3)]
+    # too short for fuzzy matching
+    assert hits(index, "ni") == []
+
+
+def test_real_catalog_misspellings():
+    catalog = get_catalog()
+    for text, title in [("the godfater", "The Godfather"), ("shawshnk redemption", "The Shawshank Redemption"),
+                        ("pulp fictoin", "Pulp Fiction")]:
+        movie, quality, _, _ = catalog.search.search(text, 5)[0]
+        assert (catalog.titles[movie], quality) == (title, "fuzzy")
+
+
+def brute_force_prefix(index, query, depth):
+    """Every sorted key scanned: best (quality, votes, id) per movie."""
+    best = {}
+    for key, doc, inner in zip(index.keys, index.key_doc.tolist(), index.key_inner.tolist()):
+        if not key.startswith(query):
+            continue
+        if inner:
+            quality = search.WORD_PREFIX
+        else:
+            exact = len(index.doc_text[doc]) == len(query)
+            quality = (search.EXACT_TITLE if exact else search.TITLE_PREFIX) + (index.doc_field[doc] != TITLE)
+        for movie in index.doc_movies[index.doc_indptr[doc]:index.doc_indptr[doc + 1]].tolist():
+            rank = (quality, -int(index.votes[movie]), movie)
+            best[movie] = min(best.get(movie, rank), rank)
+    return sorted(best, key=best.get)[:depth]
+
+
+@pytest.mark.parametrize("memo_min_range", [0, 10**9])
+def test_prefix_matches_a_full_scan(monkeypatch, memo_min_range):
+    monkeypatch.setattr(search, "MEMO_MIN_RANGE", memo_min_range)
+    index = SearchIndex(get_catalog().columns)
+    rng = random.Random(1)
+    queries = [key[:rng.randint(1, 6)] for key in rng.sample(index.keys, 150)]
+    for query in queries:
+        for depth in (1, 5, 20):
+            assert index._prefix(query, depth)[1].tolist() == brute_force_prefix(index, query, depth), (query, depth)
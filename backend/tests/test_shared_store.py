@@ -0,0 +1,160 @@
+"""SharedInteractionStore (worker side) against an in-process StoreOwner."""
+
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from recommender import shared_store
+from recommender.catalog import CatalogManager, get_catalog
+from recommender.event_log import LIKE, DISLIKE
+from recommender.store import InteractionStore
+from recommender.shared_store import StoreOwner, SharedInteractionStore, _Inbox
+
+
+IMDB_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "imdb_top_1000.csv")
+
+
+@pytest.fixture
+def shared(tmp_path):
+    store = InteractionStore(path=str(tmp_path / "matrix.csv"), n_movies=len(get_catalog())).load().open()
+    store.like("a", [1, 2])
+    owner = StoreOwner(store, shared_dir=str(tmp_path / "shared"))
+    owner.publish()
+    worker = SharedInteractionStore(shared_dir=str(tmp_path / "shared")).attach()
+    yield store, owner, worker
+    worker.close()
+    store.close()
+
+
+def publish(owner, worker):
+    owner.consume_inboxes()
+    owner.publish()
+    assert worker.refresh()
+
+
+def test_pending_version_matches_published(shared):
+    store, owner, worker = shared
+    before = worker.version("a")
+    worker.like("a", [1])           # already liked: no change
+    worker.like("a", [3])
+    worker.unlike("a", 3)
+    worker.unlike("a", 7)           # never liked: no change
+    pending = worker.version("a")
+
+    publish(owner, worker)
+    assert pending == worker.version("a") == store.version("a") == before + 2
+    assert worker.liked("a") == [1, 2]
+
+
+def test_reset_listeners_rebuild_in_the_background(shared):
+    store, owner, worker = shared
+    release, rebuilt = threading.Event(), []
+
+    def slow_rebuild(s):
+        release.wait(5)
+        rebuilt.append(s.generation)
+
+    worker.add_reset_listener(slow_rebuild)
+    worker.like("b", [4])
+    publish(owner, worker)          # returns while the rebuild is blocked
+    assert worker.liked("b") == [4]
+    assert rebuilt == []
+
+    release.set()
+    for _ in range(100):
+        if rebuilt:
+            break
+        time.sleep(0.05)
+    assert rebuilt == [worker.generation]
+
+
+def test_inbox_events_follow_an_owner_reload(tmp_path, monkeypatch):
+    csv_path = tmp_path / "imdb.csv"
+    movies = pd.read_csv(IMDB_CSV)
+    movies.to_csv(csv_path, index=False)
+    catalogs = CatalogManager(csv_path=str(csv_path), snapshot_dir=str(tmp_path / "snapshot"))
+    monkeypatch.setattr(shared_store, "catalogs", catalogs)
+
+    store = InteractionStore(path=str(tmp_path / "matrix.csv"), n_movies=len(catalogs.get())).load().open()
+    owner = StoreOwner(store, shared_dir=str(tmp_path / "shared"))
+    catalogs.add_preparer(lambda old, new, mapping: store.prepare_remap(mapping, len(new)))
+    catalogs.add_listener(owner.follow_catalog)
+    catalogs.guard_swaps(store.exclusive)
+
+    # written by a worker under the first catalog, consumed after two reloads
+    first = catalogs.get()
+    inbox = _Inbox(owner.inbox_dir)
+    inbox.append("w", 0, LIKE, first.fingerprint)
+    inbox.append("w", 1, LIKE, first.fingerprint)
+    inbox.append("w", 1, DISLIKE, first.fingerprint)
+    inbox.append("w", 2, LIKE, first.fingerprint + 1)     # a catalog the owner never had
+    inbox.close()
+    for seed in range(2):
+        movies.sample(frac=1, random_state=seed).to_csv(csv_path, index=False)
+        catalogs.reload(force=True)
+
+    assert owner.consume_inboxes() == 3
+    assert catalogs.get().titles[store.liked("w")].tolist() == [first.titles[0]]
+    store.close()
+
+
+def test_rows_and_co_likers_include_pending_writes(shared):
+    store, owner, worker = shared
+    store.like("c", [3])
+    publish(owner, worker)
+    a, c = worker.row_of("a"), worker.row_of("c")
+    assert worker.rows[a] == {1, 2} and 2 in worker.rows[a] and 3 not in worker.rows[a]
+    assert worker.co_liked_counts(a) == {}
+
+    worker.like("c", [1, 2])
+    assert worker.rows[c] == {1, 2, 3}
+    assert worker.co_liked_counts(a) == {c: 2}
+    assert worker.co_liked_counts(c) == {a: 2}
+
+    worker.unlike("a", 1)
+    assert worker.rows[a] == {2}
+    assert worker.co_liked_counts(c) == {a: 1}
+
+    publish(owner, worker)          # published: the same answers from the generation
+    assert worker.rows[a] == {2} and worker.rows[c] == {1, 2, 3}
+    assert worker.co_liked_counts(a) == {c: 1}
+    assert worker.rows[a] & {2, 5} == {2}
+
+
+def test_a_failed_catalog_follow_is_retried(shared, monkeypatch):
+    store, owner, worker = shared
+    followed, attempts = threading.Event(), []
+
+    class Catalogs:
+        def get(self):
+            return get_catalog()
+
+        def reload(self, force):
+            attempts.append(force)
+            if len(attempts) == 1:
+                raise ValueError("new CSV not readable yet")
+            followed.set()
+            with worker.lock:
+                worker._follow_catalog(get_catalog(), get_catalog(), np.arange(len(get_catalog())))
+
+    # generation 1 is the worker's catalog, the owner publishes the next ones for another
+    monkeypatch.setattr(SharedInteractionStore, "_matches", staticmethod(lambda g, c: g.number == 1 or followed.is_set()))
+    monkeypatch.setattr(shared_store, "catalogs", Catalogs())
+    monkeypatch.setattr(shared_store, "CATALOG_RETRY_S", 0)
+
+    store.like("b", [4])
+    owner.publish()
+    assert not worker.refresh()
+    worker._catalog_reload.join()
+    assert worker.generation == 1
+
+    # the owner publishes nothing new: the follow is retried all the same
+    assert not worker.refresh()
+    worker._catalog_reload.join()
+    assert attempts == [True, True]
+    assert worker.generation == 2 and worker.liked("b") == [4]
+    assert not worker.refresh()
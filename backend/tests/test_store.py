@@ -0,0 +1,141 @@
+"""InteractionStore: incremental CSR and concurrent writes vs. log replay."""
+
+import threading
+
+import numpy as np
+
+from recommender.store import InteractionStore
+
+
+N_MOVIES = 200
+
+
+def open_store(tmp_path):
+    return InteractionStore(path=str(tmp_path / "matrix.csv"), n_movies=N_MOVIES).load().open()
+
+
+def assert_csr_matches(store):
+    matrix = store.to_csr()
+    assert matrix.shape == (len(store.rows), store.n_movies)
+    for row, liked in enumerate(store.rows):
+        assert matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]].tolist() == sorted(liked)
+
+
+def test_csr_follows_writes(tmp_path):
+    store = open_store(tmp_path)
+    rng = np.random.default_rng(0)
+    for user in range(50):
+        store.like(user, rng.integers(0, N_MOVIES, 5).tolist())
+    before = store.to_csr()
+    assert_csr_matches(store)
+
+    store.like(3, [7, 8])
+    store.unlike(4, sorted(store.rows[store.row_of(4)])[0])
+    store.like("new user", [1])
+    assert_csr_matches(store)
+    # callers holding the old matrix keep an unchanged one
+    assert before.shape[0] == 50
+    store.close()
+
+
+def test_concurrent_writes_survive_compaction_and_restart(tmp_path):
+    store = open_store(tmp_path)
+
+    def writer(seed):
+        rng = np.random.default_rng(seed)
+        for _ in range(500):
+            user, movie = int(rng.integers(0, 30)), int(rng.integers(0, N_MOVIES))
+            if rng.random() < 0.7:
+                store.like(user, [movie])
+            else:
+                store.unlike(user, movie)
+
+    def compactor():
+        for _ in range(10):
+            store.compact()
+
+    threads = [threading.Thread(target=writer, args=(seed,)) for seed in range(8)]
+    threads.append(threading.Thread(target=compactor))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert_csr_matches(store)
+    expected = {user: store.liked(user) for user in store.user_ids}
+    store.close()
+
+    reloaded = InteractionStore(path=str(tmp_path / "matrix.csv"), n_movies=N_MOVIES).load()
+    assert {user: reloaded.liked(user) for user in expected} == expected
+
+
+def test_compact_without_an_open_log(tmp_path):
+    store = open_store(tmp_path)
+    store.like("a", [1, 2])
+    store.close()
+
+    # read-only stores (offline jobs, tests) never open the log
+    store = InteractionStore(path=str(tmp_path / "matrix.csv"), n_movies=N_MOVIES).load()
+    store.compact()
+    assert InteractionStore(path=str(tmp_path / "matrix.csv"), n_movies=N_MOVIES).load().liked("a") == [1, 2]
+
+
+def test_writes_during_a_prepared_remap(tmp_path):
+    from recommender.item_recommender import ItemItemIndex
+    from recommender.lsh import MinHashLSH
+
+    def build(name):
+        store = InteractionStore(path=str(tmp_path / f"{name}.csv"), n_movies=N_MOVIES).load().open()
+        rng = np.random.default_rng(1)
+        for user in range(40):
+            store.like(user, rng.integers(0, N_MOVIES, 6).tolist())
+        lsh, items = MinHashLSH(), ItemItemIndex()
+        for index in (lsh, items):
+            index.rebuild(store)
+            store.add_listener(index.on_write)
+            store.add_remap_listener(index.on_remap)
+        return store, lsh, items
+
+    def writes(store):
+        store.like(2, [0, 1])
+        store.unlike(5, sorted(store.rows[store.row_of(5)])[0])
+        store.like("newcomer", [N_MOVIES - 1, 3])
+
+    mapping = np.arange(N_MOVIES)[::-1].copy()
+    mapping[10] = -1                            # a movie gone, the rest reversed
+    mapping = np.where(mapping > mapping[10], mapping - 1, mapping)
+    mapping[10] = -1
+
+    # the reference remaps everything in the exclusive section
+    expected, expected_lsh, expected_items = build("expected")
+    writes(expected)
+    with expected.exclusive():
+        expected.remap_movies(mapping, N_MOVIES - 1)
+
+    store, lsh, items = build("store")
+    preparing, release = threading.Event(), threading.Event()
+
+    def slow_listener(s, m, rows):
+        preparing.set()
+        release.wait(5)
+
+    store.add_remap_listener(slow_listener)
+    preparer = threading.Thread(target=store.prepare_remap, args=(mapping, N_MOVIES - 1))
+    preparer.start()
+    assert preparing.wait(5)
+    writes(store)                               # would block if the preparation held a lock
+    release.set()
+    preparer.join()
+    with store.exclusive():
+        assert store.remap_movies(mapping, N_MOVIES - 1)
+
+    assert store.rows == expected.rows
+    assert store.versions == expected.versions
+    assert {m: r for m, r in store.movie_users.items() if r} == {m: r for m, r in expected.movie_users.items() if r}
+    assert_csr_matches(store)
+    assert (store.to_csr() != expected.to_csr()).nnz == 0
+    assert all(np.array_equal(a, b) for a, b in zip(lsh.signatures, expected_lsh.signatures))
+    assert len(lsh.signatures) == len(expected_lsh.signatures)
+    assert lsh.buckets == expected_lsh.buckets
+    assert np.array_equal(items.co, expected_items.co)
+    store.close()
+    expected.close()
@@ -0,0 +1,263 @@
+"""TrailerResolver against a local stub of the YouTube search API."""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from recommender.trailer import TrailerResolver, TrailerLookupError
+from recommender.trailer import FOUND, NOT_FOUND, NOT_VIDEO
+
+
+API_KEY = "secret-test-key"
+
+
+def video(video_id="abc123"):
+    return {"items": [{"id": {"kind": "youtube#video", "videoId": video_id}}]}
+
+
+class StubSearch:
+    """Answers every GET with `status` / `body` (JSON unless bytes) after `delay` seconds."""
+
+    def __init__(self):
+        self.status = 200
+        self.body = video()
+        self.delay = 0
+        self.calls = 0
+        self.queries = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.calls += 1
+                stub.queries.append(self.path)
+                time.sleep(stub.delay)
+                body = stub.body if isinstance(stub.body, bytes) else json.dumps(stub.body).encode()
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.handle_error = lambda request, address: None    # clients that timed out
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/search"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+
+@pytest.fixture
+def stub():
+    stub = StubSearch()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+def resolver(url, cache_path=None, **kwargs):
+    kwargs.setdefault("timeout", 2)
+    return TrailerResolver(api_key=API_KEY, base_url=url, cache_path=cache_path, **kwargs)
+
+
+def closed_port_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}/search"
+
+
+def test_found_is_cached(stub):
+    trailers = resolver(stub.url)
+    assert trailers.resolve("Inception") == (FOUND, "abc123")
+    assert trailers.resolve("  inception ") == (FOUND, "abc123")
+    assert stub.calls == 1
+    assert trailers.stats()["hits"] == 1
+    assert "key=" + API_KEY in stub.queries[0]
+
+
+@pytest.mark.parametrize("body, expected", [
+    ({"items": []}, (NOT_FOUND, None)),
+    ({}, (NOT_FOUND, None)),
+    ({"items": [{"id": {"kind": "youtube#channel", "channelId": "c"}}]}, (NOT_VIDEO, None)),
+])
+def test_negative_results(stub, body, expected):
+    stub.body = body
+    assert resolver(stub.url).resolve("Inception") == expected
+
+
+@pytest.mark.parametrize("body", [
+    [],
+    {"items": {}},
+    {"items": ["oops"]},
+    {"items": [{}]},
+    {"items": [{"id": {"kind": "youtube#video"}}]},
+    {"items": [{"id": {"kind": "youtube#video", "videoId": None}}]},
+    b"not json",
+])
+def test_unexpected_bodies_are_lookup_errors(stub, body):
+    stub.body = body
+    with pytest.raises(TrailerLookupError):
+        resolver(stub.url).resolve("Inception")
+
+
+def test_upstream_error_is_not_cached(stub):
+    trailers = resolver(stub.url)
+    stub.status, stub.body = 403, {"error": "quota"}
+    with pytest.raises(TrailerLookupError, match="403"):
+        trailers.resolve("Inception")
+
+    stub.status, stub.body = 200, video()
+    assert trailers.resolve("Inception") == (FOUND, "abc123")
+    assert stub.calls == 2
+
+
+def test_errors_do_not_leak_the_api_key(stub):
+    stub.delay = 0.5
+    with pytest.raises(TrailerLookupError) as timeout:
+        resolver(stub.url, timeout=0.1).resolve("Inception")
+    with pytest.raises(TrailerLookupError) as refused:
+        resolver(closed_port_url()).resolve("Inception")
+
+    for error in (timeout.value, refused.value):
+        assert API_KEY not in str(error)
+        assert error.__cause__ is None
+
+
+def test_concurrent_lookups_share_one_call(stub):
+    stub.delay = 0.2
+    trailers = resolver(stub.url)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(trailers.resolve("Inception"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [(FOUND, "abc123")] * 8
+    assert stub.calls == 1
+    assert trailers.stats()["coalesced"] == 7
+
+
+def test_disk_cache_survives_restart(stub, tmp_path):
+    cache_path = str(tmp_path / "trailers.jsonl")
+    resolver(stub.url, cache_path).resolve("Inception")
+
+    assert resolver(stub.url, cache_path).resolve("Inception") == (FOUND, "abc123")
+    assert stub.calls == 1
+
+
+def test_malformed_cache_lines_are_skipped(stub, tmp_path):
+    cache_path = tmp_path / "trailers.jsonl"
+    good = {"key": "inception", "status": FOUND, "video_id": "cached", "expires": time.time() + 60}
+    cache_path.write_text("\n".join([
+        json.dumps({"key": "no expiry", "status": FOUND, "video_id": "x"}),
+        json.dumps(["not", "an", "object"]),
+        json.dumps({"key": "bad expiry", "status": FOUND, "video_id": "x", "expires": "soon"}),
+        json.dumps(good),
+        '{"key": "torn',
+    ]) + "\n")
+
+    trailers = resolver(stub.url, str(cache_path))
+    assert trailers.resolve("Inception") == (FOUND, "cached")
+    assert trailers.stats()["size"] == 1
+    assert stub.calls == 0
+
+
+def test_unwritable_cache_does_not_fail_the_lookup(stub, tmp_path):
+    trailers = resolver(stub.url, str(tmp_path / "missing" / "trailers.jsonl"))
+    assert trailers.resolve("Inception") == (FOUND, "abc123")
+    assert trailers.resolve("Inception") == (FOUND, "abc123")
+    assert stub.calls == 1
+
+
+def test_resolve_async(stub):
+    trailers = resolver(stub.url)
+
+    async def main():
+        found = await asyncio.gather(*(trailers.resolve_async("Inception") for _ in range(4)))
+        stub.delay = 0.5
+        trailers.timeout = 0.1
+        with pytest.raises(TrailerLookupError):
+            await trailers.resolve_async("Memento")
+        await trailers.aclose()
+        return found
+
+    assert asyncio.run(main()) == [(FOUND, "abc123")] * 4
+    assert trailers.stats()["coalesced"] == 3
+
+
+def test_cache_hits_do_not_wait_on_disk_writes(stub, tmp_path):
+    trailers = resolver(stub.url, str(tmp_path / "trailers.jsonl"))
+    trailers.resolve("Memento")
+
+    persist, writing, release = trailers._persist, threading.Event(), threading.Event()
+
+    def slow_persist(*args):
+        writing.set()
+        release.wait(5)
+        persist(*args)
+
+    trailers._persist = slow_persist
+    lookup = threading.Thread(target=trailers.resolve, args=("Inception",))
+    lookup.start()
+    assert writing.wait(5)
+
+    started = time.monotonic()
+    assert trailers.resolve("Memento") == (FOUND, "abc123")
+    assert time.monotonic() - started < 1
+    release.set()
+    lookup.join()
+    assert len((tmp_path / "trailers.jsonl").read_text().splitlines()) == 2
+
+
+@pytest.mark.parametrize("leader", ["thread", "loop"])
+def test_sync_and_async_lookups_share_one_call(stub, leader):
+    stub.delay = 0.3
+    trailers = resolver(stub.url)
+    results = []
+
+    async def main():
+        if leader == "loop":
+            lead = asyncio.ensure_future(trailers.resolve_async("Inception"))
+            await asyncio.sleep(0.1)
+            thread = threading.Thread(target=lambda: results.append(trailers.resolve("Inception")))
+            thread.start()
+            results.append(await lead)
+        else:
+            thread = threading.Thread(target=lambda: results.append(trailers.resolve("Inception")))
+            thread.start()
+            await asyncio.sleep(0.1)
+            # a follower that gives up leaves the call running for the others
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(trailers.resolve_async("Inception"), 0.05)
+            results.append(await trailers.resolve_async("Inception"))
+        await asyncio.to_thread(thread.join)
+        await trailers.aclose()
+
+    asyncio.run(main())
+    assert results == [(FOUND, "abc123")] * 2
+    assert stub.calls == 1
+    assert trailers.stats()["misses"] == 1
+
+
+def test_async_followers_share_a_failed_call(stub):
+    stub.delay, stub.status = 0.2, 500
+    trailers = resolver(stub.url)
+    lead = threading.Thread(target=lambda: pytest.raises(TrailerLookupError, trailers.resolve, "Inception"))
+    lead.start()
+    time.sleep(0.05)
+
+    async def follow():
+        with pytest.raises(TrailerLookupError):
+            await trailers.resolve_async("Inception")
+
+    asyncio.run(follow())
+    lead.join()
+    assert stub.calls == 1